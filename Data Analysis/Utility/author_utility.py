@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+
+# posts of deleted accounts share this name, they are not one author
+DELETED_AUTHOR = '[deleted]'
+
+
+def author_features(author, subreddit, score):
+    # posts, mean score and distinct subreddits of each post's author: authors and subreddits are
+    # factorized to integer codes once, then everything is a bincount over the codes
+    author_codes, _ = pd.factorize(author.mask(author == DELETED_AUTHOR))
+    subreddit_codes, subreddits = pd.factorize(subreddit)
+    score = np.asarray(score, dtype='float64')
+    known = author_codes >= 0
+    # at least one bin, so the -1 code of deleted authors can still be looked up (and masked) when
+    # every author is deleted or there are no posts
+    n_authors = max(author_codes.max(initial=-1) + 1, 1)
+
+    posts = np.bincount(author_codes[known], minlength=n_authors)
+    score_sums = np.bincount(author_codes[known], weights=score[known], minlength=n_authors)
+
+    # distinct (author, subreddit) pairs, counted per author
+    paired = known & (subreddit_codes >= 0)
+    pairs = np.unique(author_codes[paired].astype('int64') * len(subreddits) + subreddit_codes[paired])
+    subreddit_counts = np.bincount(pairs // max(len(subreddits), 1), minlength=n_authors)
+
+    features = pd.DataFrame(index=author.index)
+    features['author_posts'] = np.where(known, posts[author_codes], 0)
+    features['author_mean_score'] = np.where(known, score_sums[author_codes] / posts[author_codes], np.nan)
+    features['author_subreddits'] = np.where(known, subreddit_counts[author_codes], 0)
+    # mean score of the author's other posts, so a post's own score is not part of its feature
+    with np.errstate(divide='ignore', invalid='ignore'):
+        features['author_other_mean_score'] = np.where(
+            known & (features['author_posts'] > 1),
+            (score_sums[author_codes] - score) / (posts[author_codes] - 1), np.nan)
+    return features
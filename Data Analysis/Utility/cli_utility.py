@@ -0,0 +1,18 @@
+import argparse
+
+LAZY_HELP = ('load, filter, derive the feature and split the scores as one lazy Polars query, '
+             'reading only the columns and rows it needs')
+
+DENSITY_HELP = 'also plot score against the feature as a 2-D density grid, which stays fast for millions of posts'
+
+
+def make_parser(description):
+    # command line flags shared by every analysis script
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--stats-only', action='store_true',
+                        help='print the statistical results without importing the plotting stack or drawing graphs')
+    parser.add_argument('--reader', choices=['pandas', 'arrow', 'orjson'], default='pandas',
+                        help='JSON-lines parser used to load the cleaned data (see read_benchmark.py)')
+    parser.add_argument('--import-times', action='store_true',
+                        help='print how long each lazily loaded dependency took to import')
+    return parser
@@ -0,0 +1,119 @@
+import os
+import json
+import numpy as np
+from Utility.read_utility import DATA_DIRECTORY, MONTHS, read_data
+from Utility.state_utility import month_fingerprint
+
+
+# A corpus is the whitespace tokenization of one text column, stored as flat arrays instead of
+# millions of small Python strings:
+#  vocabulary_buffer / vocabulary_offsets  utf-8 bytes of every distinct token, token i is
+#                                          buffer[offsets[i]:offsets[i + 1]]
+#  token_ids                               every token of every document, as vocabulary ids
+#  document_offsets                        document d is token_ids[offsets[d]:offsets[d + 1]]
+# Tokens are exactly str(text).split(), so counts match len(str(text).split()). Sentences are not
+# stored: textstat also ends one on a . ! or ? inside a token (1.99, e.g.), so readability.py works
+# them out from the vocabulary instead.
+
+
+def build_corpus(texts):
+    # tokenize every text once
+    vocabulary = {}
+    token_ids = []
+    document_offsets = [0]
+
+    for text in texts:
+        for token in str(text).split():
+            token_id = vocabulary.get(token)
+            if token_id is None:
+                token_id = vocabulary[token] = len(vocabulary)
+            token_ids.append(token_id)
+        document_offsets.append(len(token_ids))
+
+    encoded = [token.encode('utf-8') for token in vocabulary]
+    return {
+        'vocabulary_buffer': np.frombuffer(b''.join(encoded), dtype=np.uint8),
+        'vocabulary_offsets': np.concatenate([[0], np.cumsum([len(token) for token in encoded])]).astype(np.int64),
+        'token_ids': np.array(token_ids, dtype=np.int32),
+        'document_offsets': np.array(document_offsets, dtype=np.int64),
+    }
+
+
+def vocabulary(corpus):
+    # decode the distinct tokens, in id order
+    buffer = corpus['vocabulary_buffer'].tobytes()
+    offsets = corpus['vocabulary_offsets']
+    return [buffer[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(len(offsets) - 1)]
+
+
+def document_lengths(corpus):
+    # number of tokens in each document
+    return np.diff(corpus['document_offsets'])
+
+
+def document_ids(corpus):
+    # the document each token belongs to
+    return np.repeat(np.arange(len(corpus['document_offsets']) - 1), document_lengths(corpus))
+
+
+def _gather_ranges(starts, ends):
+    # positions start..end-1 of every range, concatenated
+    lengths = ends - starts
+    if lengths.sum() == 0:
+        return np.zeros(0, dtype=np.int64)
+    range_starts = np.repeat(starts - np.concatenate([[0], np.cumsum(lengths)[:-1]]), lengths)
+    return range_starts + np.arange(lengths.sum())
+
+
+def select_documents(corpus, rows):
+    # a corpus of only the given documents (boolean mask or positions), keeping the vocabulary
+    rows = np.flatnonzero(rows) if np.asarray(rows).dtype == bool else np.asarray(rows)
+    token_starts = corpus['document_offsets'][rows]
+    token_ends = corpus['document_offsets'][rows + 1]
+    return {
+        'vocabulary_buffer': corpus['vocabulary_buffer'],
+        'vocabulary_offsets': corpus['vocabulary_offsets'],
+        'token_ids': corpus['token_ids'][_gather_ranges(token_starts, token_ends)],
+        'document_offsets': np.concatenate([[0], np.cumsum(token_ends - token_starts)]),
+    }
+
+
+def concat_corpora(corpora):
+    # join corpora document-wise, merging their vocabularies
+    merged_vocabulary = {}
+    token_ids = []
+    for corpus in corpora:
+        remap = np.array([merged_vocabulary.setdefault(token, len(merged_vocabulary))
+                          for token in vocabulary(corpus)], dtype=np.int32)
+        token_ids.append(remap[corpus['token_ids']])
+
+    token_shifts = np.cumsum([0] + [len(corpus['token_ids']) for corpus in corpora])
+    encoded = [token.encode('utf-8') for token in merged_vocabulary]
+    return {
+        'vocabulary_buffer': np.frombuffer(b''.join(encoded), dtype=np.uint8),
+        'vocabulary_offsets': np.concatenate([[0], np.cumsum([len(token) for token in encoded])]).astype(np.int64),
+        'token_ids': np.concatenate(token_ids),
+        'document_offsets': np.concatenate(
+            [[0]] + [corpus['document_offsets'][1:] + shift for corpus, shift in zip(corpora, token_shifts)]),
+    }
+
+
+def month_corpus(month, column, data_directory=DATA_DIRECTORY, backend='pandas'):
+    # the saved corpus of one month's column, tokenizing that month only when it is missing or re-cleaned
+    path = os.path.join(data_directory, month, f'_corpus_{column}.npz')
+    fingerprint = json.dumps(month_fingerprint(month, data_directory))
+
+    if os.path.exists(path):
+        with np.load(path) as saved:
+            if str(saved['fingerprint']) == fingerprint:
+                return {key: saved[key] for key in saved.files if key != 'fingerprint'}
+
+    print(f'Tokenizing {column} for month {month}')
+    corpus = build_corpus(read_data(months=[month], data_directory=data_directory, backend=backend)[column])
+    np.savez(path, fingerprint=np.array(fingerprint), **corpus)
+    return corpus
+
+
+def load_corpus(column, months=MONTHS, data_directory=DATA_DIRECTORY, backend='pandas'):
+    # the corpus of a column over several months, documents in the same order as read_data's rows
+    return concat_corpora([month_corpus(month, column, data_directory, backend) for month in months])
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# the filter rules live next to gather_clean.py, which has to run on its own under spark-submit
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'Gather and Clean'))
+
+from filter_rules import SELFTEXT_RULES, pandas_mask, polars_filter  # noqa: E402
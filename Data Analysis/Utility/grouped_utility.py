@@ -0,0 +1,124 @@
+import numpy as np
+import pandas as pd
+from Utility.lazy_utility import lazy_import
+
+stats = lazy_import('scipy.stats')
+
+
+def segment_starts(sorted_codes, n_groups):
+    # offset of every group's run of rows in rows sorted by group code, plus the end
+    return np.searchsorted(sorted_codes, np.arange(n_groups + 1))
+
+
+def grouped_medians(codes, values, n_groups):
+    # median of values within every group: sort by (group, value) once and read the middle of each run
+    order = np.lexsort((values, codes))
+    sorted_values = values[order]
+    starts = segment_starts(codes[order], n_groups)
+    counts = np.diff(starts)
+
+    lower = np.minimum(starts[:-1] + (counts - 1) // 2, len(values) - 1)
+    upper = np.minimum(starts[:-1] + counts // 2, len(values) - 1)
+    return np.where(counts > 0, (sorted_values[lower] + sorted_values[upper]) / 2, np.nan)
+
+
+def grouped_ranks(codes, score, n_groups):
+    # rank of every score within its group (ties get their average rank, as stats.rankdata), and
+    # each group's tie term sum(t^3 - t) over its runs of tied scores
+    n = len(score)
+    order = np.lexsort((score, codes))
+    sorted_codes = codes[order]
+    sorted_score = score[order]
+    starts = segment_starts(sorted_codes, n_groups)
+
+    new_run = np.ones(n, dtype=bool)
+    new_run[1:] = (sorted_codes[1:] != sorted_codes[:-1]) | (sorted_score[1:] != sorted_score[:-1])
+    run_starts = np.flatnonzero(new_run)
+    run_lengths = np.diff(np.append(run_starts, n))
+    group_starts = starts[sorted_codes[run_starts]]
+
+    # ranks run_start+1 .. run_end within the group, averaged over the run
+    run_ranks = run_starts - group_starts + (run_lengths + 1) / 2
+    ranks = np.empty(n)
+    ranks[order] = np.repeat(run_ranks, run_lengths)
+    tie_terms = np.bincount(sorted_codes[run_starts], weights=run_lengths.astype('float64') ** 3 - run_lengths,
+                            minlength=n_groups)
+    return ranks, tie_terms
+
+
+def grouped_split_tests(codes, feature, score, n_groups, min_group_size=30):
+    # the median split of every group at once: feature > the group's median vs <= it, with each
+    # group's score moments, Welch t-test, Cohen's d and Mann-Whitney U (normal approximation,
+    # as stats.mannwhitneyu on large groups). Groups with a side under min_group_size are dropped
+    feature = np.asarray(feature, dtype='float64')
+    score = np.asarray(score, dtype='float64')
+    medians = grouped_medians(codes, feature, n_groups)
+    high = feature > medians[codes]
+
+    cells = 2 * codes + high
+    low_count, high_count = np.bincount(cells, minlength=2 * n_groups).reshape(n_groups, 2).T.astype('float64')
+    low_sum, high_sum = np.bincount(cells, weights=score, minlength=2 * n_groups).reshape(n_groups, 2).T
+    low_squares, high_squares = np.bincount(cells, weights=score ** 2, minlength=2 * n_groups).reshape(n_groups, 2).T
+
+    keep = np.flatnonzero((low_count >= min_group_size) & (high_count >= min_group_size))
+    low_count, high_count = low_count[keep], high_count[keep]
+    n = low_count + high_count
+    low_mean = low_sum[keep] / low_count
+    high_mean = high_sum[keep] / high_count
+    low_var = (low_squares[keep] - low_count * low_mean ** 2) / (low_count - 1)
+    high_var = (high_squares[keep] - high_count * high_mean ** 2) / (high_count - 1)
+
+    # Welch's t-test, as stats.ttest_ind(high, low, equal_var=False)
+    low_se = low_var / low_count
+    high_se = high_var / high_count
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t_statistic = (high_mean - low_mean) / np.sqrt(low_se + high_se)
+        t_df = (low_se + high_se) ** 2 / (low_se ** 2 / (low_count - 1) + high_se ** 2 / (high_count - 1))
+        pooled_sd = np.sqrt(((low_count - 1) * low_var + (high_count - 1) * high_var) / (n - 2))
+        cohens_d = (high_mean - low_mean) / pooled_sd
+    t_pvalue = 2 * stats.t.sf(np.abs(t_statistic), t_df)
+
+    # Mann-Whitney U of the high group from the within-group score ranks
+    ranks, tie_terms = grouped_ranks(codes, score, n_groups)
+    high_rank_sum = np.bincount(codes, weights=ranks * high, minlength=n_groups)[keep]
+    u_statistic = high_rank_sum - high_count * (high_count + 1) / 2
+    u_mean = low_count * high_count / 2
+    u_sd = np.sqrt(low_count * high_count / 12 * ((n + 1) - tie_terms[keep] / (n * (n - 1))))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        u_z = (np.abs(u_statistic - u_mean) - 0.5) / u_sd
+    u_pvalue = np.clip(2 * stats.norm.sf(u_z), 0, 1)
+
+    return pd.DataFrame({
+        'code': keep,
+        'posts': n.astype('int64'),
+        'median': medians[keep],
+        'low_count': low_count.astype('int64'),
+        'high_count': high_count.astype('int64'),
+        'low_mean': low_mean,
+        'high_mean': high_mean,
+        't_statistic': t_statistic,
+        't_pvalue': t_pvalue,
+        'cohens_d': cohens_d,
+        'u_statistic': u_statistic,
+        'u_pvalue': u_pvalue,
+        'prob_superiority': u_statistic / (low_count * high_count),
+    })
+
+
+def grouped_hour_means(codes, hours, score, n_groups):
+    # mean score of every group at every hour of the day, as a (groups x 24) array
+    cells = 24 * codes + hours
+    counts = np.bincount(cells, minlength=24 * n_groups).reshape(n_groups, 24)
+    sums = np.bincount(cells, weights=score, minlength=24 * n_groups).reshape(n_groups, 24)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return sums / counts
+
+
+def adjust_pvalues(pvalues):
+    # Benjamini-Hochberg false discovery rate adjustment, since every group is a separate test
+    pvalues = np.asarray(pvalues, dtype='float64')
+    order = np.argsort(pvalues)
+    ranked = pvalues[order] * len(pvalues) / np.arange(1, len(pvalues) + 1)
+    adjusted = np.empty_like(pvalues)
+    adjusted[order] = np.minimum(np.minimum.accumulate(ranked[::-1])[::-1], 1)
+    return adjusted
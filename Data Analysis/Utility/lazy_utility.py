@@ -0,0 +1,42 @@
+import importlib
+import time
+
+
+# seconds spent importing each lazily loaded module, in the order they were loaded
+import_times = {}
+
+# one stand-in per module name, so every script and utility shares the same timing entry
+_lazy_modules = {}
+
+
+class LazyModule:
+    # stand-in for a module that is only imported the first time one of its attributes is used,
+    # so scripts that never plot never pay for matplotlib / seaborn
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            start = time.perf_counter()
+            self._module = importlib.import_module(self._name)
+            import_times[self._name] = time.perf_counter() - start
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+
+def lazy_import(name):
+    if name not in _lazy_modules:
+        _lazy_modules[name] = LazyModule(name)
+    return _lazy_modules[name]
+
+
+def print_import_times():
+    # startup profile: one line per heavy dependency that was actually loaded
+    if not import_times:
+        print('No lazy imports were loaded.')
+    for name, seconds in import_times.items():
+        print(f'import {name}: {seconds:.3f}s')
@@ -0,0 +1,93 @@
+import re
+import zlib
+from array import array
+import numpy as np
+import pandas as pd
+from Utility.lazy_utility import lazy_import
+
+sparse = lazy_import('scipy.sparse')
+
+
+# Title n-grams with the hashing trick: every unigram and bigram is hashed straight to one of
+# n_features columns, so no vocabulary is kept while the matrix is built and its width does not grow
+# with the data. Only the few columns reported at the end are turned back into text, by a second pass
+# that keeps just the n-grams hashing to them.
+
+TOKEN = re.compile(r"[a-z0-9']+")
+
+
+def title_ngrams(text):
+    # lowercase word unigrams and the bigrams of neighbouring words
+    tokens = TOKEN.findall(str(text).lower())
+    return tokens + [f'{first} {second}' for first, second in zip(tokens, tokens[1:])]
+
+
+def feature_index(ngram, n_features):
+    # a hash that is the same in every process and Python version (unlike hash())
+    return zlib.crc32(ngram.encode('utf-8')) % n_features
+
+
+def hashed_matrix(texts, n_features=2 ** 20):
+    # (titles x n_features) CSR matrix with a 1 where the title holds an n-gram hashing to the column,
+    # built from flat index arrays rather than a list of per-title objects
+    indptr = array('q', [0])
+    indices = array('i')
+    for text in texts:
+        indices.extend(sorted({feature_index(ngram, n_features) for ngram in title_ngrams(text)}))
+        indptr.append(len(indices))
+
+    indices = np.frombuffer(indices, dtype=np.int32) if indices else np.zeros(0, dtype=np.int32)
+    data = np.ones(len(indices), dtype=np.float64)
+    return sparse.csr_matrix((data, indices, np.frombuffer(indptr, dtype=np.int64)),
+                             shape=(len(indptr) - 1, n_features))
+
+
+def ngram_table(X, score, min_count=20, alpha=0.5):
+    # per column: titles holding it, their mean score, and the log-odds ratio of a high score (above the
+    # median) with and without it, all from sparse matrix-vector products; alpha smooths empty cells
+    score = np.asarray(score, dtype='float64')
+    high = (score > np.median(score)).astype('float64')
+
+    counts = X.T @ np.ones(X.shape[0])
+    high_counts = X.T @ high
+    score_sums = X.T @ score
+
+    features = np.flatnonzero(counts >= min_count)
+    titles = counts[features]
+    with_high = high_counts[features]
+    with_low = titles - with_high
+    without_high = high.sum() - with_high
+    without_low = (len(score) - high.sum()) - with_low
+
+    log_odds = (np.log(with_high + alpha) - np.log(with_low + alpha)
+                - np.log(without_high + alpha) + np.log(without_low + alpha))
+    standard_error = np.sqrt(1 / (with_high + alpha) + 1 / (with_low + alpha)
+                             + 1 / (without_high + alpha) + 1 / (without_low + alpha))
+
+    return pd.DataFrame({
+        'feature': features,
+        'titles': titles.astype('int64'),
+        'high_share': with_high / titles,
+        'mean_score': score_sums[features] / titles,
+        'log_odds': log_odds,
+        'z': log_odds / standard_error,
+    })
+
+
+def feature_labels(texts, features, n_features, max_labels=3):
+    # the n-grams behind the given columns, most frequent first, from one more pass over the titles;
+    # several n-grams on one label means they collided in the hash (rare ones are left off)
+    wanted = set(int(feature) for feature in features)
+    found = {}
+    for text in texts:
+        for ngram in set(title_ngrams(text)):
+            feature = feature_index(ngram, n_features)
+            if feature in wanted:
+                counts = found.setdefault(feature, {})
+                counts[ngram] = counts.get(ngram, 0) + 1
+
+    labels = {}
+    for feature in wanted:
+        ngrams = sorted(found.get(feature, {}).items(), key=lambda item: -item[1])
+        labels[feature] = ' / '.join(ngram for ngram, count in ngrams[:max_labels] if 10 * count >= ngrams[0][1])
+    return labels
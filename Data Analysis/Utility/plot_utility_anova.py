@@ -1,5 +1,7 @@
-import matplotlib.pyplot as plt
-import seaborn as sns
+from Utility.lazy_utility import lazy_import
+
+plt = lazy_import('matplotlib.pyplot')
+sns = lazy_import('seaborn')
 
 
 def plot_mean_bar_graph_3candidates(candidate1, candidate2, candidate3, title, xlabel, ylabel, save_path):
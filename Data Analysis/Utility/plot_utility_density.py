@@ -0,0 +1,79 @@
+import numpy as np
+from Utility.lazy_utility import lazy_import
+
+plt = lazy_import('matplotlib.pyplot')
+sns = lazy_import('seaborn')
+colors = lazy_import('matplotlib.colors')
+ticker = lazy_import('matplotlib.ticker')
+
+
+# Scatter-style plots of many points: the points are counted into a bins x bins grid with NumPy first
+# and only the grid is drawn, so the plot costs the same for 25,000 posts or millions.
+
+
+def bin_edges(values, bins, log=False):
+    # evenly spaced edges over the values, or log-spaced over values + 1 so zeros still get a bin
+    low, high = float(values.min()), float(values.max())
+    if log and low < 0:
+        raise ValueError('a log axis needs values >= 0')
+    if low == high:
+        high = low + 1
+    if log:
+        return np.geomspace(low + 1, high + 1, bins + 1) - 1
+    return np.linspace(low, high, bins + 1)
+
+
+def density_grid(x, y, bins=100, log_x=False, log_y=False):
+    # point counts of the grid (x bins by y bins), its edges and the mean y of every x column
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    finite = np.isfinite(x) & np.isfinite(y)
+    x, y = x[finite], y[finite]
+
+    x_edges = bin_edges(x, bins, log_x)
+    y_edges = bin_edges(y, bins, log_y)
+    counts, _, _ = np.histogram2d(x, y, bins=[x_edges, y_edges])
+
+    # the last bin is closed on the right, like np.histogram2d
+    column = np.clip(np.searchsorted(x_edges, x, side='right') - 1, 0, bins - 1)
+    sums = np.bincount(column, weights=y, minlength=bins)
+    sizes = np.bincount(column, minlength=bins)
+    means = np.divide(sums, sizes, out=np.full(bins, np.nan), where=sizes > 0)
+    return counts, x_edges, y_edges, means
+
+
+def plot_density_grid(x, y, title, xlabel, ylabel, save_path, bins=100, log_x=False, log_y=False):
+
+    sns.set()
+    plt.close()
+
+    counts, x_edges, y_edges, means = density_grid(x, y, bins, log_x, log_y)
+
+    # log axes show value + 1, the scale the edges were spaced on
+    x_shift, y_shift = int(log_x), int(log_y)
+    x_centers = np.sqrt((x_edges[:-1] + 1) * (x_edges[1:] + 1)) - 1 if log_x else (x_edges[:-1] + x_edges[1:]) / 2
+
+    fig, ax = plt.subplots(figsize=(8, 6))
+    mesh = ax.pcolormesh(x_edges + x_shift, y_edges + y_shift, np.ma.masked_equal(counts.T, 0),
+                         norm=colors.LogNorm(), cmap='viridis')
+    fig.colorbar(mesh, ax=ax, label='Posts')
+    # empty columns have no mean, the line joins the columns that have one
+    present = ~np.isnan(means)
+    ax.plot(x_centers[present] + x_shift, means[present] + y_shift, color='lightcoral',
+            label=f'Mean {ylabel} in each column')
+
+    if log_x:
+        ax.set_xscale('log')
+        ax.xaxis.set_minor_formatter(ticker.NullFormatter())
+        xlabel = f'{xlabel} + 1'
+    if log_y:
+        ax.set_yscale('log')
+        ax.yaxis.set_minor_formatter(ticker.NullFormatter())
+        ylabel = f'{ylabel} + 1'
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    ax.set_title(f'{title} ({int(counts.sum())} posts)')
+    ax.grid(False)
+    ax.legend(loc='upper right')
+
+    plt.savefig(save_path, bbox_inches='tight')
@@ -0,0 +1,31 @@
+from Utility.lazy_utility import lazy_import
+
+plt = lazy_import('matplotlib.pyplot')
+sns = lazy_import('seaborn')
+
+
+def plot_split_sweep(sweep, median, title, xlabel, save_path):
+
+    sns.set()
+    plt.close()
+
+    fig, (ax_effect, ax_p) = plt.subplots(2, 1, sharex=True, figsize=(8, 8))
+
+    ax_effect.plot(sweep['threshold'], sweep['cohens_d'], label="Cohen's d (Welch t-test)")
+    ax_effect.plot(sweep['threshold'], 2 * sweep['prob_superiority'] - 1, label='Rank-biserial r (Mann-Whitney U)')
+    ax_effect.axhline(0, color='grey', linewidth=1)
+    ax_effect.set_ylabel('Effect size of high vs low group')
+    ax_effect.set_title(title)
+
+    ax_p.plot(sweep['threshold'], sweep['t_pvalue'], label='Welch t-test')
+    ax_p.plot(sweep['threshold'], sweep['u_pvalue'], label='Mann-Whitney U')
+    ax_p.axhline(0.05, color='lightcoral', linestyle=':')
+    ax_p.set_yscale('log')
+    ax_p.set_ylabel('p-value')
+    ax_p.set_xlabel(xlabel)
+
+    for ax in [ax_effect, ax_p]:
+        ax.axvline(median, color='grey', linestyle='--', label='median split')
+        ax.legend()
+
+    plt.savefig(save_path, bbox_inches='tight')
@@ -0,0 +1,29 @@
+import pandas as pd
+from Utility.lazy_utility import lazy_import
+from Utility.read_utility import DATA_DIRECTORY, MONTHS, find_part_files
+
+pl = lazy_import('polars')
+
+
+def scan_data(months=MONTHS, data_directory=DATA_DIRECTORY):
+    # a lazy scan of the part files in read_data's order: nothing is read until a query is collected,
+    # and then only the columns and rows that query needs
+    paths = [path for month in months for path in find_part_files(month, data_directory)]
+    return pl.scan_ndjson(paths)
+
+
+def median_split_query(lf, feature):
+    # the scores of the high (> median) and low (<= median) feature groups, split inside the query
+    high = pl.col(feature) > pl.col(feature).median()
+    return lf.select(
+        pl.col('score').filter(high).implode().alias('high'),
+        pl.col('score').filter(~high).implode().alias('low'),
+    )
+
+
+def collect_frame_and_split(lf, feature):
+    # collect the score and feature columns and the median split together, so the optimizer runs
+    # the shared scan, filter and feature derivation once, on all cores
+    frame, split = pl.collect_all([lf.select('score', feature), median_split_query(lf, feature)])
+    df = frame.to_pandas()
+    return df, {group: pd.Series(split[group][0].to_numpy(), name='score') for group in ['high', 'low']}
@@ -0,0 +1,151 @@
+import numpy as np
+import pandas as pd
+from Utility.lazy_utility import lazy_import
+
+stats = lazy_import('scipy.stats')
+
+
+def batch_ends(n, first_batch, growth):
+    # row counts after each batch: first_batch rows, then growing geometrically up to all n rows
+    ends = []
+    end = min(first_batch, n)
+    while end < n:
+        ends.append(end)
+        end = int(np.ceil(end * growth))
+    ends.append(n)
+    return ends
+
+
+def welch_summary(high, low, alpha=0.05):
+    # Welch t-test of high vs low, with Cohen's d and the confidence interval of the mean difference
+    high = np.asarray(high, dtype='float64')
+    low = np.asarray(low, dtype='float64')
+    statistic, pvalue = stats.ttest_ind(high, low, equal_var=False)
+
+    high_se = high.var(ddof=1) / len(high)
+    low_se = low.var(ddof=1) / len(low)
+    t_df = (high_se + low_se) ** 2 / (high_se ** 2 / (len(high) - 1) + low_se ** 2 / (len(low) - 1))
+    difference = high.mean() - low.mean()
+    margin = stats.t.ppf(1 - alpha / 2, t_df) * np.sqrt(high_se + low_se)
+    pooled_sd = np.sqrt(((len(high) - 1) * high.var(ddof=1) + (len(low) - 1) * low.var(ddof=1))
+                        / (len(high) + len(low) - 2))
+
+    # large-sample standard error of Cohen's d (Hedges and Olkin)
+    cohens_d = difference / pooled_sd
+    n = len(high) + len(low)
+    d_margin = stats.norm.ppf(1 - alpha / 2) * np.sqrt(n / (len(high) * len(low)) + cohens_d ** 2 / (2 * n))
+
+    return {
+        'statistic': statistic,
+        'pvalue': pvalue,
+        'effect': cohens_d,
+        'estimate': difference,
+        'ci_low': difference - margin,
+        'ci_high': difference + margin,
+        'effect_ci_low': cohens_d - d_margin,
+        'effect_ci_high': cohens_d + d_margin,
+    }
+
+
+def _chi_square(tables):
+    # Pearson chi-square statistic of a stack of contingency tables
+    n = tables.sum(axis=(-2, -1), keepdims=True)
+    expected = tables.sum(axis=-1, keepdims=True) * tables.sum(axis=-2, keepdims=True) / n
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(expected > 0, (tables - expected) ** 2 / expected, 0).sum(axis=(-2, -1))
+
+
+def chi_square_summary(table, alpha=0.05, resamples=200, seed=0):
+    # chi-square test of a contingency table, with Cramer's V and a confidence interval for V
+    # from tables redrawn from the observed cell proportions
+    table = np.asarray(table, dtype='float64')
+    n = table.sum()
+    res = stats.chi2_contingency(table)
+    scale = n * (min(table.shape) - 1)
+
+    rng = np.random.default_rng(seed)
+    redrawn = rng.multinomial(int(n), table.ravel() / n, size=resamples).reshape((resamples,) + table.shape)
+    redrawn_v = np.sqrt(_chi_square(redrawn.astype('float64')) / scale)
+    cramers_v = np.sqrt(res.statistic / scale)
+
+    ci_low = np.quantile(redrawn_v, alpha / 2)
+    ci_high = np.quantile(redrawn_v, 1 - alpha / 2)
+    return {
+        'statistic': res.statistic,
+        'pvalue': res.pvalue,
+        'effect': cramers_v,
+        'estimate': cramers_v,
+        'ci_low': ci_low,
+        'ci_high': ci_high,
+        'effect_ci_low': ci_low,
+        'effect_ci_high': ci_high,
+    }
+
+
+def is_settled(result, tolerance, alpha):
+    # the effect size is known to within tolerance (its 95% CI is at most 2 * tolerance wide), or the
+    # test is clearly significant: p-value an order of magnitude below alpha and an effect CI that
+    # excludes no effect. A test that is merely not significant is never settled by that alone,
+    # so a small sample cannot end the run on an underpowered "no effect"
+    if (result['effect_ci_high'] - result['effect_ci_low']) / 2 <= tolerance:
+        return True
+    excludes_zero = result['effect_ci_low'] > 0 or result['effect_ci_high'] < 0
+    return result['pvalue'] < alpha / 10 and excludes_zero
+
+
+def is_stable(previous, current, tolerance, alpha):
+    # every test is settled and reaches the same significance decision as after the previous batch
+    for name, result in current.items():
+        if (result['pvalue'] < alpha) != (previous[name]['pvalue'] < alpha):
+            return False
+        if not is_settled(result, tolerance, alpha):
+            return False
+    return True
+
+
+def progressive_run(n_rows, compute_features, run_tests, first_batch=1000, growth=1.5,
+                    tolerance=0.02, patience=3, alpha=0.05, min_rows=20000, seed=0):
+    # compute the costly features for random batches of rows of increasing size and re-run the tests
+    # after every batch, stopping once at least min_rows rows are scored and `patience` batches in a
+    # row left every test settled (see is_settled) with the same decision. compute_features(rows)
+    # returns the feature rows for those positions, run_tests(sample) returns
+    # {test name: result of welch_summary or chi_square_summary}
+    order = np.random.default_rng(seed).permutation(n_rows)
+    batches = []
+    history = []
+    previous = None
+    stable_batches = 0
+    start = 0
+
+    for end in batch_ends(n_rows, first_batch, growth):
+        batches.append(compute_features(np.sort(order[start:end])))
+        start = end
+        sample = pd.concat(batches)
+        results = run_tests(sample)
+
+        for name, result in results.items():
+            history.append({'rows': end, 'test': name, **result})
+        print_batch(end, n_rows, results)
+
+        stable_batches = stable_batches + 1 if previous is not None and is_stable(previous, results, tolerance, alpha) else 0
+        previous = results
+        stopped_early = stable_batches >= patience and end >= min(min_rows, n_rows)
+        if stopped_early:
+            break
+
+    print_stopping(len(sample), n_rows, stopped_early)
+    return sample, pd.DataFrame(history)
+
+
+def print_batch(rows, n_rows, results):
+    print(f'{rows} of {n_rows} rows ({rows / n_rows:.1%}):')
+    for name, result in results.items():
+        print(f" {name}: statistic = {result['statistic']:.3f}, p-value = {result['pvalue']:.3g}, "
+              f"effect = {result['effect']:.3f}, 95% CI [{result['effect_ci_low']:.3f}, {result['effect_ci_high']:.3f}]")
+
+
+def print_stopping(rows, n_rows, stopped_early):
+    if stopped_early:
+        print(f'Results stable after {rows} of {n_rows} rows: {rows / n_rows:.1%} of the data was needed')
+    else:
+        print(f'Results did not stabilise before all {n_rows} rows were used')
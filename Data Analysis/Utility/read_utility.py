@@ -0,0 +1,172 @@
+import os
+import glob
+import gzip
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from Utility.lazy_utility import lazy_import
+
+pa = lazy_import('pyarrow')
+pa_json = lazy_import('pyarrow.json')
+orjson = lazy_import('orjson')
+
+
+DATA_DIRECTORY = os.path.join('..', 'Cleaned Data')
+
+# one output directory of gather_clean.py per month of 2016
+MONTHS = [
+    'one',
+    'two',
+    'three',
+    'four',
+    'five',
+    'six',
+    'seven',
+    'eight',
+    'nine',
+    'ten',
+    'eleven',
+    'twelve',
+]
+
+
+# flat columns written by gather_clean.select_columns and their types,
+# the nested preview column is left for the parsers to infer (Arrow fills in missing struct keys with None)
+CLEANED_SCHEMA = {
+    'name': 'string',
+    'downs': 'int',
+    'ups': 'int',
+    'hide_score': 'bool',
+    'subreddit': 'string',
+    'link_flair_css_class': 'string',
+    'locked': 'bool',
+    'num_comments': 'int',
+    'id': 'string',
+    'link_flair_text': 'string',
+    'score': 'int',
+    'author': 'string',
+    'author_flair_css_class': 'string',
+    'stickied': 'bool',
+    'title': 'string',
+    'selftext': 'string',
+    'over_18': 'bool',
+    'author_flair_text': 'string',
+    'thumbnail': 'string',
+    'gilded': 'int',
+    'subreddit_id': 'string',
+    'is_self': 'bool',
+    'date': 'date',
+    'datetime': 'timestamp',
+    'word_count_self': 'int',
+    'word_count_title': 'int',
+    # only written by gather_clean.py --author-features
+    'author_posts': 'int',
+    'author_mean_score': 'float',
+    'author_subreddits': 'int',
+}
+
+
+def find_part_files(month, data_directory=DATA_DIRECTORY):
+    # every Spark part file written for a month, whatever uuid the run gave it
+    paths = sorted(glob.glob(os.path.join(data_directory, month, 'part-*.json*')))
+    if not paths:
+        raise FileNotFoundError(f'No part files found for month {month!r} in {data_directory!r}')
+    return paths
+
+
+def match_read_json_types(df):
+    # give a frame built by a fast parser the dtypes pd.read_json(lines=True) would have inferred:
+    # Spark leaves null fields out, so a column that is null everywhere was never in the file,
+    # bools with gaps become 0.0/1.0/NaN floats and date / datetime become datetime64
+    df = df.dropna(axis='columns', how='all')
+    for column in df.columns:
+        kind = CLEANED_SCHEMA.get(column)
+        if kind == 'bool' and df[column].isna().any():
+            df[column] = df[column].astype('float64')
+        elif kind in ('date', 'timestamp'):
+            df[column] = pd.to_datetime(df[column])
+        elif kind is None:
+            # nested columns hold NaN rather than None where the field was left out
+            df[column] = df[column].where(df[column].notna(), np.nan)
+    return df
+
+
+def read_part_file_pandas(path):
+    # decompress and parse a single part file
+    return pd.read_json(path, lines=True)
+
+
+def arrow_schema():
+    # explicit Arrow schema for the flat columns, dates are kept as strings and converted like pandas does
+    arrow_types = {
+        'string': pa.string(),
+        'int': pa.int64(),
+        'bool': pa.bool_(),
+        'float': pa.float64(),
+        'date': pa.string(),
+        'timestamp': pa.string(),
+    }
+    return pa.schema([(column, arrow_types[kind]) for column, kind in CLEANED_SCHEMA.items()])
+
+
+def read_part_file_arrow(path):
+    # multithreaded Arrow JSON reader with the schema fixed up front instead of inferred
+    parse_options = pa_json.ParseOptions(explicit_schema=arrow_schema(), unexpected_field_behavior='infer')
+    table = pa_json.read_json(path, parse_options=parse_options)
+    return match_read_json_types(table.to_pandas())
+
+
+def read_part_file_orjson(path):
+    # parse each line with orjson and append values straight into one list per column
+    if hasattr(path, 'read'):
+        lines = path.read().splitlines()
+    else:
+        with gzip.open(path, 'rb') as f:
+            lines = f.read().splitlines()
+
+    columns = {}
+    for row, line in enumerate(lines):
+        for key, value in orjson.loads(line).items():
+            column = columns.get(key)
+            if column is None:
+                column = columns[key] = []
+            if len(column) < row:
+                column.extend([None] * (row - len(column)))
+            column.append(value)
+
+    for column in columns.values():
+        column.extend([None] * (len(lines) - len(column)))
+
+    data = {}
+    for key, values in columns.items():
+        if CLEANED_SCHEMA.get(key) == 'int' and None not in values:
+            data[key] = np.array(values, dtype=np.int64)
+        else:
+            data[key] = values
+
+    return match_read_json_types(pd.DataFrame(data))
+
+
+# every reader takes the path of a part file, or a binary file of lines already decompressed
+READERS = {
+    'pandas': read_part_file_pandas,
+    'arrow': read_part_file_arrow,
+    'orjson': read_part_file_orjson,
+}
+
+
+def read_data(months=MONTHS, data_directory=DATA_DIRECTORY, max_workers=None, backend='pandas'):
+    # read all part files of the given months concurrently with a bounded pool of workers
+    paths = [path for month in months for path in find_part_files(month, data_directory)]
+
+    if max_workers is None:
+        max_workers = min(8, os.cpu_count() or 1)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        data_frames = list(executor.map(READERS[backend], paths))
+
+    for path, data_frame in zip(paths, data_frames):
+        print(f'{os.path.relpath(path, data_directory)}: {len(data_frame)} rows')
+
+    # concatenate once at the end, rather than growing a frame file by file
+    return pd.concat(data_frames, ignore_index=True)
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+from Utility.lazy_utility import lazy_import
+
+stats = lazy_import('scipy.stats')
+sparse = lazy_import('scipy.sparse')
+sparse_linalg = lazy_import('scipy.sparse.linalg')
+
+
+def group_indicator(codes, n_groups):
+    # sparse (groups x rows) 0/1 matrix, so indicator @ values sums values within every group
+    return sparse.csr_matrix((np.ones(len(codes)), (codes, np.arange(len(codes)))), shape=(n_groups, len(codes)))
+
+
+def demean(values, codes, n_groups):
+    # the within transformation: subtract each group's mean from its rows
+    indicator = group_indicator(codes, n_groups)
+    counts = np.asarray(indicator.sum(axis=1)).ravel()
+    means = (indicator @ values) / (counts[:, None] if values.ndim == 2 else counts)
+    return values - means[codes]
+
+
+def fixed_effects_design(X, codes, n_groups):
+    # the full sparse design matrix: the features next to one 0/1 column per group (no intercept,
+    # the group columns take its place)
+    return sparse.hstack([sparse.csr_matrix(X), group_indicator(codes, n_groups).T], format='csr')
+
+
+def fit_within(y, X, codes, n_groups):
+    # slope coefficients from least squares on the group-demeaned data (Frisch-Waugh-Lovell)
+    beta, *_ = np.linalg.lstsq(demean(X, codes, n_groups), demean(y, codes, n_groups), rcond=None)
+    return beta
+
+
+def fit_sparse(y, X, codes, n_groups, tolerance=1e-10):
+    # slope coefficients and group effects from sparse least squares on the full design matrix
+    result = sparse_linalg.lsqr(fixed_effects_design(X, codes, n_groups), y, atol=tolerance, btol=tolerance,
+                                iter_lim=10 * (X.shape[1] + n_groups))
+    return result[0][:X.shape[1]]
+
+
+def coefficient_table(y, X, codes, n_groups, beta, names, covariance='cluster'):
+    # standard errors, t statistics and p-values of the slopes; with the group means absorbed they
+    # only depend on the demeaned features. 'cluster' is robust to correlation within a group
+    # (small-sample correction of Stata's xtreg, fe), 'classical' assumes independent homoskedastic errors
+    n, k = X.shape
+    within_X = demean(X, codes, n_groups)
+    within_y = demean(y, codes, n_groups)
+    residuals = within_y - within_X @ beta
+    bread = np.linalg.pinv(within_X.T @ within_X)
+
+    if covariance == 'cluster':
+        group_scores = group_indicator(codes, n_groups) @ (within_X * residuals[:, None])
+        correction = n_groups / (n_groups - 1) * (n - 1) / (n - k)
+        variance = correction * bread @ (group_scores.T @ group_scores) @ bread
+        df = n_groups - 1
+    else:
+        variance = residuals @ residuals / (n - k - n_groups) * bread
+        df = n - k - n_groups
+
+    se = np.sqrt(np.diag(variance))
+    t_statistic = beta / se
+    table = pd.DataFrame({
+        'coefficient': beta,
+        'std_error': se,
+        't_statistic': t_statistic,
+        'pvalue': 2 * stats.t.sf(np.abs(t_statistic), df),
+        'ci_low': beta - stats.t.ppf(0.975, df) * se,
+        'ci_high': beta + stats.t.ppf(0.975, df) * se,
+    }, index=names)
+
+    fit = {
+        'rows': n,
+        'groups': n_groups,
+        'r_squared_within': 1 - residuals @ residuals / (within_y @ within_y),
+        'r_squared': 1 - residuals @ residuals / ((y - y.mean()) @ (y - y.mean())),
+    }
+    return table, fit
@@ -0,0 +1,111 @@
+import os
+import gzip
+import json
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from Utility.read_utility import DATA_DIRECTORY, MONTHS, READERS, find_part_files
+from Utility.state_utility import month_fingerprint
+
+
+# An optional copy of the cleaned data split by subreddit: every row goes to the shard its subreddit
+# hashes to, so one subreddit is always in one shard, and a manifest lists the shard and row count of
+# every subreddit. Shards hold the original JSON lines, so every reader parses them as usual.
+
+SHARD_DIRECTORY_NAME = '_by_subreddit'
+MANIFEST_FILE_NAME = '_manifest.json'
+
+
+def shard_directory(data_directory=DATA_DIRECTORY):
+    return os.path.join(data_directory, SHARD_DIRECTORY_NAME)
+
+
+def shard_of(subreddit, n_shards):
+    # a hash that is the same in every process and Python version (unlike hash())
+    return zlib.crc32((subreddit or '').encode('utf-8')) % n_shards
+
+
+def shard_name(shard):
+    return f'part-{shard:05d}.json.gz'
+
+
+def build_shards(months=MONTHS, data_directory=DATA_DIRECTORY, n_shards=16):
+    # stream every month's lines into the shards of their subreddit and write the manifest
+    directory = shard_directory(data_directory)
+    os.makedirs(directory, exist_ok=True)
+    for name in os.listdir(directory):
+        if name.startswith('part-'):
+            os.remove(os.path.join(directory, name))
+
+    subreddits = {}
+    shard_rows = [0] * n_shards
+    files = [gzip.open(os.path.join(directory, shard_name(shard)), 'wt', encoding='utf-8') for shard in range(n_shards)]
+    try:
+        for month in months:
+            for path in find_part_files(month, data_directory):
+                with gzip.open(path, 'rt', encoding='utf-8') as f:
+                    for line in f:
+                        subreddit = json.loads(line).get('subreddit')
+                        shard = shard_of(subreddit, n_shards)
+                        files[shard].write(line)
+                        shard_rows[shard] += 1
+                        if subreddit is not None:
+                            subreddits[subreddit] = subreddits.get(subreddit, 0) + 1
+    finally:
+        for f in files:
+            f.close()
+
+    manifest = {
+        'months': list(months),
+        'fingerprint': {month: month_fingerprint(month, data_directory) for month in months},
+        'shards': {shard_name(shard): rows for shard, rows in enumerate(shard_rows)},
+        'subreddits': {subreddit: {'shard': shard_name(shard_of(subreddit, n_shards)), 'rows': rows}
+                       for subreddit, rows in sorted(subreddits.items())},
+    }
+    with open(os.path.join(directory, MANIFEST_FILE_NAME), 'w') as f:
+        json.dump(manifest, f)
+    return manifest
+
+
+def load_manifest(months=MONTHS, data_directory=DATA_DIRECTORY, n_shards=16):
+    # the manifest of the shards, rebuilding them first when they are missing or a month was re-cleaned
+    path = os.path.join(shard_directory(data_directory), MANIFEST_FILE_NAME)
+    if os.path.exists(path):
+        with open(path) as f:
+            manifest = json.load(f)
+        fingerprint = {month: month_fingerprint(month, data_directory) for month in months}
+        if (manifest['months'] == list(months) and manifest['fingerprint'] == fingerprint
+                and len(manifest['shards']) == n_shards):
+            return manifest
+
+    print(f'Sharding the cleaned data by subreddit into {n_shards} shards')
+    return build_shards(months, data_directory, n_shards)
+
+
+def subreddit_counts(manifest):
+    # posts per subreddit, most active first, from the manifest alone
+    counts = pd.Series({subreddit: entry['rows'] for subreddit, entry in manifest['subreddits'].items()},
+                       name='posts', dtype='int64')
+    return counts.sort_values(ascending=False, kind='stable')
+
+
+def read_subreddits(subreddits, manifest, data_directory=DATA_DIRECTORY, max_workers=None, backend='pandas'):
+    # the rows of the given subreddits, reading only the shards that hold them
+    subreddits = [subreddit for subreddit in subreddits if subreddit in manifest['subreddits']]
+    names = sorted({manifest['subreddits'][subreddit]['shard'] for subreddit in subreddits})
+    paths = [os.path.join(shard_directory(data_directory), name) for name in names]
+    if not paths:
+        raise ValueError('none of the subreddits are in the cleaned data')
+
+    if max_workers is None:
+        max_workers = min(8, os.cpu_count() or 1)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        data_frames = list(executor.map(READERS[backend], paths))
+
+    rows = sum(manifest['shards'][name] for name in names)
+    print(f'Read {len(paths)} of {len(manifest["shards"])} shards ({rows} of {sum(manifest["shards"].values())} rows) '
+          f'for {len(subreddits)} subreddits')
+
+    df = pd.concat(data_frames, ignore_index=True)
+    return df[df['subreddit'].isin(subreddits)].reset_index(drop=True)
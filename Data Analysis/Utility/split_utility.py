@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+from Utility.lazy_utility import lazy_import
+
+stats = lazy_import('scipy.stats')
+
+
+def split_point_sweep(feature, score, min_group_size=30):
+    # test every cut "feature <= threshold" vs "feature > threshold" in one pass:
+    # rows are sorted once by the feature, then prefix sums of score, score^2 and score rank
+    # give both groups' Welch t-test and Mann-Whitney U at every cut between distinct feature values
+    feature = np.asarray(feature, dtype='float64')
+    score = np.asarray(score, dtype='float64')
+    n = len(score)
+
+    order = np.argsort(feature, kind='stable')
+    sorted_feature = feature[order]
+    ranks = stats.rankdata(score)
+    sorted_score = score[order]
+
+    score_sums = np.concatenate([[0.0], np.cumsum(sorted_score)])
+    square_sums = np.concatenate([[0.0], np.cumsum(sorted_score ** 2)])
+    rank_sums = np.concatenate([[0.0], np.cumsum(ranks[order])])
+
+    # a cut can only fall between two different feature values, ties stay in the low group
+    cuts = np.flatnonzero(sorted_feature[1:] != sorted_feature[:-1]) + 1
+    cuts = cuts[(cuts >= min_group_size) & (cuts <= n - min_group_size)]
+
+    low_count = cuts.astype('float64')
+    high_count = n - low_count
+    low_mean = score_sums[cuts] / low_count
+    high_mean = (score_sums[-1] - score_sums[cuts]) / high_count
+    low_var = (square_sums[cuts] - low_count * low_mean ** 2) / (low_count - 1)
+    high_var = (square_sums[-1] - square_sums[cuts] - high_count * high_mean ** 2) / (high_count - 1)
+
+    # Welch's t-test, as stats.ttest_ind(high, low, equal_var=False)
+    low_se = low_var / low_count
+    high_se = high_var / high_count
+    t_statistic = (high_mean - low_mean) / np.sqrt(low_se + high_se)
+    t_df = (low_se + high_se) ** 2 / (low_se ** 2 / (low_count - 1) + high_se ** 2 / (high_count - 1))
+    t_pvalue = 2 * stats.t.sf(np.abs(t_statistic), t_df)
+    pooled_sd = np.sqrt(((low_count - 1) * low_var + (high_count - 1) * high_var) / (n - 2))
+
+    # Mann-Whitney U of the high group, as stats.mannwhitneyu(high, low) with the normal approximation
+    high_rank_sum = rank_sums[-1] - rank_sums[cuts]
+    u_statistic = high_rank_sum - high_count * (high_count + 1) / 2
+    _, tie_counts = np.unique(score, return_counts=True)
+    tie_term = (tie_counts ** 3 - tie_counts).sum() / (n * (n - 1))
+    u_mean = low_count * high_count / 2
+    u_sd = np.sqrt(low_count * high_count / 12 * ((n + 1) - tie_term))
+    u_z = (np.abs(u_statistic - u_mean) - 0.5) / u_sd
+    u_pvalue = np.clip(2 * stats.norm.sf(u_z), 0, 1)
+
+    return pd.DataFrame({
+        'threshold': sorted_feature[cuts - 1],
+        'low_count': cuts,
+        'high_count': n - cuts,
+        'low_mean': low_mean,
+        'high_mean': high_mean,
+        't_statistic': t_statistic,
+        't_pvalue': t_pvalue,
+        'cohens_d': (high_mean - low_mean) / pooled_sd,
+        'u_statistic': u_statistic,
+        'u_pvalue': u_pvalue,
+        # probability a post from the high group outscores one from the low group
+        'prob_superiority': u_statistic / (low_count * high_count),
+    })
+
+
+def print_split_sweep(feature_name, sweep, median):
+    # compare the usual median split to the strongest cut anywhere in the feature's range
+    at_median = sweep.iloc[(sweep['threshold'] - median).abs().argmin()]
+    strongest = sweep.loc[sweep['cohens_d'].abs().idxmax()]
+
+    print(f'{feature_name}: {len(sweep)} split points')
+    for label, row in [('median split', at_median), ('largest effect', strongest)]:
+        print(f" {label} at <= {row['threshold']:.2f}: Cohen's d = {row['cohens_d']:.3f}, "
+              f"Welch t = {row['t_statistic']:.3f} (p = {row['t_pvalue']:.3g}), "
+              f"P(high > low) = {row['prob_superiority']:.3f} (Mann-Whitney p = {row['u_pvalue']:.3g})")
+    print(f" Welch p-value < 0.05 at {(sweep['t_pvalue'] < 0.05).mean():.0%} of split points")
@@ -0,0 +1,138 @@
+import os
+import json
+import numpy as np
+from Utility.read_utility import DATA_DIRECTORY, MONTHS, find_part_files, read_data
+
+
+# written next to the part files of each month, Spark ignores files starting with '_'
+STATE_FILE_NAME = '_analysis_state.json'
+
+# bumped when the layout of a saved state changes, so states written by older code are rebuilt
+STATE_VERSION = 2
+
+
+def month_fingerprint(month, data_directory=DATA_DIRECTORY):
+    # name, size and modification time of every part file, so a re-cleaned month is noticed
+    fingerprint = []
+    for path in find_part_files(month, data_directory):
+        file_stat = os.stat(path)
+        fingerprint.append([os.path.basename(path), file_stat.st_size, file_stat.st_mtime_ns])
+    return fingerprint
+
+
+def read_state_file(month, data_directory=DATA_DIRECTORY):
+    path = os.path.join(data_directory, month, STATE_FILE_NAME)
+    if not os.path.exists(path):
+        return {'fingerprint': None, 'states': {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_state_file(month, state_file, data_directory=DATA_DIRECTORY):
+    path = os.path.join(data_directory, month, STATE_FILE_NAME)
+    with open(path, 'w') as f:
+        json.dump(state_file, f)
+
+
+def month_states(month, builders, data_directory=DATA_DIRECTORY, backend='pandas'):
+    # return the saved states of several analyses (name -> function building the state from a month's rows)
+    # for one month, reading that month once when any state is missing or its part files changed
+    fingerprint = month_fingerprint(month, data_directory)
+    state_file = read_state_file(month, data_directory)
+
+    if state_file['fingerprint'] != fingerprint or state_file.get('version') != STATE_VERSION:
+        state_file = {'fingerprint': fingerprint, 'version': STATE_VERSION, 'states': {}}
+
+    missing = [name for name in builders if name not in state_file['states']]
+    if missing:
+        print(f"Computing {', '.join(missing)} state for month {month}")
+        df = read_data(months=[month], data_directory=data_directory, backend=backend)
+        for name in missing:
+            state_file['states'][name] = builders[name](df)
+        write_state_file(month, state_file, data_directory)
+
+    return {name: state_file['states'][name] for name in builders}
+
+
+def merge_states(first, second):
+    # states are nested dicts of counts and sums: numbers add, lists add element-wise and
+    # dicts (including value -> count maps) add key by key, so months can be merged in any order;
+    # score moments are the one exception and merge with merge_moments
+    if isinstance(first, dict) and first.keys() == MOMENT_KEYS:
+        return merge_moments(first, second)
+    if isinstance(first, dict):
+        merged = dict(first)
+        for key, value in second.items():
+            merged[key] = merge_states(merged[key], value) if key in merged else value
+        return merged
+    if isinstance(first, list):
+        return [merge_states(a, b) for a, b in zip(first, second)]
+    return first + second
+
+
+def merged_states(builders, months=MONTHS, data_directory=DATA_DIRECTORY, backend='pandas'):
+    # combine the per-month states of each analysis into the state of the whole year
+    merged = {}
+    for month in months:
+        for name, state in month_states(month, builders, data_directory, backend).items():
+            merged[name] = merge_states(merged[name], state) if name in merged else state
+    return merged
+
+
+def merged_state(name, compute_state, months=MONTHS, data_directory=DATA_DIRECTORY, backend='pandas'):
+    return merged_states({name: compute_state}, months, data_directory, backend)[name]
+
+
+MOMENT_KEYS = {'count', 'mean', 'm2'}
+
+
+def moments_state(values):
+    # count, mean and sum of squared deviations from the mean (M2), enough to merge means and variances
+    # exactly; unlike a sum of squares, M2 does not lose the variance to rounding when scores are large
+    values = values.dropna().astype('float64')
+    mean = float(values.mean()) if len(values) else 0.0
+    return {'count': int(len(values)), 'mean': mean, 'm2': float(((values - mean) ** 2).sum())}
+
+
+def merge_moments(first, second):
+    # the moments of two groups together (Chan et al.)
+    count = first['count'] + second['count']
+    if count == 0:
+        return dict(first)
+    delta = second['mean'] - first['mean']
+    return {
+        'count': count,
+        'mean': first['mean'] + delta * second['count'] / count,
+        'm2': first['m2'] + second['m2'] + delta ** 2 * first['count'] * second['count'] / count,
+    }
+
+
+def moments_summary(moments):
+    # count, mean and sample standard deviation, NaN where there are too few posts for them
+    count = moments['count']
+    mean = moments['mean'] if count > 0 else np.nan
+    std = (moments['m2'] / (count - 1)) ** 0.5 if count > 1 else np.nan
+    return {'count': count, 'mean': mean, 'std': std}
+
+
+def value_counts_state(values):
+    # how many times each distinct value occurs: an exact quantile summary for integer scores,
+    # or per-subreddit post counts
+    return {str(value): int(count) for value, count in values.value_counts().items()}
+
+
+def quantile_from_counts(counts, q):
+    # the q-th quantile of the values summarised by a value -> count map,
+    # interpolated linearly like pandas' Series.quantile, NaN when there are no values
+    if not counts:
+        return np.nan
+    values = np.array([float(value) for value in counts])
+    order = np.argsort(values)
+    values = values[order]
+    cumulative = np.cumsum(np.array(list(counts.values()))[order])
+
+    position = q * (cumulative[-1] - 1)
+    below = int(np.floor(position))
+    lower = values[np.searchsorted(cumulative, below, side='right')]
+    upper = values[np.searchsorted(cumulative, min(below + 1, cumulative[-1] - 1), side='right')]
+    return lower + (upper - lower) * (position - below)
@@ -0,0 +1,133 @@
+import numpy as np
+from Utility.lazy_utility import lazy_import
+from Utility.state_utility import moments_summary
+
+stats = lazy_import('scipy.stats')
+
+
+def welch_from_moments(high, low):
+    # Welch's t-test of two groups from their count, mean and M2
+    high, low = moments_summary(high), moments_summary(low)
+    return stats.ttest_ind_from_stats(high['mean'], high['std'], high['count'],
+                                      low['mean'], low['std'], low['count'], equal_var=False)
+
+
+def anova_from_moments(groups):
+    # one-way ANOVA F test of several groups from their count, mean and M2, as stats.f_oneway
+    counts = np.array([group['count'] for group in groups], dtype='float64')
+    means = np.array([group['mean'] for group in groups], dtype='float64')
+    n = counts.sum()
+
+    between = (counts * (means - (counts * means).sum() / n) ** 2).sum()
+    within = sum(group['m2'] for group in groups)
+    df_between = len(groups) - 1
+    df_within = n - len(groups)
+    statistic = (between / df_between) / (within / df_within)
+    return statistic, stats.f.sf(statistic, df_between, df_within)
+
+
+def mann_whitney_from_counts(first, second):
+    # Mann-Whitney U of the first group from two value -> count maps, with tie-corrected normal
+    # approximation and continuity correction like stats.mannwhitneyu on large samples
+    values = np.unique([float(value) for value in [*first, *second]])
+    first_counts = np.zeros(len(values))
+    second_counts = np.zeros(len(values))
+    first_counts[np.searchsorted(values, [float(value) for value in first])] = list(first.values())
+    second_counts[np.searchsorted(values, [float(value) for value in second])] = list(second.values())
+
+    # every tied value shares the average of the ranks it spans
+    ties = first_counts + second_counts
+    ranks = np.cumsum(ties) - ties + (ties + 1) / 2
+    n1, n2 = first_counts.sum(), second_counts.sum()
+    n = n1 + n2
+
+    statistic = (first_counts * ranks).sum() - n1 * (n1 + 1) / 2
+    sd = np.sqrt(n1 * n2 / 12 * ((n + 1) - (ties ** 3 - ties).sum() / (n * (n - 1))))
+    z = (abs(statistic - n1 * n2 / 2) - 0.5) / sd
+    return statistic, min(2 * stats.norm.sf(z), 1.0)
+
+
+def heterogeneity(estimates, standard_errors):
+    # Cochran's Q test that several estimates of one effect share a single value, with the
+    # inverse-variance pooled estimate and I^2, the share of their spread beyond sampling error
+    estimates = np.asarray(estimates, dtype='float64')
+    weights = 1 / np.asarray(standard_errors, dtype='float64') ** 2
+    pooled = (weights * estimates).sum() / weights.sum()
+    q = (weights * (estimates - pooled) ** 2).sum()
+    df = len(estimates) - 1
+    return {
+        'pooled': pooled,
+        'pooled_se': np.sqrt(1 / weights.sum()),
+        'q': q,
+        'df': df,
+        'pvalue': stats.chi2.sf(q, df),
+        'i_squared': max(0.0, (q - df) / q) if q > 0 else 0.0,
+    }
+
+
+def three_way_interaction(tables, iterations=100, tolerance=1e-8):
+    # likelihood-ratio (G^2) test that a stack of contingency tables (one per stratum, e.g. month)
+    # share the same association: the counts expected under no three-way interaction are fitted by
+    # iterative proportional fitting to the stratum x row, stratum x column and row x column margins
+    tables = np.asarray(tables, dtype='float64')
+    expected = np.ones_like(tables)
+    for _ in range(iterations):
+        previous = expected
+        for axis in range(3):
+            margin = expected.sum(axis=axis, keepdims=True)
+            expected = expected * np.divide(tables.sum(axis=axis, keepdims=True), margin,
+                                            out=np.zeros_like(margin), where=margin > 0)
+        if np.abs(expected - previous).max() < tolerance:
+            break
+
+    observed = tables > 0
+    statistic = 2 * (tables[observed] * np.log(tables[observed] / expected[observed])).sum()
+    df = (tables.shape[0] - 1) * (tables.shape[1] - 1) * (tables.shape[2] - 1)
+    return statistic, df, stats.chi2.sf(statistic, df)
+
+
+def group_moments(samples):
+    # count, mean and sum of squared deviations (M2) of every sample, one row per sample
+    samples = [np.asarray(sample, dtype='float64') for sample in samples]
+    return np.array([[len(sample), sample.mean(), ((sample - sample.mean()) ** 2).sum()] for sample in samples])
+
+
+def merge_group_moments(moments):
+    # the group_moments rows of the same groups in several strata (strata x groups x 3) merged into one
+    # row per group, M2 adding each stratum's spread around the merged mean (Chan et al.)
+    moments = np.asarray(moments, dtype='float64')
+    counts = moments[..., 0].sum(axis=0)
+    means = (moments[..., 0] * moments[..., 1]).sum(axis=0) / counts
+    m2 = (moments[..., 2] + moments[..., 0] * (moments[..., 1] - means) ** 2).sum(axis=0)
+    return np.stack([counts, means, m2], axis=-1)
+
+
+def eta_squared(moments):
+    # share of the score variance between the groups of a one-way ANOVA, from group_moments rows, with
+    # the large-sample standard error of an R^2 (Olkin and Finn) for k groups as k - 1 predictors
+    counts, means, m2 = moments[:, 0], moments[:, 1], moments[:, 2]
+    n = counts.sum()
+    between = (counts * (means - (counts * means).sum() / n) ** 2).sum()
+    eta = between / (between + m2.sum())
+    standard_error = np.sqrt(4 * eta * (1 - eta) ** 2 * (n - len(counts)) ** 2 / ((n ** 2 - 1) * (n + 3)))
+    return eta, standard_error
+
+
+def interaction_anova(moments):
+    # F test that the group means differ in the same way in every stratum (the stratum x group interaction
+    # of a two-way ANOVA, e.g. month x tercile) from a (strata x groups x 3) stack of group_moments rows:
+    # the cell means are fitted by the additive stratum + group model, weighted by the cell counts, and
+    # what the fit leaves is compared to the spread within the cells
+    moments = np.asarray(moments, dtype='float64')
+    counts, means = moments[..., 0].ravel(), moments[..., 1].ravel()
+    strata, groups = moments.shape[:2]
+    design = np.hstack([np.repeat(np.eye(strata), groups, axis=0), np.tile(np.eye(groups), (strata, 1))[:, 1:]])
+    weights = np.sqrt(counts)
+    coefficients = np.linalg.lstsq(design * weights[:, None], means * weights, rcond=None)[0]
+    interaction = (counts * (means - design @ coefficients) ** 2).sum()
+    within = moments[..., 2].sum()
+
+    df_interaction = (strata - 1) * (groups - 1)
+    df_within = counts.sum() - strata * groups
+    statistic = (interaction / df_interaction) / (within / df_within)
+    return statistic, df_interaction, stats.f.sf(statistic, df_interaction, df_within)
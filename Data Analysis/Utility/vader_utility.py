@@ -0,0 +1,230 @@
+import string
+import numpy as np
+import pandas as pd
+from Utility.lazy_utility import lazy_import
+from Utility.corpus_utility import build_corpus, vocabulary, document_ids
+
+vader = lazy_import('vaderSentiment.vaderSentiment')
+
+
+# A fast path for SentimentIntensityAnalyzer.polarity_scores over many texts at once. The VADER lexicon
+# is compiled once into word ids and a valence array; the texts are tokenized into a corpus
+# (Utility/corpus_utility.py), every distinct token is looked up once, and VADER's rules are applied to
+# all tokens together as shifted-array comparisons over the 3-token window before each lexicon word.
+# Document scores are then bincount sums over the tokens of each document.
+# Differences from stock VADER (see vader_benchmark.py for how often they change a result):
+#  - _but_check finds tokens with list.index(value), which misplaces repeated valences; here every
+#    token before the first "but" is halved and every token after it is multiplied by 1.5
+
+
+def compile_lexicon(analyzer=None):
+    # the VADER lexicon as word ids and a valence array, plus a str.translate table for emojis
+    analyzer = analyzer or vader.SentimentIntensityAnalyzer()
+    words = list(analyzer.lexicon)
+    return {
+        'word_ids': {word: i for i, word in enumerate(words)},
+        'valence': np.array([analyzer.lexicon[word] for word in words]),
+        # polarity_scores only replaces single characters, with a space before the description
+        'emoji_table': str.maketrans({emoji: ' ' + description
+                                      for emoji, description in analyzer.emojis.items() if len(emoji) == 1}),
+    }
+
+
+def strip_punctuation(token):
+    # SentiText._strip_punc_if_word: leave emoticons like ":)" whole
+    stripped = token.strip(string.punctuation)
+    return token if len(stripped) <= 2 else stripped
+
+
+def vocabulary_features(tokens, lexicon):
+    # everything the rules need to know about a token, worked out once per distinct token
+    words = [strip_punctuation(token) for token in tokens]
+    lower = [word.lower() for word in words]
+    lexicon_ids = np.array([lexicon['word_ids'].get(word, -1) for word in lower], dtype=np.int64)
+    lower_ids, lower_words = pd.factorize(pd.Series(lower, dtype=object))
+
+    return {
+        'in_lexicon': lexicon_ids >= 0,
+        'valence': np.where(lexicon_ids >= 0, lexicon['valence'][lexicon_ids], 0.0),
+        'booster': np.array([vader.BOOSTER_DICT.get(word, 0.0) for word in lower]),
+        'is_upper': np.array([word.isupper() for word in words], dtype=bool),
+        'negated': np.array([word in vader.NEGATE or "n't" in word for word in lower], dtype=bool),
+        'exclamations': np.array([token.count('!') for token in tokens]),
+        'questions': np.array([token.count('?') for token in tokens]),
+        'lower_ids': lower_ids.astype(np.int64),
+        'lower_index': {word: i for i, word in enumerate(lower_words)},
+    }
+
+
+def _window(values, offset, position, length, fill):
+    # the value of the token `offset` places away in the same document, fill where there is none
+    if offset == 0:
+        return values
+    shifted = np.full_like(values, fill)
+    if offset < 0:
+        shifted[-offset:] = values[:offset]
+    else:
+        shifted[:-offset] = values[offset:]
+    inside = (position + offset >= 0) & (position + offset < length)
+    return np.where(inside, shifted, fill)
+
+
+def _phrase_values(windows, phrases, lower_index):
+    # value of the phrase spelled by the lowercase word ids of consecutive windows, nan where there is none
+    values = np.full(len(windows[0]), np.nan)
+    for phrase, value in phrases.items():
+        words = phrase.split(' ')
+        if len(words) != len(windows):
+            continue
+        match = np.ones(len(windows[0]), dtype=bool)
+        for window, word in zip(windows, words):
+            match &= window == lower_index.get(word, -2)
+        values[match] = value
+    return values
+
+
+def token_sentiments(corpus, features):
+    # the valence VADER gives each token after its booster, negation, idiom, "least", caps and "but" rules
+    token_ids = corpus['token_ids']
+    offsets = corpus['document_offsets']
+    documents = document_ids(corpus)
+    position = np.arange(len(token_ids)) - offsets[documents]
+    length = np.diff(offsets)[documents]
+    index = features['lower_index']
+
+    def at(name, offset, fill):
+        return _window(features[name][token_ids], offset, position, length, fill)
+
+    def is_word(ids, *words):
+        return np.isin(ids, [index.get(word, -2) for word in words])
+
+    words = {offset: at('lower_ids', offset, -1) for offset in [-3, -2, -1, 0, 1, 2]}
+    in_lexicon = features['in_lexicon'][token_ids]
+    lexicon_valence = features['valence'][token_ids]
+
+    # some but not all of a document's words in ALL CAPS
+    upper_counts = np.bincount(documents, weights=features['is_upper'][token_ids], minlength=len(offsets) - 1)
+    cap_differential = ((upper_counts > 0) & (upper_counts < np.diff(offsets)))[documents]
+
+    # "no" before another lexicon word loses its own valence, a word up to two after "no" is negated
+    valence = lexicon_valence.copy()
+    valence[is_word(words[0], 'no') & at('in_lexicon', 1, False)] = 0.0
+    after_no = (is_word(words[-1], 'no') | is_word(words[-2], 'no')
+                | (is_word(words[-3], 'no') & is_word(words[-1], 'or', 'nor')))
+    valence = np.where(after_no, lexicon_valence * vader.N_SCALAR, valence)
+
+    capitalised = features['is_upper'][token_ids] & cap_differential
+    valence = np.where(capitalised, np.where(valence > 0, valence + vader.C_INCR, valence - vader.C_INCR), valence)
+
+    # boosters up to three words back, dampened with distance, then negation of that window
+    for distance, damping in [(1, 1.0), (2, 0.95), (3, 0.9)]:
+        applies = ~at('in_lexicon', -distance, True)
+
+        booster = at('booster', -distance, 0.0)
+        scalar = np.where(valence < 0, -booster, booster)
+        booster_caps = (booster != 0) & at('is_upper', -distance, False) & cap_differential
+        scalar = np.where(booster_caps, np.where(valence > 0, scalar + vader.C_INCR, scalar - vader.C_INCR), scalar)
+        valence = np.where(applies, valence + damping * scalar, valence)
+
+        negated = at('negated', -distance, False)
+        if distance == 1:
+            factor = np.where(negated, vader.N_SCALAR, 1.0)
+        elif distance == 2:
+            never_so = is_word(words[-2], 'never') & is_word(words[-1], 'so', 'this')
+            without_doubt = is_word(words[-2], 'without') & is_word(words[-1], 'doubt')
+            factor = np.where(never_so, 1.25, np.where(without_doubt | ~negated, 1.0, vader.N_SCALAR))
+        else:
+            never_so = ((is_word(words[-3], 'never') & is_word(words[-2], 'so', 'this'))
+                        | is_word(words[-1], 'so', 'this'))
+            without_doubt = is_word(words[-3], 'without') & (is_word(words[-2], 'doubt') | is_word(words[-1], 'doubt'))
+            factor = np.where(never_so, 1.25, np.where(without_doubt | ~negated, 1.0, vader.N_SCALAR))
+        valence = np.where(applies, valence * factor, valence)
+
+    # _special_idioms_check, which VADER only reaches with a non-lexicon word three back
+    applies = ~at('in_lexicon', -3, True)
+    special = np.full(len(token_ids), np.nan)
+    for window in [[-1, 0], [-2, -1, 0], [-2, -1], [-3, -2, -1], [-3, -2]]:
+        special = np.where(np.isnan(special), _phrase_values([words[i] for i in window], vader.SPECIAL_CASES, index), special)
+    # a phrase starting at the word itself wins over one ending at it
+    for window in [[0, 1], [0, 1, 2]]:
+        following = _phrase_values([words[i] for i in window], vader.SPECIAL_CASES, index)
+        special = np.where(np.isnan(following), special, following)
+    valence = np.where(applies & ~np.isnan(special), special, valence)
+    for window in [[-3, -2, -1], [-3, -2], [-2, -1]]:
+        booster = _phrase_values([words[i] for i in window], vader.BOOSTER_DICT, index)
+        valence = np.where(applies & ~np.isnan(booster), valence + booster, valence)
+
+    # "least" negates unless it is "at least" or "very least"
+    least = (is_word(words[-1], 'least') & ~at('in_lexicon', -1, True)
+             & ~is_word(words[-2], 'at', 'very'))
+    valence = np.where(least, valence * vader.N_SCALAR, valence)
+
+    # only lexicon words that are not boosters or the "kind" of "kind of" carry sentiment
+    scored = (in_lexicon & (features['booster'][token_ids] == 0)
+              & ~(is_word(words[0], 'kind') & is_word(words[1], 'of')))
+    sentiments = np.where(scored, valence, 0.0)
+
+    # contrastive "but": halve everything before a document's first "but", add half to everything after
+    but_tokens = np.flatnonzero(is_word(words[0], 'but'))
+    but_documents, first = np.unique(documents[but_tokens], return_index=True)
+    but_position = np.full(len(offsets) - 1, -1)
+    but_position[but_documents] = position[but_tokens[first]]
+    but_position = but_position[documents]
+    weight = np.where(but_position < 0, 1.0,
+                      np.where(position < but_position, 0.5, np.where(position > but_position, 1.5, 1.0)))
+    return sentiments * weight
+
+
+def score_corpus(corpus, lexicon):
+    # neg, neu, pos and compound of every document, as polarity_scores would return them
+    features = vocabulary_features(vocabulary(corpus), lexicon)
+    sentiments = token_sentiments(corpus, features)
+    documents = document_ids(corpus)
+    n_documents = len(corpus['document_offsets']) - 1
+
+    def document_sum(values):
+        return np.bincount(documents, weights=values, minlength=n_documents)
+
+    # punctuation emphasis from up to four "!" and two or more "?"
+    exclamations = np.minimum(document_sum(features['exclamations'][corpus['token_ids']]), 4)
+    questions = document_sum(features['questions'][corpus['token_ids']])
+    emphasis = exclamations * 0.292 + np.where(questions > 1, np.where(questions <= 3, questions * 0.18, 0.96), 0)
+
+    total = document_sum(sentiments)
+    total = np.where(total > 0, total + emphasis, np.where(total < 0, total - emphasis, total))
+    compound = np.clip(total / np.sqrt(total * total + 15), -1, 1)
+
+    positive = document_sum(np.where(sentiments > 0, sentiments + 1, 0.0))
+    negative = document_sum(np.where(sentiments < 0, sentiments - 1, 0.0))
+    neutral = document_sum(sentiments == 0)
+    positive_wins = positive > -negative
+    negative_wins = positive < -negative
+    positive = np.where(positive_wins, positive + emphasis, positive)
+    negative = np.where(negative_wins, negative - emphasis, negative)
+    size = positive - negative + neutral
+
+    # a text without any tokens scores 0 everywhere
+    has_tokens = np.diff(corpus['document_offsets']) > 0
+    size = np.where(has_tokens, size, 1)
+    # rounded with round, as np.round can land on the other side of a half
+    return pd.DataFrame({
+        'neg': _round(np.where(has_tokens, np.abs(negative / size), 0.0), 3),
+        'neu': _round(np.where(has_tokens, neutral / size, 0.0), 3),
+        'pos': _round(np.where(has_tokens, positive / size, 0.0), 3),
+        'compound': _round(np.where(has_tokens, compound, 0.0), 4),
+    })
+
+
+def _round(values, digits):
+    return np.array([round(value, digits) for value in values.tolist()])
+
+
+def polarity_scores(texts, lexicon=None):
+    # score a batch of texts, one row per text
+    lexicon = lexicon or compile_lexicon()
+    index = texts.index if isinstance(texts, pd.Series) else None
+    texts = [str(text).translate(lexicon['emoji_table']) for text in texts]
+    scores = score_corpus(build_corpus(texts), lexicon)
+    if index is not None:
+        scores.index = index
+    return scores
@@ -0,0 +1,161 @@
+import io
+import os
+import sys
+import gzip
+import json
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from Utility.read_utility import DATA_DIRECTORY, MONTHS, READERS, find_part_files
+
+# the zone map writer lives next to gather_clean_local.py, which writes them with the cleaned data
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'Gather and Clean'))
+
+from zone_maps import ZONE_MAP_FILE_NAME, ZONE_MAP_COLUMNS  # noqa: E402
+
+
+# Reading only the rows a range query can match: ranges maps a zone map column to inclusive
+# (low, high) bounds, either of which may be None, e.g. {'datetime': ('2016-10-01', None), 'score': (100, None)}.
+# Files and row groups whose zone maps rule the ranges out are never decompressed, the rows of the
+# rest are filtered exactly. Datetimes without a time zone are taken in PST, like submission_byhour.fix_date.
+
+ANALYSIS_TIMEZONE = 'Etc/GMT+8'
+
+
+def check_ranges(ranges):
+    # the ranges with the datetime bounds as time zone aware timestamps
+    checked = {}
+    for column, (low, high) in ranges.items():
+        if column not in ZONE_MAP_COLUMNS:
+            raise ValueError(f'{column!r} has no zone maps, pick one of {ZONE_MAP_COLUMNS}')
+        if column == 'datetime':
+            low, high = [None if bound is None else pd.Timestamp(bound) for bound in (low, high)]
+            low, high = [bound if bound is None or bound.tzinfo is not None else bound.tz_localize(ANALYSIS_TIMEZONE)
+                         for bound in (low, high)]
+        checked[column] = (low, high)
+    return checked
+
+
+def zone_bounds(column, low, high):
+    # the bounds in the units of the zone maps: datetimes as epoch seconds
+    if column != 'datetime':
+        return low, high
+    return [None if bound is None else bound.timestamp() for bound in (low, high)]
+
+
+def may_match(stats, rows, ranges):
+    # whether a file or row group can hold a row inside every range, from its min, max and null count
+    for column, (low, high) in ranges.items():
+        column_stats = stats[column]
+        if column_stats['nulls'] == rows:
+            return False
+        low, high = zone_bounds(column, low, high)
+        if low is not None and column_stats['max'] < low:
+            return False
+        if high is not None and column_stats['min'] > high:
+            return False
+    return True
+
+
+def load_zone_maps(month, data_directory=DATA_DIRECTORY):
+    # the zone maps of a month by part file path, leaving out files rewritten since they were recorded
+    path = os.path.join(data_directory, month, ZONE_MAP_FILE_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        zone_maps = json.load(f)
+
+    current = {}
+    for name, zone_map in zone_maps.items():
+        part_path = os.path.join(data_directory, month, name)
+        if os.path.exists(part_path):
+            file_stat = os.stat(part_path)
+            if file_stat.st_size == zone_map['size'] and file_stat.st_mtime_ns == zone_map['mtime_ns']:
+                current[part_path] = zone_map
+    return current
+
+
+def read_row_groups(path, row_groups, backend):
+    # decompress only the given row groups (gzip members) of a part file and parse their lines
+    data = []
+    with open(path, 'rb') as f:
+        for group in row_groups:
+            f.seek(group['offset'])
+            data.append(gzip.decompress(f.read(group['length'])))
+    return READERS[backend](io.BytesIO(b''.join(data)))
+
+
+def column_values(df, column):
+    if column == 'datetime':
+        return pd.to_datetime(df['datetime'], utc=True)
+    if column.endswith('_length'):
+        return df[column[:-len('_length')]].str.len()
+    return df[column]
+
+
+def range_mask(df, ranges):
+    # the rows inside every range, nulls never are
+    mask = pd.Series(True, index=df.index)
+    for column, (low, high) in ranges.items():
+        # a column null in every row read is left out of the frame
+        if (column[:-len('_length')] if column.endswith('_length') else column) not in df.columns:
+            return pd.Series(False, index=df.index)
+        values = column_values(df, column)
+        if low is not None:
+            mask &= values >= low
+        if high is not None:
+            mask &= values <= high
+    return mask
+
+
+def plan_reads(ranges, months=MONTHS, data_directory=DATA_DIRECTORY):
+    # (path, row groups to read or None for the whole file, bytes to read) of every file that may match,
+    # with the total number of bytes and row groups of all files
+    reads = []
+    total_bytes = total_groups = 0
+    for month in months:
+        zone_maps = load_zone_maps(month, data_directory)
+        for path in find_part_files(month, data_directory):
+            zone_map = zone_maps.get(path)
+            if zone_map is None:
+                # no zone maps: the whole file is read and filtered
+                size = os.path.getsize(path)
+                reads.append((path, None, size))
+                total_bytes += size
+                continue
+
+            total_bytes += zone_map['size']
+            total_groups += len(zone_map['row_groups'])
+            if not may_match(zone_map['columns'], zone_map['rows'], ranges):
+                continue
+            row_groups = [group for group in zone_map['row_groups'] if may_match(group['columns'], group['rows'], ranges)]
+            if row_groups:
+                reads.append((path, row_groups, sum(group['length'] for group in row_groups)))
+    return reads, total_bytes, total_groups
+
+
+def read_range(ranges, months=MONTHS, data_directory=DATA_DIRECTORY, max_workers=None, backend='pandas'):
+    # the rows of the given months inside every range, skipping what the zone maps rule out
+    ranges = check_ranges(ranges)
+    reads, total_bytes, total_groups = plan_reads(ranges, months, data_directory)
+
+    if max_workers is None:
+        max_workers = min(8, os.cpu_count() or 1)
+
+    def read(entry):
+        path, row_groups, _ = entry
+        return READERS[backend](path) if row_groups is None else read_row_groups(path, row_groups, backend)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        data_frames = list(executor.map(read, reads))
+
+    bytes_read = sum(size for _, _, size in reads)
+    groups_read = sum(len(row_groups) for _, row_groups, _ in reads if row_groups is not None)
+    unindexed = sum(row_groups is None for _, row_groups, _ in reads)
+    print(f'Read {bytes_read} of {total_bytes} compressed bytes ({bytes_read / max(total_bytes, 1):.1%}), '
+          f'{groups_read} of {total_groups} row groups' +
+          (f', {unindexed} files without zone maps read in full' if unindexed else ''))
+
+    if not data_frames:
+        return pd.DataFrame()
+    df = pd.concat(data_frames, ignore_index=True)
+    return df[range_mask(df, ranges)].reset_index(drop=True)
@@ -0,0 +1,261 @@
+import argparse
+import json
+import time
+import functools
+import numpy as np
+import pandas as pd
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qsl
+from Utility.lazy_utility import lazy_import
+from Utility.read_utility import READERS, read_data
+from Utility.filter_utility import SELFTEXT_RULES, pandas_mask
+from Utility.corpus_utility import load_corpus
+from readability import corpus_readability
+from submission_byhour import fix_date
+from sentiment import SENTIMENT_CLASSES, score_sentiment, compound_extractor
+
+stats = lazy_import('scipy.stats')
+
+
+# Loads the cleaned year once into a few NumPy columns and answers the analyses over HTTP, e.g.
+#   http://localhost:8050/hour?subreddit=AskReddit
+#   http://localhost:8050/split?feature=num_comments&start=2016-10-01&end=2016-12-31&min_comments=5
+# Every endpoint takes the filters subreddit (comma separated), start and end (YYYY-MM-DD, inclusive,
+# PST like submission_byhour.py) and min_comments; answers are cached by endpoint and query.
+
+# features a test can split on, and whether only posts with a selftext count (as in the scripts)
+FEATURES = {
+    'num_comments': False,
+    'subreddit_popularity': False,
+    'post_length': True,
+    'title_readability': True,
+    'selftext_readability': True,
+    'title_grade': True,
+    'selftext_grade': True,
+    'title_sentiment': False,
+    'selftext_sentiment': False,
+}
+
+# set by main: column name -> array over every post, plus the subreddit names of the codes
+DATASET = {}
+SUBREDDITS = []
+
+
+def load_dataset(reader='pandas', text_features=True, engine='fast'):
+    # read the cleaned year and keep only compact per-post columns
+    df = read_data(backend=reader)
+    datetime_pst = fix_date(df[['datetime']].copy())['datetime'].dt.tz_localize(None)
+    codes, names = pd.factorize(df['subreddit'])
+
+    data = {
+        'score': df['score'].to_numpy('float64'),
+        'num_comments': df['num_comments'].to_numpy('float64'),
+        'subreddit': codes.astype(np.int32),
+        'hour': datetime_pst.dt.hour.to_numpy(np.int8),
+        'day': datetime_pst.to_numpy().astype('datetime64[D]').astype(np.int32),
+        'has_selftext': pandas_mask(df, SELFTEXT_RULES).to_numpy(),
+        'post_length': df['selftext'].str.len().to_numpy('float64'),
+    }
+
+    if text_features:
+        # readability from the saved corpora (the same scores as textstat) and sentiment from the
+        # chosen VADER engine, as in sentiment.py --engine
+        sentiment = score_sentiment(df[['title', 'selftext']], engine)
+        for column in ['title', 'selftext']:
+            data[f'{column}_readability'], data[f'{column}_grade'] = corpus_readability(load_corpus(column, backend=reader))
+            data[f'{column}_sentiment'] = sentiment[f'{column}_sentiment_scores'].map(compound_extractor).to_numpy('float64')
+
+    return data, list(names)
+
+
+def select_rows(params):
+    # boolean mask of the posts matching the query's filters
+    mask = np.ones(len(DATASET['score']), dtype=bool)
+    if 'subreddit' in params:
+        wanted = [SUBREDDITS.index(name) for name in params['subreddit'].split(',') if name in SUBREDDITS]
+        mask &= np.isin(DATASET['subreddit'], wanted)
+    if 'start' in params:
+        mask &= DATASET['day'] >= np.datetime64(params['start'], 'D').astype(np.int32)
+    if 'end' in params:
+        mask &= DATASET['day'] <= np.datetime64(params['end'], 'D').astype(np.int32)
+    if 'min_comments' in params:
+        mask &= DATASET['num_comments'] >= float(params['min_comments'])
+    return mask
+
+
+def feature_values(feature, mask):
+    # score and feature of the selected posts that the feature applies to
+    if feature not in FEATURES:
+        raise ValueError(f"unknown feature {feature}, choose from {', '.join(FEATURES)}")
+    if FEATURES[feature]:
+        mask = mask & DATASET['has_selftext']
+    if feature == 'subreddit_popularity':
+        # posts per subreddit within the selection, as subreddit_popularity.py computes it
+        mask = mask & (DATASET['subreddit'] >= 0)
+        codes = DATASET['subreddit'][mask]
+        return DATASET['score'][mask], np.bincount(codes)[codes].astype('float64')
+    if feature not in DATASET:
+        raise ValueError(f'{feature} was not loaded, restart the server without --no-text-features')
+    return DATASET['score'][mask], DATASET[feature][mask]
+
+
+def number(value):
+    # JSON has no NaN
+    value = float(value)
+    return None if np.isnan(value) else value
+
+
+def hour_averages(params):
+    # average score for each hour (PST) and the linear fit of submission_byhour.py
+    mask = select_rows(params)
+    hours = DATASET['hour'][mask]
+    counts = np.bincount(hours, minlength=24)
+    with np.errstate(invalid='ignore'):
+        averages = np.bincount(hours, weights=DATASET['score'][mask], minlength=24) / counts
+    result = {'posts': int(mask.sum()), 'counts': counts.tolist(), 'averages': [number(value) for value in averages]}
+    if (counts > 0).all():
+        fit = stats.linregress(range(24), averages)
+        result['fit'] = {'slope': fit.slope, 'intercept': fit.intercept, 'rvalue': fit.rvalue, 'pvalue': fit.pvalue}
+    return result
+
+
+def median_split(params):
+    # high (> median) vs low (<= median) feature groups: Welch t-test and Mann-Whitney U, as in the scripts
+    score, values = feature_values(params.get('feature', 'num_comments'), select_rows(params))
+    median = np.median(values)
+    high = score[values > median]
+    low = score[values <= median]
+    if len(high) < 2 or len(low) < 2:
+        raise ValueError('too few posts on one side of the median')
+    t_test = stats.ttest_ind(high, low, equal_var=False)
+    u_test = stats.mannwhitneyu(high, low)
+    return {
+        'median': number(median),
+        'high': {'posts': len(high), 'mean_score': number(high.mean())},
+        'low': {'posts': len(low), 'mean_score': number(low.mean())},
+        'welch_t': {'statistic': number(t_test.statistic), 'pvalue': number(t_test.pvalue)},
+        'mann_whitney_u': {'statistic': number(u_test.statistic), 'pvalue': number(u_test.pvalue)},
+    }
+
+
+def anova(params):
+    # one-way ANOVA of score over the low/medium/high terciles of a feature, as in post_length.py
+    score, values = feature_values(params.get('feature', 'post_length'), select_rows(params))
+    if len(score) < 3:
+        raise ValueError('too few posts to split into terciles')
+    groups = pd.qcut(values, 3, labels=False, duplicates='drop')
+    samples = [score[groups == group] for group in range(int(np.nanmax(groups)) + 1)]
+    if len(samples) < 2:
+        raise ValueError('the feature does not separate into terciles for this selection')
+    if min(len(sample) for sample in samples) < 2:
+        raise ValueError('too few posts in one of the terciles')
+    result = stats.f_oneway(*samples)
+    return {
+        'groups': [{'posts': len(sample), 'mean_score': number(sample.mean())} for sample in samples],
+        'statistic': number(result.statistic),
+        'pvalue': number(result.pvalue),
+    }
+
+
+def sentiment_chi(params):
+    # chi-square of sentiment class vs score at or above the mean, laid out like sentiment.calculate_chi
+    text = params.get('text', 'selftext')
+    score, compound = feature_values(f'{text}_sentiment', select_rows(params))
+    if len(score) == 0:
+        raise ValueError('no posts match this selection')
+    sentiment = np.where(compound >= 0.05, 'positive', np.where(compound <= -0.05, 'negative', 'neutral'))
+    high = score >= score.mean()
+    table = np.array([[((sentiment == category) & ~high).sum() for category in SENTIMENT_CLASSES],
+                      [((sentiment == category) & high).sum() for category in SENTIMENT_CLASSES]])
+    result = stats.chi2_contingency(table)
+    return {
+        'columns': SENTIMENT_CLASSES,
+        'rows': ['low score', 'high score'],
+        'table': table.tolist(),
+        'statistic': number(result.statistic),
+        'pvalue': number(result.pvalue),
+    }
+
+
+def correlations(params):
+    # Pearson correlation of score with every loaded feature
+    mask = select_rows(params)
+    result = {}
+    for feature in FEATURES:
+        if feature in DATASET or feature == 'subreddit_popularity':
+            score, values = feature_values(feature, mask)
+            result[feature] = number(np.corrcoef(score, values)[0, 1]) if len(score) > 1 else None
+    return result
+
+
+def subreddit_counts(params):
+    # the most active subreddits within the selection
+    mask = select_rows(params) & (DATASET['subreddit'] >= 0)
+    counts = np.bincount(DATASET['subreddit'][mask], minlength=len(SUBREDDITS))
+    top = np.argsort(-counts, kind='stable')[:int(params.get('top', 10))]
+    return {SUBREDDITS[code]: int(counts[code]) for code in top if counts[code] > 0}
+
+
+ENDPOINTS = {
+    '/hour': hour_averages,
+    '/split': median_split,
+    '/anova': anova,
+    '/sentiment': sentiment_chi,
+    '/correlation': correlations,
+    '/subreddits': subreddit_counts,
+}
+
+
+@functools.lru_cache(maxsize=4096)
+def cached_answer(path, query):
+    # the JSON answer of one endpoint for one (sorted) query, computed once
+    if path not in ENDPOINTS:
+        raise ValueError(f"unknown endpoint {path}, choose from {', '.join(ENDPOINTS)}")
+    return json.dumps(ENDPOINTS[path](dict(query))).encode('utf-8')
+
+
+class AnalysisHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        start = time.perf_counter()
+        try:
+            status, body = 200, cached_answer(url.path, tuple(sorted(parse_qsl(url.query))))
+        except ValueError as error:
+            status, body = 400, json.dumps({'error': str(error)}).encode('utf-8')
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.log_message('%s answered in %.1f ms', self.path, (time.perf_counter() - start) * 1000)
+
+
+def main(reader='pandas', host='127.0.0.1', port=8050, text_features=True, engine='fast'):
+    global DATASET, SUBREDDITS
+
+    print('Loading the cleaned data. This may take several minutes please wait. . .')
+    DATASET, SUBREDDITS = load_dataset(reader, text_features, engine)
+    print(f"Loaded {len(DATASET['score'])} posts, serving on http://{host}:{port}")
+
+    server = ThreadingHTTPServer((host, port), AnalysisHandler)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve the analyses over HTTP from a dataset loaded once')
+    parser.add_argument('--reader', choices=sorted(READERS), default='pandas', help='parser of the JSON lines')
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on')
+    parser.add_argument('--port', type=int, default=8050, help='port to listen on')
+    parser.add_argument('--no-text-features', action='store_true',
+                        help='skip readability and sentiment to start faster')
+    parser.add_argument('--engine', choices=['exact', 'fast'], default='fast',
+                        help="VADER engine of the sentiment features: 'fast' (the default here) is the compiled lexicon "
+                             "engine, 'exact' is stock VADER like sentiment.py's default (slower to start)")
+    args = parser.parse_args()
+    main(reader=args.reader, host=args.host, port=args.port, text_features=not args.no_text_features,
+         engine=args.engine)
@@ -0,0 +1,122 @@
+import numpy as np
+import pandas as pd
+from Utility.lazy_utility import lazy_import, print_import_times
+from Utility.cli_utility import make_parser
+from Utility.read_utility import read_data
+from Utility.author_utility import author_features
+from Utility.grouped_utility import grouped_medians
+
+plt = lazy_import('matplotlib.pyplot')
+sns = lazy_import('seaborn')
+stats = lazy_import('scipy.stats')
+
+# author post counts are grouped as 1, 2, 3-5, 6-10 and 11+
+POST_COUNT_EDGES = [2, 3, 6, 11]
+POST_COUNT_LABELS = ['1', '2', '3-5', '6-10', '11+']
+
+
+def add_author_features(df, source):
+    # 'sample' counts each author's posts in the cleaned year itself, 'spark' takes the counts over the
+    # whole unsampled month written by gather_clean.py --author-features
+    if source == 'spark':
+        missing = [column for column in ['author_posts', 'author_mean_score', 'author_subreddits']
+                   if column not in df.columns]
+        if missing:
+            raise ValueError(f"the cleaned data has no {', '.join(missing)}, rerun gather_clean.py with --author-features")
+        posts = df['author_posts'].fillna(0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            df['author_other_mean_score'] = np.where(posts > 1, (df['author_mean_score'] * posts - df['score']) / (posts - 1),
+                                                     np.nan)
+        df['author_posts'] = posts
+    else:
+        features = author_features(df['author'], df['subreddit'], df['score'])
+        for column in features.columns:
+            df[column] = features[column]
+
+    # posts whose author is deleted or unknown have no activity to test
+    df.drop(df[df['author_posts'] < 1].index, inplace=True)
+
+
+def post_count_table(df):
+    # posts, mean and median score of each author post-count group
+    groups = np.digitize(df['author_posts'], POST_COUNT_EDGES)
+    score = df['score'].to_numpy('float64')
+    posts = np.bincount(groups, minlength=len(POST_COUNT_LABELS))
+    with np.errstate(invalid='ignore'):
+        mean_score = np.bincount(groups, weights=score, minlength=len(POST_COUNT_LABELS)) / posts
+    return pd.DataFrame({
+        'posts': posts,
+        'mean_score': mean_score,
+        'median_score': grouped_medians(groups, score, len(POST_COUNT_LABELS)),
+    }, index=pd.Index(POST_COUNT_LABELS, name='author_posts'))
+
+
+def test_prolific_authors(df):
+    # do posts of repeat authors score higher than posts of one-time authors,
+    # and does the author's score on their other posts predict this one?
+    repeat = df['author_posts'] > 1
+    t_statistic, t_pvalue = stats.ttest_ind(df.loc[repeat, 'score'], df.loc[~repeat, 'score'], equal_var=False)
+    u_statistic, u_pvalue = stats.mannwhitneyu(df.loc[repeat, 'score'], df.loc[~repeat, 'score'])
+    print(f'Repeat authors: {repeat.sum()} posts, mean score {df.loc[repeat, "score"].mean():.2f}; '
+          f'one-time authors: {(~repeat).sum()} posts, mean score {df.loc[~repeat, "score"].mean():.2f}')
+    print(f'Welch t-test statistic: {t_statistic}, p-value: {t_pvalue}')
+    print(f'Mann-Whitney U test statistic: {u_statistic}, p-value: {u_pvalue}')
+
+    for column in ['author_posts', 'author_subreddits', 'author_other_mean_score']:
+        valid = df[column].notna()
+        correlation, p_value = stats.spearmanr(df.loc[valid, column], df.loc[valid, 'score'])
+        print(f'Spearman correlation of {column} and score: {correlation:.4f}, p-value: {p_value}')
+
+
+def plot_post_count_table(table, save_path):
+
+    sns.set()
+    plt.close()
+
+    fig, ax = plt.subplots()
+    bars = ax.bar(range(len(table)), table['mean_score'], color='skyblue')
+    ax.set_xticks(range(len(table)))
+    ax.set_xticklabels(table.index)
+    ax.set_xlabel("Author's number of posts")
+    ax.set_ylabel('Mean score')
+    ax.set_title('Mean score of posts by how many posts their author made')
+
+    # Add the post counts on the bars
+    for bar, posts in zip(bars, table['posts']):
+        ax.text(bar.get_x() + bar.get_width() / 2, bar.get_height(), f'n={posts}', ha='center', va='bottom')
+
+    plt.savefig(save_path)
+
+
+def main(stats_only=False, reader='pandas', source='sample'):
+
+    # 1. Read in the reddit submission data
+    df = read_data(backend=reader)
+
+    # 2. Attach each author's post count, mean score and number of subreddits to their posts
+    add_author_features(df, source)
+
+    # 3. Scores by author post count
+    table = post_count_table(df)
+    with pd.option_context('display.precision', 2):
+        print(table.to_string())
+
+    # 4. Test whether prolific authors score higher
+    test_prolific_authors(df)
+
+    if stats_only:
+        return
+
+    # 5. Plot the mean score of each post-count group
+    plot_post_count_table(table, '../Graphs/author_activity.png')
+
+
+if __name__ == '__main__':
+    parser = make_parser('Test whether posts by prolific authors score higher')
+    parser.add_argument('--source', choices=['sample', 'spark'], default='sample',
+                        help="count each author's activity in the cleaned sample (sample), or use the per-month "
+                             'counts over all posts from gather_clean.py --author-features (spark)')
+    args = parser.parse_args()
+    main(stats_only=args.stats_only, reader=args.reader, source=args.source)
+    if args.import_times:
+        print_import_times()
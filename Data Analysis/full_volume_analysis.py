@@ -0,0 +1,128 @@
+import argparse
+import json
+import numpy as np
+import pandas as pd
+from Utility.lazy_utility import lazy_import, print_import_times
+from Utility.state_utility import moments_summary, quantile_from_counts
+from Utility.summary_utility import welch_from_moments, anova_from_moments, mann_whitney_from_counts
+from submission_byhour import create_fit
+
+plt = lazy_import('matplotlib.pyplot')
+sns = lazy_import('seaborn')
+stats = lazy_import('scipy.stats')
+
+SENTIMENT_CLASSES = ['positive', 'negative', 'neutral']
+
+
+# The tests of the analysis scripts run on the summaries "Gather and Clean/full_volume.py" computes in
+# Spark over every filtered post of the year, rather than on the 25,000-row monthly samples.
+
+
+# the moments of a group without posts, which Spark's groupBy leaves out of the summaries
+NO_POSTS = {'count': 0, 'mean': 0.0, 'm2': 0.0}
+
+
+def hour_averages(summary):
+    # average score in each hour (PST) from the per-hour moments, NaN for an hour without posts
+    return pd.Series([moments_summary(summary['hour'].get(str(hour), NO_POSTS))['mean'] for hour in range(24)],
+                     name='score')
+
+
+def print_hour_fit(averages, fit):
+    print('Score by hour:')
+    print(f' p-value: {fit.pvalue}')
+    print(f' r-value: {fit.rvalue}')
+    print(f' r-value squared: {fit.rvalue ** 2}')
+
+
+def print_split(feature, split):
+    # the median split tests and tercile ANOVA of one feature
+    high, low = split['median_split'].get('high', NO_POSTS), split['median_split'].get('low', NO_POSTS)
+    t_test = welch_from_moments(high, low)
+    u_statistic, u_pvalue = mann_whitney_from_counts(split['median_split_score_counts'].get('high', {}),
+                                                     split['median_split_score_counts'].get('low', {}))
+    f_statistic, f_pvalue = anova_from_moments([split['terciles'].get(group, NO_POSTS) for group in ['low', 'medium', 'high']])
+
+    print(f"{feature}: median {split['quantiles']['median']}, terciles at {split['quantiles']['lower']} "
+          f"and {split['quantiles']['upper']}")
+    for group in ['high', 'low']:
+        moments = moments_summary(split['median_split'].get(group, NO_POSTS))
+        median_score = quantile_from_counts(split['median_split_score_counts'].get(group, {}), 0.5)
+        print(f" {group}: {moments['count']} posts, mean score {moments['mean']:.2f}, median score {median_score}")
+    print(f' Welch t-test statistic: {t_test.statistic}, p-value: {t_test.pvalue}')
+    print(f' Mann-Whitney U test statistic: {u_statistic}, p-value: {u_pvalue}')
+    print(f' ANOVA one-way test statistic: {f_statistic}, p-value: {f_pvalue}')
+
+
+def print_sentiment(tables):
+    for text, table in tables.items():
+        res = stats.chi2_contingency(np.array(table))
+        print(f'{text} sentiment vs score at or above the mean: chi2 = {res.statistic}, p-value: {res.pvalue}')
+        print(pd.DataFrame(table, index=['low score', 'high score'], columns=SENTIMENT_CLASSES).to_string())
+
+
+def plot_summary(summary, averages, fit, save_path):
+
+    sns.set()
+    plt.close()
+
+    fig, axes = plt.subplots(2, 2, figsize=(12, 9))
+    axes = axes.ravel()
+
+    axes[0].plot(range(24), averages, 'b.-', markersize=10)
+    axes[0].plot(range(24), np.arange(24) * fit.slope + fit.intercept, '-', c='lightcoral')
+    axes[0].set_xlabel('Hours (24) - PST')
+    axes[0].set_ylabel('Average Scores')
+    axes[0].set_title('Average score in each hour, all posts')
+
+    for ax, (feature, split) in zip(axes[1:], summary['splits'].items()):
+        means = [moments_summary(split['terciles'].get(group, NO_POSTS))['mean'] for group in ['low', 'medium', 'high']]
+        ax.bar(range(3), means, color=['skyblue', 'lightcoral', 'skyblue'])
+        ax.set_xticks(range(3))
+        ax.set_xticklabels([f'Low {feature}', f'Medium {feature}', f'High {feature}'])
+        ax.set_ylabel('Mean score')
+        ax.set_title(f'Mean score by {feature} tercile, all posts')
+
+    plt.tight_layout()
+    plt.savefig(save_path)
+
+
+def main(summary_path, stats_only=False):
+    with open(summary_path) as f:
+        summary = json.load(f)
+
+    overall = moments_summary(summary['score'])
+    print(f"{overall['count']} posts in {summary['subreddits']} subreddits, "
+          f"mean score {overall['mean']:.2f}, std {overall['std']:.2f}")
+
+    # 1. Score by hour and its linear fit (over the hours that have posts)
+    averages = hour_averages(summary)
+    fit = create_fit(averages) if averages.notna().all() else stats.linregress(averages.dropna().index, averages.dropna())
+    print_hour_fit(averages, fit)
+
+    # 2. Median splits and terciles of every feature
+    for feature, split in summary['splits'].items():
+        print_split(feature, split)
+
+    # 3. Sentiment contingency tables, when the Spark job scored sentiment
+    if 'sentiment' in summary:
+        print_sentiment(summary['sentiment'])
+
+    if stats_only:
+        return
+
+    # 4. Plot the hour fit and tercile means
+    plot_summary(summary, averages, fit, '../Graphs/full_volume.png')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run the tests on the full-volume summaries from full_volume.py')
+    parser.add_argument('summary', help='JSON written by "Gather and Clean/full_volume.py"')
+    parser.add_argument('--stats-only', action='store_true',
+                        help='print the statistical results without importing the plotting stack or drawing graphs')
+    parser.add_argument('--import-times', action='store_true',
+                        help='print how long each lazily loaded dependency took to import')
+    args = parser.parse_args()
+    main(args.summary, stats_only=args.stats_only)
+    if args.import_times:
+        print_import_times()
@@ -0,0 +1,78 @@
+import time
+import numpy as np
+from Utility.lazy_utility import lazy_import
+from Utility.read_utility import read_data
+from Utility.polars_utility import scan_data, collect_frame_and_split
+import num_comments
+import post_length
+import subreddit_popularity
+
+stats = lazy_import('scipy.stats')
+
+
+def pandas_num_comments(df):
+    num_comments.filter_columns(df)
+    num_comments.filter_low_num_comments(df)
+    return df, num_comments.separate_scores_by_num_comments(df).values()
+
+
+def pandas_post_length(df):
+    post_length.filter_columns(df)
+    post_length.filter_low_selftext(df)
+    post_length.calculate_post_length(df)
+    return df, post_length.separate_scores_by_post_length(df).values()
+
+
+def pandas_subreddit_popularity(df):
+    subreddit_popularity.filter_columns(df)
+    subreddit_popularity.filter_nan_subreddit(df)
+    subreddit_popularity.groupby_subreddit_size(df)
+    return df, subreddit_popularity.separate_scores_by_subreddit_popularity(df).values()
+
+
+# feature -> (the eager pandas steps of the script, the script's lazy query)
+PIPELINES = {
+    'num_comments': (pandas_num_comments, num_comments.num_comments_query),
+    'post_length': (pandas_post_length, post_length.post_length_query),
+    'subreddit_popularity': (pandas_subreddit_popularity, subreddit_popularity.subreddit_popularity_query),
+}
+
+
+def compare_results(feature, expected, actual):
+    # the lazy path has to give the same rows, groups and test results as the pandas path, bit for bit
+    (expected_df, (expected_high, expected_low)), (actual_df, (actual_high, actual_low)) = expected, actual
+    differences = []
+    if not np.array_equal(expected_df[feature].to_numpy(), actual_df[feature].to_numpy()):
+        differences.append(feature)
+    for group, expected_scores, actual_scores in [('high', expected_high, actual_high), ('low', expected_low, actual_low)]:
+        if not np.array_equal(expected_scores.to_numpy(), actual_scores.to_numpy()):
+            differences.append(f'{group} group scores')
+        elif expected_scores.mean() != actual_scores.mean():
+            differences.append(f'{group} group mean')
+    if stats.mannwhitneyu(expected_high, expected_low) != stats.mannwhitneyu(actual_high, actual_low):
+        differences.append('Mann-Whitney U')
+    return differences
+
+
+def main():
+    for feature, (pandas_steps, query) in PIPELINES.items():
+        start = time.perf_counter()
+        expected = pandas_steps(read_data())
+        pandas_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        df, split = collect_frame_and_split(query(scan_data()), feature)
+        lazy_time = time.perf_counter() - start
+        actual = (df, (split['high'], split['low']))
+
+        differences = compare_results(feature, expected, actual)
+        print(f'{feature}: pandas {pandas_time:.2f}s, lazy Polars {lazy_time:.2f}s '
+              f'({pandas_time / lazy_time:.1f}x faster), {len(df)} rows')
+        if differences:
+            print(' differs from the pandas path in ' + ', '.join(differences))
+        else:
+            print(' identical to the pandas path')
+
+
+if __name__ == '__main__':
+    main()
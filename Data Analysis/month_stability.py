@@ -0,0 +1,231 @@
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+import numpy as np
+import pandas as pd
+from Utility.lazy_utility import lazy_import, print_import_times
+from Utility.cli_utility import make_parser
+from Utility.read_utility import MONTHS, read_data
+from Utility.progressive_utility import welch_summary, chi_square_summary
+from Utility.summary_utility import (heterogeneity, three_way_interaction, group_moments, merge_group_moments,
+                                   eta_squared, interaction_anova)
+from Utility.corpus_utility import month_corpus, select_documents
+from submission_byhour import fix_date, get_averages, create_fit
+from num_comments import filter_low_num_comments, separate_scores_by_num_comments
+from post_length import (filter_low_selftext, calculate_post_length, separate_scores_by_post_length,
+                         transform_post_length, separate_scores_by_low_medium_high as post_length_terciles)
+from subreddit_popularity import (filter_nan_subreddit, groupby_subreddit_size, separate_scores_by_subreddit_popularity,
+                                  transform_subreddit_popularity,
+                                  separate_scores_by_low_medium_high as subreddit_popularity_terciles)
+from readability import calculate_readability_from_corpus, separate_scores_by_readability
+from sentiment import get_cols, score_sentiment, get_category_sentiment, sentiment_table
+
+plt = lazy_import('matplotlib.pyplot')
+sns = lazy_import('seaborn')
+stats = lazy_import('scipy.stats')
+
+# what the estimate of each test is
+ESTIMATES = {
+    'hour_slope': 'slope of the mean score per hour',
+    'num_comments': 'mean score difference, high - low half',
+    'post_length': 'mean score difference, high - low half',
+    'subreddit_popularity': 'mean score difference, high - low half',
+    'post_length_anova': 'eta squared of the terciles',
+    'subreddit_popularity_anova': 'eta squared of the terciles',
+    'selftext_readability': 'mean score difference, high - low half',
+    'title_readability': 'mean score difference, high - low half',
+    'selftext_grade': 'mean score difference, high - low half',
+    'title_grade': 'mean score difference, high - low half',
+    'title_sentiment': "Cramer's V",
+    'selftext_sentiment': "Cramer's V",
+}
+
+
+def split_result(high, low):
+    # the Welch t-test of a median split (Cohen's d, mean difference and its standard error)
+    # with the Mann-Whitney U p-value the feature scripts print
+    high = np.asarray(high, dtype='float64')
+    low = np.asarray(low, dtype='float64')
+    result = welch_summary(high, low)
+    result['standard_error'] = np.sqrt(high.var(ddof=1) / len(high) + low.var(ddof=1) / len(low))
+    result['u_pvalue'] = stats.mannwhitneyu(high, low).pvalue
+    return result
+
+
+def anova_result(samples):
+    # the one-way ANOVA over the low/medium/high terciles the feature scripts run, with eta squared as
+    # its effect size and estimate; returns the result and the terciles' group_moments rows
+    moments = group_moments(samples)
+    result = stats.f_oneway(*samples)
+    eta, standard_error = eta_squared(moments)
+    return {'statistic': result.statistic, 'pvalue': result.pvalue, 'effect': eta, 'estimate': eta,
+            'standard_error': standard_error, 'ci_low': max(0.0, eta - 1.96 * standard_error),
+            'ci_high': min(1.0, eta + 1.96 * standard_error)}, moments
+
+
+def month_results(month, reader='pandas', engine='fast'):
+    # every test on one month, run in its own process, which reads only that month's file (and its
+    # saved corpora); returns the result rows and the tables their month-to-month checks need: the
+    # sentiment contingency tables and the group moments of the tercile ANOVAs
+    df = read_data([month], backend=reader)
+    results = {}
+    tables = {}
+
+    # submission_byhour: linear fit of the average score of each hour (PST)
+    fit = create_fit(get_averages(fix_date(df[['datetime', 'score']].copy())))
+    margin = stats.t.ppf(0.975, 22) * fit.stderr
+    results['hour_slope'] = {'statistic': fit.slope, 'pvalue': fit.pvalue, 'effect': fit.rvalue,
+                             'estimate': fit.slope, 'standard_error': fit.stderr,
+                             'ci_low': fit.slope - margin, 'ci_high': fit.slope + margin}
+
+    # num_comments, post_length and subreddit_popularity: median split of each feature
+    split = df[['score', 'num_comments']].copy()
+    filter_low_num_comments(split)
+    results['num_comments'] = split_result(*separate_scores_by_num_comments(split).values())
+
+    split = df[['score', 'selftext']].copy()
+    filter_low_selftext(split)
+    calculate_post_length(split)
+    results['post_length'] = split_result(*separate_scores_by_post_length(split).values())
+
+    # post_length and subreddit_popularity: one-way ANOVA over the terciles of the log feature
+    transform_post_length(split)
+    results['post_length_anova'], tables['post_length_anova'] = anova_result(list(post_length_terciles(split).values()))
+
+    split = df[['score', 'subreddit']].copy()
+    filter_nan_subreddit(split)
+    groupby_subreddit_size(split)
+    results['subreddit_popularity'] = split_result(*separate_scores_by_subreddit_popularity(split).values())
+    transform_subreddit_popularity(split)
+    results['subreddit_popularity_anova'], tables['subreddit_popularity_anova'] = anova_result(
+        list(subreddit_popularity_terciles(split).values()))
+
+    # readability: median splits of the corpus readability and grade of title and selftext
+    split = df[['score', 'title', 'selftext']].copy()
+    mask = filter_low_selftext(split)
+    corpora = {column: select_documents(month_corpus(month, column, backend=reader), mask)
+               for column in ['title', 'selftext']}
+    calculate_readability_from_corpus(split, corpora)
+    separated_scores = separate_scores_by_readability(split)
+    for column in ['selftext_readability', 'title_readability', 'selftext_grade', 'title_grade']:
+        results[column] = split_result(separated_scores[f'high_{column}'], separated_scores[f'low_{column}'])
+
+    # sentiment: chi-square of title and selftext sentiment vs a score at or above the mean
+    if engine:
+        sentiment = get_category_sentiment(score_sentiment(get_cols(df), engine))
+        for text in ['title', 'selftext']:
+            tables[f'{text}_sentiment'] = sentiment_table(sentiment, text)
+            results[f'{text}_sentiment'] = chi_square_summary(tables[f'{text}_sentiment'])
+
+    return [{'month': month, 'test': test, 'rows': len(df), **result} for test, result in results.items()], tables
+
+
+def heterogeneity_table(table, tables):
+    # whether each test's result is the same in every month: Cochran's Q and I^2 of the monthly
+    # estimates and their standard errors, except for the tests whose effect size is bounded at 0.
+    # For the sentiment tests (Cramer's V) the month x score x sentiment tables are tested for a
+    # three-way interaction, and for the tercile ANOVAs (eta squared) the month x tercile interaction
+    # of the score, i.e. whether the association changes from month to month
+    rows = []
+    for test, group in table.groupby('test', sort=False):
+        row = {'test': test, 'significant_months': int((group['pvalue'] < 0.05).sum()), 'months': len(group)}
+        if test.endswith('_anova'):
+            statistic, df, pvalue = interaction_anova(tables[test])
+            pooled = eta_squared(merge_group_moments(tables[test]))[0]
+            row.update({'method': 'F month x tercile interaction', 'pooled': pooled, 'pooled_se': np.nan,
+                        'statistic': statistic, 'df': df, 'pvalue': pvalue, 'i_squared': np.nan})
+        elif test in tables:
+            statistic, df, pvalue = three_way_interaction(tables[test])
+            pooled = chi_square_summary(np.sum(tables[test], axis=0))['effect']
+            row.update({'method': 'G2 three-way interaction', 'pooled': pooled, 'pooled_se': np.nan,
+                        'statistic': statistic, 'df': df, 'pvalue': pvalue, 'i_squared': np.nan})
+        else:
+            result = heterogeneity(group['estimate'], group['standard_error'])
+            row.update({'method': "Cochran's Q", 'pooled': result['pooled'], 'pooled_se': result['pooled_se'],
+                        'statistic': result['q'], 'df': result['df'], 'pvalue': result['pvalue'],
+                        'i_squared': result['i_squared']})
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def print_matrix(table, months, value, name):
+    print(f'{name} (month x test):')
+    matrix = table.pivot(index='month', columns='test', values=value)
+    matrix = matrix.reindex(index=months, columns=[test for test in ESTIMATES if test in matrix.columns])
+    with pd.option_context('display.width', 200, 'display.max_columns', None, 'display.precision', 3):
+        print(matrix.to_string())
+
+
+def plot_stability(table, summary, save_path):
+
+    sns.set()
+    plt.close()
+
+    tests = list(summary['test'])
+    columns = 3
+    fig, axes = plt.subplots(int(np.ceil(len(tests) / columns)), columns, figsize=(15, 4 * np.ceil(len(tests) / columns)),
+                             squeeze=False)
+
+    for ax, (_, row) in zip(axes.ravel(), summary.iterrows()):
+        group = table[table['test'] == row['test']]
+        positions = np.arange(len(group))
+        colors = np.where(group['pvalue'] < 0.05, 'lightcoral', 'skyblue')
+        ax.errorbar(positions, group['estimate'], fmt='none', ecolor='grey',
+                    yerr=[group['estimate'] - group['ci_low'], group['ci_high'] - group['estimate']])
+        ax.scatter(positions, group['estimate'], c=colors, zorder=3)
+        ax.axhline(row['pooled'], color='grey', linestyle='--', label='pooled')
+        ax.axhline(0, color='grey', linewidth=1)
+        ax.set_xticks(positions)
+        ax.set_xticklabels(group['month'], rotation=45)
+        ax.set_ylabel(ESTIMATES[row['test']])
+        if np.isnan(row['i_squared']):
+            ax.set_title(f"{row['test']}: month interaction p-value = {row['pvalue']:.2g}")
+        else:
+            ax.set_title(f"{row['test']}: I² = {row['i_squared']:.0%}, Q p-value = {row['pvalue']:.2g}")
+
+    for ax in axes.ravel()[len(tests):]:
+        ax.set_visible(False)
+
+    fig.suptitle('Each test on every month with 95% intervals (red: significant that month)')
+    plt.tight_layout()
+    plt.savefig(save_path)
+
+
+def main(stats_only=False, reader='pandas', months=MONTHS, engine='fast', workers=None, output=None):
+
+    # 1. Run every test on every month in a process pool, one worker per month
+    with ProcessPoolExecutor(max_workers=workers or len(months)) as executor:
+        month_outputs = list(executor.map(month_results, months, repeat(reader), repeat(engine)))
+    table = pd.DataFrame([row for rows, _ in month_outputs for row in rows])
+    tables = {test: [month_tables[test] for _, month_tables in month_outputs] for test in month_outputs[0][1]}
+
+    # 2. Print the month x test matrices of effect sizes and p-values
+    print_matrix(table, months, 'effect', "Effect sizes (r of the hour fit, Cohen's d of the splits, eta squared of the ANOVAs, Cramer's V)")
+    print_matrix(table, months, 'pvalue', 'p-values')
+    if output:
+        table.to_csv(output, index=False)
+
+    # 3. Test whether each effect is the same in every month
+    summary = heterogeneity_table(table, tables)
+    print('Heterogeneity across months:')
+    with pd.option_context('display.width', 200, 'display.max_columns', None, 'display.precision', 3):
+        print(summary.to_string(index=False))
+
+    if stats_only:
+        return
+
+    # 4. Plot every month's estimate of every test against the pooled estimate
+    plot_stability(table, summary, '../Graphs/month_stability.png')
+
+
+if __name__ == '__main__':
+    parser = make_parser('Run every test on each month separately and check whether the results agree')
+    parser.add_argument('--months', nargs='+', default=MONTHS, help='month folders to include')
+    parser.add_argument('--engine', choices=['exact', 'fast', 'none'], default='fast',
+                        help="sentiment engine of the chi-square tests ('none' skips them)")
+    parser.add_argument('--workers', type=int, help='worker processes (default: one per month)')
+    parser.add_argument('--output', metavar='PATH', help='save the month x test results as CSV to PATH')
+    args = parser.parse_args()
+    main(stats_only=args.stats_only, reader=args.reader, months=args.months,
+         engine=None if args.engine == 'none' else args.engine, workers=args.workers, output=args.output)
+    if args.import_times:
+        print_import_times()
@@ -0,0 +1,55 @@
+import argparse
+from Utility.read_utility import MONTHS
+from Utility.state_utility import (merged_states, moments_state, moments_summary,
+                                   quantile_from_counts, value_counts_state)
+from submission_byhour import hour_state
+from sentiment import sentiment_state
+from time_series import daily_state
+
+
+def summary_state(df):
+    # mergeable state of one month: score moments, score quantile summary and posts per subreddit
+    return {
+        'score': moments_state(df['score']),
+        'score_counts': value_counts_state(df['score']),
+        'subreddit_counts': value_counts_state(df['subreddit'].dropna()),
+    }
+
+
+# every analysis that keeps a per-month state, by the name it is saved under
+STATE_BUILDERS = {
+    'summary': summary_state,
+    'hour': hour_state,
+    'sentiment': sentiment_state,
+    'daily': daily_state,
+}
+
+
+def print_summary(state, top):
+    summary = moments_summary(state['score'])
+    print(f"Posts: {summary['count']}, mean score: {summary['mean']:.2f}, std: {summary['std']:.2f}")
+
+    for q in [0.25, 0.5, 0.75, 0.9, 0.99]:
+        print(f"Score quantile {q}: {quantile_from_counts(state['score_counts'], q)}")
+
+    subreddit_counts = sorted(state['subreddit_counts'].items(), key=lambda item: item[1], reverse=True)
+    print(f'Top {top} subreddits by number of posts:')
+    for subreddit, count in subreddit_counts[:top]:
+        print(f' {subreddit}: {count}')
+
+
+def main(months=MONTHS, reader='pandas', top=10):
+    # bring every month's saved state up to date (only new or re-cleaned months are processed)
+    # and print a summary of the merged year
+    states = merged_states(STATE_BUILDERS, months=months, backend=reader)
+
+    print_summary(states['summary'], top)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Update the saved per-month analysis states and summarise the year')
+    parser.add_argument('--months', nargs='+', default=MONTHS, help='month folders to include')
+    parser.add_argument('--reader', choices=['pandas', 'arrow', 'orjson'], default='pandas')
+    parser.add_argument('--top', type=int, default=10, help='number of subreddits to list')
+    args = parser.parse_args()
+    main(months=args.months, reader=args.reader, top=args.top)
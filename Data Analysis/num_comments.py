@@ -1,29 +1,15 @@
-import os
-import pandas as pd
-import matplotlib.pyplot as plt
-from scipy import stats
+from Utility.lazy_utility import lazy_import, print_import_times
+from Utility.cli_utility import make_parser, LAZY_HELP, DENSITY_HELP
+from Utility.read_utility import read_data
 from Utility.plot_utility import plot_mean_bar_graph
+from Utility.plot_utility_sweep import plot_split_sweep
+from Utility.plot_utility_density import plot_density_grid
+from Utility.split_utility import split_point_sweep, print_split_sweep
+from Utility.polars_utility import scan_data, collect_frame_and_split
 
-
-def read_data():
-    file_paths = [
-        'one/part-00000-9076dc6d-fa59-4c36-a0cf-8808e309da7b-c000.json.gz',
-        'two/part-00000-c7cf2076-eae1-4d0c-bce1-e7b0c43a3bf1-c000.json.gz',
-        'three/part-00000-662e59e6-5ee7-48da-a85f-1bcf09724f97-c000.json.gz',
-        'four/part-00000-3060ac52-6be0-4d42-a322-3e4a7954a4f4-c000.json.gz',
-        'five/part-00000-9c42996a-80d4-4a96-b59b-228f5e241a65-c000.json.gz',
-        'six/part-00000-5da94b81-55c0-42e7-b3dc-5a51a14e8589-c000.json.gz',
-        'seven/part-00000-eb573e13-d85e-400c-b3db-ffa9bd2d5543-c000.json.gz',
-        'eight/part-00000-61526e86-ba2d-4df5-a9d1-d043ca875b62-c000.json.gz',
-        'nine/part-00000-dc7c0356-fae4-47b8-a93a-f9b401cf70f0-c000.json.gz',
-        'ten/part-00000-f3ae3925-50c4-469e-8304-6007e9b4cdab-c000.json.gz',
-        'eleven/part-00000-2aa1781a-723e-49c4-a488-47ca50409657-c000.json.gz',
-        'twelve/part-00000-7ff282ff-fa5e-494c-ab5c-59f07d2a2f0d-c000.json.gz',
-    ]
-    
-    data_frames = [pd.read_json(os.path.join('..', 'Cleaned Data', fp), lines=True) for fp in file_paths]
-    
-    return pd.concat(data_frames, ignore_index=True)
+plt = lazy_import('matplotlib.pyplot')
+stats = lazy_import('scipy.stats')
+pl = lazy_import('polars')
 
 
 def filter_columns(df):
@@ -42,6 +28,11 @@ def filter_low_num_comments(df):
     df.drop(df[~mask].index, inplace=True)
 
 
+def num_comments_query(lf):
+    # filter_columns and filter_low_num_comments as a lazy query, pushed down to the file scan
+    return lf.select('score', 'num_comments').filter(pl.col('num_comments') >= 1)
+
+
 def separate_scores_by_num_comments(df):
     median_num_comments = df['num_comments'].median()
 
@@ -81,26 +72,46 @@ def perform_mann_whitney_u(high_num_comments_score, low_num_comments_score):
     print(interpret_mannwhitneyu(p_value))
 
 
-def main():
-    
-    # 1. Read in the reddit submission data
-    df = read_data()
-    # 2. Filter out unncessary columns
-    filter_columns(df)
-    
-    # 3. Filter out num_comments with no words
-    filter_low_num_comments(df)
-    
-    # 4. Separate scores by num_comments
-    separated_scores = separate_scores_by_num_comments(df)
+def main(stats_only=False, reader='pandas', split_sweep=False, lazy=False, density=False):
+
+    if lazy:
+        # 1-4. Read, filter and separate scores by num_comments as one lazy Polars query
+        df, split = collect_frame_and_split(num_comments_query(scan_data()), 'num_comments')
+        separated_scores = {'high_num_comments_score': split['high'], 'low_num_comments_score': split['low']}
+    else:
+        # 1. Read in the reddit submission data
+        df = read_data(backend=reader)
+        # 2. Filter out unncessary columns
+        filter_columns(df)
+
+        # 3. Filter out num_comments with no words
+        filter_low_num_comments(df)
+
+        # 4. Separate scores by num_comments
+        separated_scores = separate_scores_by_num_comments(df)
     
     # 5. Test if the distributions of the two groups are similar
     high_num_comments_score, low_num_comments_score = separated_scores['high_num_comments_score'], separated_scores['low_num_comments_score']
-    test_similar_distribution(high_num_comments_score, low_num_comments_score)
+    if not stats_only:
+        test_similar_distribution(high_num_comments_score, low_num_comments_score)
     
     # 6. Perform Mann-Whitney U test
     perform_mann_whitney_u(high_num_comments_score, low_num_comments_score)
+
+    # Sweep every split point of num_comments instead of only the median
+    if split_sweep:
+        sweep = split_point_sweep(df['num_comments'], df['score'])
+        print_split_sweep('num_comments', sweep, df['num_comments'].median())
+        if not stats_only:
+            plot_split_sweep(sweep,
+                             df['num_comments'].median(),
+                             'Score of high vs low num_comments groups at every split point',
+                             'num_comments split point (low group <= split)',
+                             '../Graphs/num_comments_split_sweep.png')
     
+    if stats_only:
+        return
+
     # 7. Plot bar graphs of mean number of comments to demonstrate signicant difference
     # Plot mean scores of high/low num_comments
     plot_mean_bar_graph(high_num_comments_score,
@@ -110,6 +121,25 @@ def main():
                         'Reddit Post Scores', 
                         '../Graphs/num_comments.png')
 
+    # Plot score against num_comments as a density grid instead of a scatter plot
+    if density:
+        plot_density_grid(df['num_comments'],
+                          df['score'],
+                          'Score vs num_comments',
+                          'num_comments',
+                          'Score',
+                          '../Graphs/num_comments_density.png',
+                          log_x=True, log_y=True)
+
 
 if __name__ == '__main__':
-    main()
+    parser = make_parser('Test whether the number of comments affects the score of a post')
+    parser.add_argument('--split-sweep', action='store_true',
+                        help='also test every split point of the feature, not only the median')
+    parser.add_argument('--lazy', action='store_true', help=LAZY_HELP)
+    parser.add_argument('--density', action='store_true', help=DENSITY_HELP)
+    args = parser.parse_args()
+    main(stats_only=args.stats_only, reader=args.reader, split_sweep=args.split_sweep, lazy=args.lazy,
+         density=args.density)
+    if args.import_times:
+        print_import_times()
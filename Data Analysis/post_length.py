@@ -1,31 +1,19 @@
-import os
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-from scipy import stats
+from Utility.lazy_utility import lazy_import, print_import_times
+from Utility.cli_utility import make_parser, LAZY_HELP, DENSITY_HELP
+from Utility.read_utility import read_data
+from Utility.filter_utility import SELFTEXT_RULES, pandas_mask, polars_filter
 from Utility.plot_utility import plot_mean_bar_graph
+from Utility.plot_utility_sweep import plot_split_sweep
+from Utility.split_utility import split_point_sweep, print_split_sweep
 from Utility.plot_utility_anova import plot_mean_bar_graph_3candidates
+from Utility.plot_utility_density import plot_density_grid
+from Utility.polars_utility import scan_data, collect_frame_and_split
 
-
-def read_data():
-    file_paths = [
-        'one/part-00000-9076dc6d-fa59-4c36-a0cf-8808e309da7b-c000.json.gz',
-        'two/part-00000-c7cf2076-eae1-4d0c-bce1-e7b0c43a3bf1-c000.json.gz',
-        'three/part-00000-662e59e6-5ee7-48da-a85f-1bcf09724f97-c000.json.gz',
-        'four/part-00000-3060ac52-6be0-4d42-a322-3e4a7954a4f4-c000.json.gz',
-        'five/part-00000-9c42996a-80d4-4a96-b59b-228f5e241a65-c000.json.gz',
-        'six/part-00000-5da94b81-55c0-42e7-b3dc-5a51a14e8589-c000.json.gz',
-        'seven/part-00000-eb573e13-d85e-400c-b3db-ffa9bd2d5543-c000.json.gz',
-        'eight/part-00000-61526e86-ba2d-4df5-a9d1-d043ca875b62-c000.json.gz',
-        'nine/part-00000-dc7c0356-fae4-47b8-a93a-f9b401cf70f0-c000.json.gz',
-        'ten/part-00000-f3ae3925-50c4-469e-8304-6007e9b4cdab-c000.json.gz',
-        'eleven/part-00000-2aa1781a-723e-49c4-a488-47ca50409657-c000.json.gz',
-        'twelve/part-00000-7ff282ff-fa5e-494c-ab5c-59f07d2a2f0d-c000.json.gz',
-    ]
-    
-    data_frames = [pd.read_json(os.path.join('..', 'Cleaned Data', fp), lines=True) for fp in file_paths]
-    
-    return pd.concat(data_frames, ignore_index=True)
+plt = lazy_import('matplotlib.pyplot')
+stats = lazy_import('scipy.stats')
+pl = lazy_import('polars')
 
 
 def filter_columns(df):
@@ -39,16 +27,25 @@ def filter_columns(df):
     
     
 def filter_low_selftext(df):
-    # Filter out selftext with no words
-    mask = df['selftext'].apply(lambda x: len(str(x).split()) >= 1) & ~(df['selftext'].isin(['[removed]', '[deleted]']))
+    # Filter out selftext with no words, with the same rule gather_clean.py applies
+    mask = pandas_mask(df, SELFTEXT_RULES)
     df.drop(df[~mask].index, inplace=True)
-    
+    return mask.to_numpy()
+
 
 def calculate_post_length(df):
     df['post_length'] = df['selftext'].str.len()
     df = df.sort_values('post_length')
 
 
+def post_length_query(lf):
+    # filter_columns, filter_low_selftext and calculate_post_length as a lazy query: the selftext rule
+    # is pushed down to the file scan and the length counts characters like str.len
+    return (lf.select('score', 'selftext')
+              .filter(polars_filter(SELFTEXT_RULES))
+              .with_columns(pl.col('selftext').str.len_chars().cast(pl.Int64).alias('post_length')))
+
+
 def separate_scores_by_post_length(df):
     median_post_length = df['post_length'].median()
     
@@ -142,37 +139,55 @@ def perform_anova(low_post_length, medium_post_length, high_post_length):
     print(interpret_anova(p_value))
     
 
-def main():
-    
-    # 1. Read in the reddit submission data
-    df = read_data()
+def main(stats_only=False, reader='pandas', split_sweep=False, lazy=False, density=False):
 
-    # 2. Filter out unncessary columns
-    filter_columns(df)
-    
-    # 3. Filter out NaN subreddits
-    filter_low_selftext(df)
-    
-    # 4. Calculate post length
-    calculate_post_length(df)
-    
-    # 5. Separate scores by post length
-    separated_scores = separate_scores_by_post_length(df)
+    if lazy:
+        # 1-5. Read, filter, calculate post length and separate scores as one lazy Polars query
+        df, split = collect_frame_and_split(post_length_query(scan_data()), 'post_length')
+        separated_scores = {'high_post_length_score': split['high'], 'low_post_length_score': split['low']}
+    else:
+        # 1. Read in the reddit submission data
+        df = read_data(backend=reader)
+
+        # 2. Filter out unncessary columns
+        filter_columns(df)
+
+        # 3. Filter out NaN subreddits
+        filter_low_selftext(df)
+
+        # 4. Calculate post length
+        calculate_post_length(df)
+
+        # 5. Separate scores by post length
+        separated_scores = separate_scores_by_post_length(df)
     high_post_length_score, low_post_length_score = separated_scores['high_post_length_score'], separated_scores['low_post_length_score']
     
     # 6. Test if the distributions of the two groups are similar
-    test_similar_distribution(high_post_length_score, low_post_length_score)
+    if not stats_only:
+        test_similar_distribution(high_post_length_score, low_post_length_score)
     
     # 6. Perform Mann-Whitney U test
     perform_mann_whitney_u(high_post_length_score, low_post_length_score)
+
+    # Sweep every split point of post_length instead of only the median
+    if split_sweep:
+        sweep = split_point_sweep(df['post_length'], df['score'])
+        print_split_sweep('post_length', sweep, df['post_length'].median())
+        if not stats_only:
+            plot_split_sweep(sweep,
+                             df['post_length'].median(),
+                             'Score of high vs low post_length groups at every split point',
+                             'post_length split point (low group <= split)',
+                             '../Graphs/post_length_split_sweep.png')
     
     # 7. Plot bar graphs of mean number of comments to demonstrate signicant difference
-    plot_mean_bar_graph(high_post_length_score,
-                        low_post_length_score, 
-                        'Mean scores of Reddit posts of high/low post_length groups', 
-                        ['High Post Length', 'Low Post Length Scores'], 
-                        'Reddit Post Scores', 
-                        '../Graphs/post_length.png')
+    if not stats_only:
+        plot_mean_bar_graph(high_post_length_score,
+                            low_post_length_score, 
+                            'Mean scores of Reddit posts of high/low post_length groups', 
+                            ['High Post Length', 'Low Post Length Scores'], 
+                            'Reddit Post Scores', 
+                            '../Graphs/post_length.png')
 
     # 8. Perform normal test on post_length
     perform_normal_test(df)
@@ -181,11 +196,12 @@ def main():
     transform_post_length(df)
     
     # 10. Plot histogram of transformed post_length
-    plt.hist(df['post_length_log'], bins=50)
-    plt.xlabel('Post Length')
-    plt.ylabel('Frequency')
-    plt.title('Histogram of log transformed post_length')
-    plt.show()
+    if not stats_only:
+        plt.hist(df['post_length_log'], bins=50)
+        plt.xlabel('Post Length')
+        plt.ylabel('Frequency')
+        plt.title('Histogram of log transformed post_length')
+        plt.show()
     # plt.savefig('../Graphs/post_length_log_transformed_histogram.png')
     
     '''
@@ -199,6 +215,9 @@ def main():
     # 12. Perform ANOVA
     perform_anova(low_post_length_anova, medium_post_length_anova, high_post_length_anova)
     
+    if stats_only:
+        return
+
     # 13. Plot bar graphs of mean number of comments to demonstrate signicant difference
     plot_mean_bar_graph_3candidates(high_post_length_anova,
                         medium_post_length_anova, 
@@ -207,7 +226,26 @@ def main():
                         ['High Post Length', 'Medium Post Length', 'Low Post Length'], 
                         'Reddit Post Scores', 
                         '../Graphs/post_length_anova.png')
+
+    # 14. Plot score against post_length as a density grid instead of a scatter plot
+    if density:
+        plot_density_grid(df['post_length'],
+                          df['score'],
+                          'Score vs post_length',
+                          'post_length',
+                          'Score',
+                          '../Graphs/post_length_density.png',
+                          log_x=True, log_y=True)
         
         
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    parser = make_parser('Test whether the length of a post affects its score')
+    parser.add_argument('--split-sweep', action='store_true',
+                        help='also test every split point of the feature, not only the median')
+    parser.add_argument('--lazy', action='store_true', help=LAZY_HELP)
+    parser.add_argument('--density', action='store_true', help=DENSITY_HELP)
+    args = parser.parse_args()
+    main(stats_only=args.stats_only, reader=args.reader, split_sweep=args.split_sweep, lazy=args.lazy,
+         density=args.density)
+    if args.import_times:
+        print_import_times()
\ No newline at end of file
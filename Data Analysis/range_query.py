@@ -0,0 +1,64 @@
+import argparse
+import time
+import pandas as pd
+from Utility.read_utility import MONTHS, READERS, read_data
+from Utility.zone_map_utility import read_range, range_mask, check_ranges
+
+
+def build_ranges(start=None, end=None, min_score=None, max_score=None, min_comments=None):
+    # the zone map ranges of the command line filters, end is a whole day like start
+    ranges = {}
+    if start or end:
+        end = None if end is None else pd.Timestamp(end) + pd.Timedelta(days=1) - pd.Timedelta(microseconds=1)
+        ranges['datetime'] = (start, end)
+    if min_score is not None or max_score is not None:
+        ranges['score'] = (min_score, max_score)
+    if min_comments is not None:
+        ranges['num_comments'] = (min_comments, None)
+    return ranges
+
+
+def summarize(df, top):
+    print(f'{len(df)} posts in {df["subreddit"].nunique()} subreddits')
+    print(f'Score: mean {df["score"].mean():.2f}, median {df["score"].median()}, max {df["score"].max()}')
+    print(f'Top {top} subreddits by number of posts:')
+    for subreddit, count in df['subreddit'].value_counts().head(top).items():
+        print(f' {subreddit}: {count}')
+
+
+def main(ranges, months=MONTHS, reader='pandas', top=10, compare=False):
+
+    # 1. Read only the row groups the zone maps cannot rule out
+    start = time.perf_counter()
+    df = read_range(ranges, months, backend=reader)
+    print(f'Range read: {time.perf_counter() - start:.2f}s')
+
+    # 2. Optionally check it against reading every file in full and filtering afterwards
+    if compare:
+        start = time.perf_counter()
+        full = read_data(months, backend=reader)
+        full = full[range_mask(full, check_ranges(ranges))].reset_index(drop=True)
+        same = len(full) == len(df) and (len(df) == 0 or full['name'].equals(df['name']))
+        print(f'Full read: {time.perf_counter() - start:.2f}s, same rows: {same}')
+
+    # 3. Summarise the posts in range
+    if len(df):
+        summarize(df, top)
+    else:
+        print('No posts in range')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Read only the posts inside a date and score range, using the zone maps')
+    parser.add_argument('--start', help='first day (YYYY-MM-DD, PST)')
+    parser.add_argument('--end', help='last day (YYYY-MM-DD, PST), inclusive')
+    parser.add_argument('--min-score', type=int, help='lowest score')
+    parser.add_argument('--max-score', type=int, help='highest score')
+    parser.add_argument('--min-comments', type=int, help='fewest comments')
+    parser.add_argument('--months', nargs='+', default=MONTHS, help='month folders to include')
+    parser.add_argument('--reader', choices=sorted(READERS), default='pandas', help='parser of the JSON lines')
+    parser.add_argument('--top', type=int, default=10, help='number of subreddits to list')
+    parser.add_argument('--compare', action='store_true', help='also read every file in full and compare the rows')
+    args = parser.parse_args()
+    main(build_ranges(args.start, args.end, args.min_score, args.max_score, args.min_comments),
+         months=args.months, reader=args.reader, top=args.top, compare=args.compare)
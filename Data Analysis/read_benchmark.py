@@ -0,0 +1,47 @@
+import time
+import pandas as pd
+from Utility.read_utility import MONTHS, READERS, find_part_files
+
+
+def time_backend(backend, paths):
+    # parse every file one after another so the timing measures the parser, not the thread pool
+    start = time.perf_counter()
+    data_frames = [READERS[backend](path) for path in paths]
+    elapsed = time.perf_counter() - start
+    return elapsed, pd.concat(data_frames, ignore_index=True)
+
+
+def compare_frames(expected, actual):
+    # list the columns whose dtype or values differ from the pd.read_json result
+    differences = []
+    for column in expected.columns.union(actual.columns):
+        if column not in actual.columns or column not in expected.columns:
+            differences.append(f'{column}: missing')
+            continue
+        try:
+            pd.testing.assert_series_equal(expected[column], actual[column])
+        except AssertionError:
+            differences.append(f'{column}: {expected[column].dtype} vs {actual[column].dtype}')
+    return differences
+
+
+def main():
+    paths = [path for month in MONTHS for path in find_part_files(month)]
+
+    baseline_time, baseline = time_backend('pandas', paths)
+    print(f'pandas: {baseline_time:.2f}s for {len(baseline)} rows in {len(paths)} files')
+
+    for backend in READERS:
+        if backend == 'pandas':
+            continue
+        elapsed, df = time_backend(backend, paths)
+        differences = compare_frames(baseline, df)
+        print(f'{backend}: {elapsed:.2f}s ({baseline_time / elapsed:.1f}x faster than pandas)')
+        if differences:
+            print(' differs from pd.read_json in ' + ', '.join(differences))
+        else:
+            print(' identical to pd.read_json')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,29 +1,21 @@
-import os
-import pandas as pd
-from scipy import stats
-import textstat.textstat
+import re
+import numpy as np
+from Utility.lazy_utility import lazy_import, print_import_times
+from Utility.cli_utility import make_parser, DENSITY_HELP
+from Utility.read_utility import read_data
+from Utility.filter_utility import SELFTEXT_RULES, pandas_mask
+from Utility.corpus_utility import load_corpus, select_documents, vocabulary, document_ids, document_lengths
 from Utility.plot_utility import plot_mean_bar_graph
+from Utility.plot_utility_sweep import plot_split_sweep
+from Utility.plot_utility_density import plot_density_grid
+from Utility.split_utility import split_point_sweep, print_split_sweep
+from Utility.progressive_utility import progressive_run, welch_summary
 
+stats = lazy_import('scipy.stats')
+textstat = lazy_import('textstat')
 
-def read_data():
-    file_paths = [
-        'one/part-00000-9076dc6d-fa59-4c36-a0cf-8808e309da7b-c000.json.gz',
-        'two/part-00000-c7cf2076-eae1-4d0c-bce1-e7b0c43a3bf1-c000.json.gz',
-        'three/part-00000-662e59e6-5ee7-48da-a85f-1bcf09724f97-c000.json.gz',
-        'four/part-00000-3060ac52-6be0-4d42-a322-3e4a7954a4f4-c000.json.gz',
-        'five/part-00000-9c42996a-80d4-4a96-b59b-228f5e241a65-c000.json.gz',
-        'six/part-00000-5da94b81-55c0-42e7-b3dc-5a51a14e8589-c000.json.gz',
-        'seven/part-00000-eb573e13-d85e-400c-b3db-ffa9bd2d5543-c000.json.gz',
-        'eight/part-00000-61526e86-ba2d-4df5-a9d1-d043ca875b62-c000.json.gz',
-        'nine/part-00000-dc7c0356-fae4-47b8-a93a-f9b401cf70f0-c000.json.gz',
-        'ten/part-00000-f3ae3925-50c4-469e-8304-6007e9b4cdab-c000.json.gz',
-        'eleven/part-00000-2aa1781a-723e-49c4-a488-47ca50409657-c000.json.gz',
-        'twelve/part-00000-7ff282ff-fa5e-494c-ab5c-59f07d2a2f0d-c000.json.gz',
-    ]
-    
-    data_frames = [pd.read_json(os.path.join('..', 'Cleaned Data', fp), lines=True) for fp in file_paths]
-    
-    return pd.concat(data_frames, ignore_index=True)
+# the sentence boundaries of textstat.sentence_count
+SENTENCE_BREAK = re.compile(r'[.!?]+')
 
 
 def filter_columns(df):
@@ -38,9 +30,10 @@ def filter_columns(df):
 
 
 def filter_low_selftext(df):
-    # Filter out selftext with no words
-    mask = df['selftext'].apply(lambda x: len(str(x).split()) >= 1) & ~(df['selftext'].isin(['[removed]', '[deleted]']))
+    # Filter out selftext with no words, with the same rule gather_clean.py applies
+    mask = pandas_mask(df, SELFTEXT_RULES)
     df.drop(df[~mask].index, inplace=True)
+    return mask.to_numpy()
 
 
 def calculate_readability(df):
@@ -55,6 +48,117 @@ def calculate_readability(df):
         textstat.dale_chall_readability_score)
 
 
+def legacy_round(values, points):
+    # textstat's rounding (half away from zero), for whole arrays
+    p = 10 ** points
+    return np.floor(values * p + np.copysign(0.5, values)) / p
+
+
+def token_words(text):
+    # textstat's word count (at most 1 for a single token or a piece of one)
+    return len(textstat.remove_punctuation(text).split())
+
+
+def vocabulary_readability(tokens):
+    # textstat's per-word quantities, computed once per distinct token instead of once per occurrence:
+    # whether the token is a word once punctuation is removed, its syllables and its difficult words
+    is_word = np.array([token_words(token) for token in tokens], dtype=np.float64)
+    syllables = np.array([textstat.syllable_count(token) for token in tokens], dtype=np.float64)
+
+    # textstat ends a sentence at every run of . ! or ?, also inside a token (1.99, U.S.), so each token
+    # records how many runs it holds and the words of its pieces before the first and after the last
+    pieces = [SENTENCE_BREAK.split(token) for token in tokens]
+    breaks = np.array([len(parts) - 1 for parts in pieces], dtype=np.int64)
+    first_words = np.array([token_words(parts[0]) for parts in pieces], dtype=np.float64)
+    last_words = np.array([token_words(parts[-1]) for parts in pieces], dtype=np.float64)
+
+    difficult_ids = {}
+    difficult_offsets = [0]
+    difficult_words = []
+    for token in tokens:
+        for word in set(re.findall(r"[\w\='‘’]+", token.lower())):
+            if textstat.is_difficult_word(word, 0):
+                difficult_words.append(difficult_ids.setdefault(word, len(difficult_ids)))
+        difficult_offsets.append(len(difficult_words))
+
+    sentence_pieces = (breaks, first_words, last_words)
+    return is_word, syllables, sentence_pieces, np.array(difficult_offsets), np.array(difficult_words, dtype=np.int64)
+
+
+def corpus_sentences(token_ids, documents, num_documents, is_word, sentence_pieces):
+    # textstat's sentence count of every document: the text split at every . ! or ? run, keeping the
+    # pieces of more than two words, at least one per document. A token with a break adds its first
+    # piece's words to the running sentence and starts a new one with its last piece's words; the
+    # pieces between two breaks of one token hold a single word at most, so they never count
+    breaks, first_words, last_words = sentence_pieces
+    has_break = breaks[token_ids] > 0
+    head = np.where(has_break, first_words[token_ids], is_word[token_ids])
+    tail = np.where(has_break, last_words[token_ids], 0.0)
+
+    # every document and every token with a break starts a new sentence
+    head_sentence = np.cumsum(has_break) - has_break + documents
+    tail_sentence = head_sentence + 1
+    num_sentences = int(head_sentence[-1]) + 2 if len(head_sentence) else 0
+    sentence_words = np.bincount(np.concatenate([head_sentence, tail_sentence]), weights=np.concatenate([head, tail]),
+                                 minlength=num_sentences)
+    sentence_documents = np.zeros(num_sentences, dtype=np.int64)
+    sentence_documents[head_sentence] = documents
+    sentence_documents[tail_sentence[has_break]] = documents[has_break]
+    return np.maximum(1, np.bincount(sentence_documents, weights=sentence_words > 2, minlength=num_documents))
+
+
+def corpus_readability(corpus):
+    # Flesch reading ease and Dale-Chall score of every document from the pre-tokenized corpus,
+    # following textstat's formulas with per-document sums instead of re-parsing each text
+    is_word, syllables, sentence_pieces, difficult_offsets, difficult_words = vocabulary_readability(vocabulary(corpus))
+    token_ids = corpus['token_ids']
+    documents = document_ids(corpus)
+    num_documents = len(document_lengths(corpus))
+
+    token_is_word = is_word[token_ids]
+    words = np.bincount(documents, weights=token_is_word, minlength=num_documents)
+    syllable_counts = np.bincount(documents, weights=syllables[token_ids], minlength=num_documents)
+
+    sentences = corpus_sentences(token_ids, documents, num_documents, is_word, sentence_pieces)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sentence_length = legacy_round(words / sentences, 1)
+        syllables_per_word = np.where(words > 0, legacy_round(syllable_counts / words, 1), 0.0)
+    flesch = legacy_round(206.835 - 1.015 * sentence_length - 84.6 * syllables_per_word, 2)
+
+    # distinct difficult words per document, from (document, difficult word) pairs
+    token_difficult = np.diff(difficult_offsets)[token_ids]
+    pair_documents = np.repeat(documents, token_difficult)
+    pair_positions = np.repeat(difficult_offsets[token_ids] - np.cumsum(token_difficult) + token_difficult,
+                               token_difficult) + np.arange(token_difficult.sum())
+    pair_keys = np.unique(pair_documents * len(difficult_offsets) + difficult_words[pair_positions])
+    difficult = np.bincount(pair_keys // len(difficult_offsets), minlength=num_documents)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        per_difficult_words = 100 - (words - difficult) / words * 100
+    dale_chall = 0.1579 * per_difficult_words + 0.0496 * sentence_length
+    dale_chall = np.where(per_difficult_words > 5, dale_chall + 3.6365, dale_chall)
+    dale_chall = np.where(words > 0, legacy_round(dale_chall, 2), 0.0)
+
+    return flesch, dale_chall
+
+
+def calculate_readability_from_corpus(df, corpora):
+    # Perform readability score from the pre-tokenized title and selftext corpora
+    df['title_readability'], df['title_grade'] = corpus_readability(corpora['title'])
+    df['selftext_readability'], df['selftext_grade'] = corpus_readability(corpora['selftext'])
+
+
+def readability_features(df, rows, corpora=None):
+    # Perform readability score for the given row positions only
+    batch = df.iloc[rows].copy()
+    if corpora is None:
+        calculate_readability(batch)
+    else:
+        calculate_readability_from_corpus(batch, {column: select_documents(corpora[column], rows) for column in corpora})
+    return batch
+
+
 def test_correlation_to_score(df):
     # -1 to 1 (positive/negative) & 0 indicates NO relationship
     correlations = {
@@ -148,19 +252,42 @@ def perform_t_test(candidate_dict):
         print(f'{keys[i]} vs {keys[i+1]}:\n {ttest_category(p_value)}')
 
 
-def main():
+def readability_tests(df):
+    # Welch t-test of every median split, as run by perform_t_test, for progressive_run
+    separated_scores = separate_scores_by_readability(df)
+    return {column: welch_summary(separated_scores[f'high_{column}'], separated_scores[f'low_{column}'])
+            for column in ['selftext_readability', 'title_readability', 'selftext_grade', 'title_grade']}
+
+
+def main(stats_only=False, reader='pandas', split_sweep=False, corpus=False, progressive=False, tolerance=0.02,
+         density=False):
 
     # 1. Read in the reddit submission data
-    df = read_data()
+    df = read_data(backend=reader)
 
     # 2. Filter out unncessary columns
     filter_columns(df)
     
     # 3. Filter out selftext with no words
-    filter_low_selftext(df)
+    mask = filter_low_selftext(df)
 
-    # 4. Perform readability scores
-    calculate_readability(df)
+    if corpus:
+        # keep the pre-tokenized corpora in step with the remaining rows
+        corpora = {column: select_documents(load_corpus(column, backend=reader), mask) for column in ['title', 'selftext']}
+    else:
+        corpora = None
+
+    if progressive:
+        # 4. Perform readability scores on growing random batches until the t-tests settle,
+        # the rest of the analysis then runs on the rows that were scored
+        df, _ = progressive_run(len(df), lambda rows: readability_features(df, rows, corpora),
+                                readability_tests, tolerance=tolerance)
+    elif corpus:
+        # 4. Perform readability scores
+        calculate_readability_from_corpus(df, corpora)
+    else:
+        # 4. Perform readability scores
+        calculate_readability(df)
     
     # 5. Test correlation between readability scores and score
     test_correlation_to_score(df)
@@ -173,6 +300,21 @@ def main():
     
     # 8. Perform Ttest on the separated data
     perform_t_test(separated_scores)
+
+    # Sweep every split point of each readability score instead of only the median
+    if split_sweep:
+        for column in ['selftext_readability', 'title_readability', 'selftext_grade', 'title_grade']:
+            sweep = split_point_sweep(df[column], df['score'])
+            print_split_sweep(column, sweep, df[column].median())
+            if not stats_only:
+                plot_split_sweep(sweep,
+                                 df[column].median(),
+                                 f'Score of high vs low {column} groups at every split point',
+                                 f'{column} split point (low group <= split)',
+                                 f'../Graphs/{column}_split_sweep.png')
+
+    if stats_only:
+        return
     
     # 9. Plot bar graphs of mean scores to demonstrate significant difference  
     # Plot mean scores of high/low selftext readability
@@ -205,7 +347,32 @@ def main():
                         ['High Title Grade', 'Low Title Grade'], 
                         'Scores', 
                         '../Graphs/title_grade_bar.png')
+
+    # Plot score against each readability score as a density grid instead of a scatter plot
+    if density:
+        for column in ['selftext_readability', 'title_readability', 'selftext_grade', 'title_grade']:
+            plot_density_grid(df[column],
+                              df['score'],
+                              f'Score vs {column}',
+                              column,
+                              'Score',
+                              f'../Graphs/{column}_density.png',
+                              log_y=True)
     
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    parser = make_parser('Test whether the readability of a post affects its score')
+    parser.add_argument('--split-sweep', action='store_true',
+                        help='also test every split point of the feature, not only the median')
+    parser.add_argument('--corpus', action='store_true',
+                        help='work from the saved pre-tokenized corpus instead of splitting the text again')
+    parser.add_argument('--progressive', action='store_true',
+                        help='score random batches of growing size and stop once the t-tests are stable')
+    parser.add_argument('--tolerance', type=float, default=0.02,
+                        help="largest half-width of the 95%% CI of Cohen's d that counts as settled (with --progressive)")
+    parser.add_argument('--density', action='store_true', help=DENSITY_HELP)
+    args = parser.parse_args()
+    main(stats_only=args.stats_only, reader=args.reader, split_sweep=args.split_sweep, corpus=args.corpus,
+         progressive=args.progressive, tolerance=args.tolerance, density=args.density)
+    if args.import_times:
+        print_import_times()
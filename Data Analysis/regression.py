@@ -0,0 +1,124 @@
+import time
+import numpy as np
+import pandas as pd
+from Utility.lazy_utility import lazy_import, print_import_times
+from Utility.cli_utility import make_parser
+from Utility.read_utility import read_data
+from Utility.filter_utility import SELFTEXT_RULES, pandas_mask
+from Utility.corpus_utility import load_corpus, select_documents
+from Utility.vader_utility import compile_lexicon, polarity_scores
+from Utility.regression_utility import fit_within, fit_sparse, coefficient_table
+from readability import corpus_readability
+from submission_byhour import fix_date
+
+plt = lazy_import('matplotlib.pyplot')
+sns = lazy_import('seaborn')
+
+# the continuous features, with hour-of-day dummies (hour 0 PST is the baseline) added after them
+FEATURES = ['log_post_length', 'log_num_comments', 'title_readability', 'selftext_readability',
+            'title_sentiment', 'selftext_sentiment']
+
+
+def filter_rows(df):
+    # keep posts with a selftext (post length and selftext readability need one) and a subreddit
+    mask = (pandas_mask(df, SELFTEXT_RULES) & df['subreddit'].notna() & (df['score'] >= 0)).to_numpy()
+    df.drop(df[~mask].index, inplace=True)
+    return mask
+
+
+def calculate_features(df, mask, reader):
+    # every feature the single-factor scripts test, computed the fast way
+    df['log_post_length'] = np.log(df['selftext'].str.len() + 1)
+    df['log_num_comments'] = np.log(df['num_comments'] + 1)
+    for column in ['title', 'selftext']:
+        df[f'{column}_readability'], _ = corpus_readability(select_documents(load_corpus(column, backend=reader), mask))
+    lexicon = compile_lexicon()
+    for column in ['title', 'selftext']:
+        df[f'{column}_sentiment'] = polarity_scores(df[column], lexicon)['compound'].to_numpy()
+    df['hour'] = fix_date(df[['datetime']].copy())['datetime'].dt.hour
+
+
+def design_matrix(df):
+    # the dense part of the design: continuous features and the hour dummies
+    hours = pd.get_dummies(pd.Categorical(df['hour'], categories=range(24)), prefix='hour', drop_first=True)
+    X = np.column_stack([df[FEATURES].to_numpy('float64'), hours.to_numpy('float64')])
+    return X, FEATURES + list(hours.columns)
+
+
+def fit_regression(df, solver='within', covariance='cluster'):
+    # log score on every feature with subreddit fixed effects
+    y = np.log(df['score'].to_numpy('float64') + 1)
+    X, names = design_matrix(df)
+    codes, subreddits = pd.factorize(df['subreddit'])
+
+    start = time.perf_counter()
+    if solver == 'sparse':
+        beta = fit_sparse(y, X, codes, len(subreddits))
+    else:
+        beta = fit_within(y, X, codes, len(subreddits))
+    table, fit = coefficient_table(y, X, codes, len(subreddits), beta, names, covariance)
+    fit['seconds'] = time.perf_counter() - start
+    return table, fit
+
+
+def print_regression(table, fit, solver, covariance):
+    print(f"log(score + 1) on {len(table)} features with {fit['groups']} subreddit fixed effects, "
+          f"{fit['rows']} rows, {solver} solver, {fit['seconds']:.2f}s")
+    print(f"R-squared: {fit['r_squared']:.4f} (within subreddits: {fit['r_squared_within']:.4f}), "
+          f"{covariance} standard errors")
+    with pd.option_context('display.width', 200, 'display.max_rows', None, 'display.precision', 4):
+        print(table.to_string())
+
+
+def plot_coefficients(table, save_path):
+
+    sns.set()
+    plt.close()
+
+    shown = table.loc[FEATURES].iloc[::-1]
+    fig, ax = plt.subplots(figsize=(8, 5))
+    ax.errorbar(shown['coefficient'], range(len(shown)),
+                xerr=[shown['coefficient'] - shown['ci_low'], shown['ci_high'] - shown['coefficient']],
+                fmt='o', color='lightcoral', capsize=4)
+    ax.axvline(0, color='grey', linewidth=1)
+    ax.set_yticks(range(len(shown)))
+    ax.set_yticklabels(shown.index)
+    ax.set_xlabel('Change in log(score + 1) per unit (95% CI)')
+    ax.set_title('Regression of score on every feature with subreddit fixed effects')
+
+    plt.savefig(save_path, bbox_inches='tight')
+
+
+def main(stats_only=False, reader='pandas', solver='within', covariance='cluster'):
+
+    # 1. Read in the reddit submission data
+    df = read_data(backend=reader)
+
+    # 2. Filter out posts without a selftext or subreddit
+    mask = filter_rows(df)
+
+    # 3. Calculate post length, comments, readability, sentiment and hour of every post
+    calculate_features(df, mask, reader)
+
+    # 4. Fit the model and print the coefficients
+    table, fit = fit_regression(df, solver, covariance)
+    print_regression(table, fit, solver, covariance)
+
+    if stats_only:
+        return
+
+    # 5. Plot the coefficients of the continuous features
+    plot_coefficients(table, '../Graphs/regression_coefficients.png')
+
+
+if __name__ == '__main__':
+    parser = make_parser('Regress log score on every feature with subreddit fixed effects')
+    parser.add_argument('--solver', choices=['within', 'sparse'], default='within',
+                        help='demean by subreddit and solve the small dense system (within), or solve the '
+                             'full sparse design with one column per subreddit by LSQR (sparse)')
+    parser.add_argument('--covariance', choices=['cluster', 'classical'], default='cluster',
+                        help='standard errors clustered by subreddit, or classical ones')
+    args = parser.parse_args()
+    main(stats_only=args.stats_only, reader=args.reader, solver=args.solver, covariance=args.covariance)
+    if args.import_times:
+        print_import_times()
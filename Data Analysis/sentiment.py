@@ -1,32 +1,18 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-from scipy import stats
-import os
 import copy
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
-import seaborn
-
-
-def read_data():
-    file_paths = [
-        'one/part-00000-9076dc6d-fa59-4c36-a0cf-8808e309da7b-c000.json.gz',
-        'two/part-00000-c7cf2076-eae1-4d0c-bce1-e7b0c43a3bf1-c000.json.gz',
-        'three/part-00000-662e59e6-5ee7-48da-a85f-1bcf09724f97-c000.json.gz',
-        'four/part-00000-3060ac52-6be0-4d42-a322-3e4a7954a4f4-c000.json.gz',
-        'five/part-00000-9c42996a-80d4-4a96-b59b-228f5e241a65-c000.json.gz',
-        'six/part-00000-5da94b81-55c0-42e7-b3dc-5a51a14e8589-c000.json.gz',
-        'seven/part-00000-eb573e13-d85e-400c-b3db-ffa9bd2d5543-c000.json.gz',
-        'eight/part-00000-61526e86-ba2d-4df5-a9d1-d043ca875b62-c000.json.gz',
-        'nine/part-00000-dc7c0356-fae4-47b8-a93a-f9b401cf70f0-c000.json.gz',
-        'ten/part-00000-f3ae3925-50c4-469e-8304-6007e9b4cdab-c000.json.gz',
-        'eleven/part-00000-2aa1781a-723e-49c4-a488-47ca50409657-c000.json.gz',
-        'twelve/part-00000-7ff282ff-fa5e-494c-ab5c-59f07d2a2f0d-c000.json.gz',
-    ]
-
-    data_frames = [pd.read_json(os.path.join('..', 'Cleaned Data', fp), lines=True) for fp in file_paths]
+import functools
+from Utility.lazy_utility import lazy_import, print_import_times
+from Utility.cli_utility import make_parser
+from Utility.read_utility import read_data
+from Utility.state_utility import merged_state, moments_state, value_counts_state
+from Utility.vader_utility import compile_lexicon, polarity_scores
+from Utility.progressive_utility import progressive_run, chi_square_summary
 
-    return pd.concat(data_frames, ignore_index=True)
+plt = lazy_import('matplotlib.pyplot')
+stats = lazy_import('scipy.stats')
+vader = lazy_import('vaderSentiment.vaderSentiment')
+seaborn = lazy_import('seaborn')
 
 
 def get_cols(df):
@@ -54,6 +40,25 @@ def calculate_sentiment(df, analyzer):
     return df
 
 
+def calculate_sentiment_fast(df, lexicon):
+    # same columns as calculate_sentiment, but each column is scored as one batch by the compiled lexicon
+    df2 = copy.deepcopy(df)
+
+    df2['title_sentiment_scores'] = polarity_scores(df['title'], lexicon).to_dict('records')
+    df2['selftext_sentiment_scores'] = polarity_scores(df['selftext'], lexicon).to_dict('records')
+
+    df = copy.deepcopy(df2)
+
+    return df
+
+
+def score_sentiment(df, engine):
+    # stock VADER one text at a time ('exact') or the compiled lexicon engine ('fast')
+    if engine == 'fast':
+        return calculate_sentiment_fast(df, compile_lexicon())
+    return calculate_sentiment(df, vader.SentimentIntensityAnalyzer())
+
+
 def final_sentiment(sentiment):
     # this function returns either 'neutral', 'positive', or 'negative' depending on compound sentiment score
     compound = sentiment['compound']
@@ -122,52 +127,208 @@ def plot_results(count_ph, count_pl, count_nh, count_nl, count_nuh, count_nul):
     plt.table(cellText=data, rowLabels=rows, colLabels=columns, loc='bottom', bbox=[0.14, -0.4, 0.8, 0.25])
     fig.savefig('../Graphs/sentiment_scores.png', bbox_inches='tight', pad_inches=0.1)
 
-def main():
-    # set seaborn for better graphs
-    seaborn.set()
+def sentiment_state(df, engine='exact'):
+    # mergeable state of one month: score moments plus, for each sentiment class,
+    # how many posts had each score (enough to rebuild the table at any threshold)
+    df = get_cols(df)
+    df = score_sentiment(df, engine)
+    df = get_category_sentiment(df)
 
-    print("program is loading and calculating. This may take several minutes please wait. . .")
+    state = {'score': moments_state(df['score'])}
+    for text in ['title', 'selftext']:
+        state[text] = {}
+        for sentiment in ['positive', 'negative', 'neutral']:
+            scores = df[df[f'sentiment_final_{text}'] == sentiment]['score']
+            state[text][sentiment] = value_counts_state(scores)
+    return state
 
-    # read in data
-    df = read_data()
 
-    # get the columns we need and remove the rest
-    df = get_cols(df)
+def count_high_low(score_counts, mean):
+    # number of posts scoring at least / below the mean, from a score -> count map
+    high = sum(count for score, count in score_counts.items() if float(score) >= mean)
+    low = sum(count for score, count in score_counts.items() if float(score) < mean)
+    return high, low
 
-    # create the sentiment analysis tool
-    analyzer = SentimentIntensityAnalyzer()
 
-    # get the sentiment scores for title and selftext
-    df = calculate_sentiment(df, analyzer)
+# column order of the contingency table built by calculate_chi
+SENTIMENT_CLASSES = ['positive', 'negative', 'neutral']
+
+
+def sentiment_table(df, text):
+    # contingency table of calculate_chi: rows low / high score (at or above the mean), columns SENTIMENT_CLASSES
+    high = df['score'] >= df['score'].mean()
+    sentiment = df[f'sentiment_final_{text}']
+    return np.array([[((sentiment == category) & ~high).sum() for category in SENTIMENT_CLASSES],
+                     [((sentiment == category) & high).sum() for category in SENTIMENT_CLASSES]])
+
+
+def sentiment_tests(df):
+    # chi-square test of title and selftext sentiment vs high/low score, for progressive_run
+    return {text: chi_square_summary(sentiment_table(df, text)) for text in ['title', 'selftext']}
 
-    # get the sentiment category result
-    df = get_category_sentiment(df)
 
-    # get the mean of all scores
-    mean = df['score'].mean()
+def scores_from_state(text_state):
+    # expand a sentiment -> (score -> count) state back into score and sentiment arrays
+    scores = []
+    sentiments = []
+    for sentiment, score_counts in text_state.items():
+        values = np.array([float(score) for score in score_counts])
+        counts = np.array(list(score_counts.values()))
+        scores.append(np.repeat(values, counts))
+        sentiments.append(np.repeat(sentiment, counts.sum()))
+    return np.concatenate(scores), np.concatenate(sentiments)
 
-    # separate the submissions by sentiment, positive, negative, neutral
-    positive_posts = df[df['sentiment_final_selftext'] == 'positive']
-    negative_posts = df[df['sentiment_final_selftext'] == 'negative']
-    neutral_posts = df[df['sentiment_final_selftext'] == 'neutral']
 
-    # separate submissions by high or low score for each category
-    pos_post_high = positive_posts[positive_posts['score'] >= mean]
-    pos_post_low = positive_posts[positive_posts['score'] < mean]
+def sweep_thresholds(scores):
+    # candidate high/low cut points: every half percentile, the mean and 100 log-spaced scores
+    percentiles = np.percentile(scores, np.arange(0.5, 100, 0.5))
+    log_points = np.logspace(0, np.log10(max(scores.max(), 1)), 100)
 
-    neg_score_high = negative_posts[negative_posts['score'] >= mean]
-    neg_score_low = negative_posts[negative_posts['score'] < mean]
+    return pd.DataFrame({
+        'threshold': np.concatenate([percentiles, [scores.mean()], log_points]),
+        'kind': ['percentile'] * len(percentiles) + ['mean'] + ['log'] * len(log_points),
+    })
 
-    neu_score_high = neutral_posts[neutral_posts['score'] >= mean]
-    neu_score_low = neutral_posts[neutral_posts['score'] < mean]
 
-    # count the total for each category
-    count_ph = pos_post_high['score'].count()
-    count_pl = pos_post_low['score'].count()
-    count_nh = neg_score_high['score'].count()
-    count_nl = neg_score_low['score'].count()
-    count_nuh = neu_score_high['score'].count()
-    count_nul = neu_score_low['score'].count()
+def sweep_chi(scores, sentiments, thresholds):
+    # chi-square test of sentiment vs high/low score at every threshold from a single sort:
+    # after sorting by score, the cumulative count of each sentiment class at the first score
+    # >= threshold is that class's low-score count, the rest of the class is its high-score count
+    scores = np.asarray(scores, dtype='float64')
+    order = np.argsort(scores, kind='stable')
+    sorted_scores = scores[order]
+    codes = pd.Categorical(np.asarray(sentiments)[order], categories=SENTIMENT_CLASSES).codes
+
+    cumulative = np.zeros((len(scores) + 1, len(SENTIMENT_CLASSES)))
+    cumulative[np.arange(1, len(scores) + 1), codes] = 1
+    cumulative = np.cumsum(cumulative, axis=0)
+
+    below = np.searchsorted(sorted_scores, thresholds['threshold'].to_numpy(), side='left')
+    low = cumulative[below]
+    high = cumulative[-1] - low
+
+    # tables laid out like calculate_chi: low score row first, then high score row
+    observed = np.stack([low, high], axis=1)
+    expected = observed.sum(axis=2, keepdims=True) * observed.sum(axis=1, keepdims=True) / len(scores)
+
+    # a table with an empty row or column cannot be tested
+    valid = (expected > 0).all(axis=(1, 2))
+    chi2 = np.full(len(thresholds), np.nan)
+    chi2[valid] = ((observed[valid] - expected[valid]) ** 2 / expected[valid]).sum(axis=(1, 2))
+
+    result = thresholds.copy()
+    result['high_fraction'] = high.sum(axis=1) / len(scores)
+    result['chi2'] = chi2
+    result['pvalue'] = stats.chi2.sf(chi2, (2 - 1) * (len(SENTIMENT_CLASSES) - 1))
+    return result
+
+
+def print_sweep(text, sweep):
+    at_mean = sweep[sweep['kind'] == 'mean'].iloc[0]
+    strongest = sweep.loc[sweep['chi2'].idxmax()]
+    significant = (sweep['pvalue'] < 0.05).mean()
+
+    print(f'{text} sentiment over {len(sweep)} score thresholds:')
+    print(f" at the mean ({at_mean['threshold']:.2f}): chi2 = {at_mean['chi2']:.3f}, p-value = {at_mean['pvalue']}")
+    print(f" strongest at {strongest['threshold']:.2f} ({strongest['kind']}): chi2 = {strongest['chi2']:.3f}, p-value = {strongest['pvalue']}")
+    print(f' p-value < 0.05 at {significant:.0%} of thresholds')
+
+
+def plot_sweep(sweeps):
+    # plot the chi-square statistic and p-value curves against the score threshold
+    plt.close()
+    fig, (ax_chi, ax_p) = plt.subplots(2, 1, sharex=True, figsize=(8, 8))
+
+    for text, sweep in sweeps.items():
+        sweep = sweep.sort_values('threshold')
+        ax_chi.plot(sweep['threshold'], sweep['chi2'], label=text)
+        ax_p.plot(sweep['threshold'], sweep['pvalue'], label=text)
+
+    mean = sweeps['selftext'].loc[sweeps['selftext']['kind'] == 'mean', 'threshold'].iloc[0]
+    for ax in [ax_chi, ax_p]:
+        ax.axvline(mean, color='grey', linestyle='--', label='mean score')
+        ax.legend()
+
+    ax_p.axhline(0.05, color='lightcoral', linestyle=':')
+    ax_p.set_yscale('log')
+    ax_p.set_xscale('symlog')
+    ax_p.set_xlim(left=0)
+    ax_p.set_xlabel('Score threshold between low and high scores')
+    ax_p.set_ylabel('p-value')
+    ax_chi.set_ylabel('Chi-square statistic')
+    ax_chi.set_title('Sentiment vs High/Low Scores at Every Threshold')
+
+    fig.savefig('../Graphs/sentiment_threshold_sweep.png', bbox_inches='tight')
+
+
+def main(stats_only=False, reader='pandas', incremental=False, sweep=False, engine='exact',
+         progressive=False, tolerance=0.01):
+    # set seaborn for better graphs
+    if not stats_only:
+        seaborn.set()
+
+    print("program is loading and calculating. This may take several minutes please wait. . .")
+
+    if incremental:
+        # merge the saved per-month sentiment states, only months without a saved state are scored
+        # each engine keeps its own state so the two are never merged together
+        state_name = 'sentiment' if engine == 'exact' else 'sentiment_fast'
+        state = merged_state(state_name, functools.partial(sentiment_state, engine=engine), backend=reader)
+        sweep_inputs = {text: scores_from_state(state[text]) for text in ['title', 'selftext']}
+
+        # get the mean of all scores
+        mean = state['score']['mean']
+
+        count_ph, count_pl = count_high_low(state['selftext']['positive'], mean)
+        count_nh, count_nl = count_high_low(state['selftext']['negative'], mean)
+        count_nuh, count_nul = count_high_low(state['selftext']['neutral'], mean)
+    else:
+        # read in data
+        df = read_data(backend=reader)
+
+        # get the columns we need and remove the rest
+        df = get_cols(df)
+
+        if progressive:
+            # score growing random batches until both chi-square tests settle,
+            # the rest of the analysis then runs on the rows that were scored
+            df, _ = progressive_run(len(df), lambda rows: get_category_sentiment(score_sentiment(df.iloc[rows], engine)),
+                                    sentiment_tests, tolerance=tolerance)
+        else:
+            # get the sentiment scores for title and selftext
+            df = score_sentiment(df, engine)
+
+            # get the sentiment category result
+            df = get_category_sentiment(df)
+
+        sweep_inputs = {text: (df['score'].to_numpy(), df[f'sentiment_final_{text}'].to_numpy())
+                        for text in ['title', 'selftext']}
+
+        # get the mean of all scores
+        mean = df['score'].mean()
+
+        # separate the submissions by sentiment, positive, negative, neutral
+        positive_posts = df[df['sentiment_final_selftext'] == 'positive']
+        negative_posts = df[df['sentiment_final_selftext'] == 'negative']
+        neutral_posts = df[df['sentiment_final_selftext'] == 'neutral']
+
+        # separate submissions by high or low score for each category
+        pos_post_high = positive_posts[positive_posts['score'] >= mean]
+        pos_post_low = positive_posts[positive_posts['score'] < mean]
+
+        neg_score_high = negative_posts[negative_posts['score'] >= mean]
+        neg_score_low = negative_posts[negative_posts['score'] < mean]
+
+        neu_score_high = neutral_posts[neutral_posts['score'] >= mean]
+        neu_score_low = neutral_posts[neutral_posts['score'] < mean]
+
+        # count the total for each category
+        count_ph = pos_post_high['score'].count()
+        count_pl = pos_post_low['score'].count()
+        count_nh = neg_score_high['score'].count()
+        count_nl = neg_score_low['score'].count()
+        count_nuh = neu_score_high['score'].count()
+        count_nul = neu_score_low['score'].count()
 
     chi_result = calculate_chi(count_ph, count_pl, count_nh, count_nl, count_nuh, count_nul)
 
@@ -175,9 +336,38 @@ def main():
     print(chi_result)
     print("p-value: ", chi_result.pvalue)
 
-    plot_results(count_ph, count_pl, count_nh, count_nl, count_nuh, count_nul)
-    print("Graph saved to folder.")
+    if not stats_only:
+        plot_results(count_ph, count_pl, count_nh, count_nl, count_nuh, count_nul)
+        print("Graph saved to folder.")
+
+    if sweep:
+        # repeat the test at hundreds of high/low thresholds for both title and selftext sentiment
+        sweeps = {}
+        for text, (scores, sentiments) in sweep_inputs.items():
+            sweeps[text] = sweep_chi(scores, sentiments, sweep_thresholds(scores))
+            print_sweep(text, sweeps[text])
+
+        if not stats_only:
+            plot_sweep(sweeps)
+            print("Sweep graph saved to folder.")
+
     print("Program complete.")
 
 if __name__ == '__main__':
-    main()
+    parser = make_parser('Test whether the sentiment of a post affects its score')
+    parser.add_argument('--incremental', action='store_true',
+                        help='build the table from saved per-month states, scoring only new or re-cleaned months')
+    parser.add_argument('--sweep', action='store_true',
+                        help='also test title and selftext sentiment at every percentile, the mean and log-spaced score thresholds')
+    parser.add_argument('--engine', choices=['exact', 'fast'], default='exact',
+                        help="'exact' scores with stock VADER, 'fast' with the compiled lexicon engine (see vader_benchmark.py)")
+    parser.add_argument('--progressive', action='store_true',
+                        help='score random batches of growing size and stop once the chi-square tests are stable '
+                             '(ignored with --incremental)')
+    parser.add_argument('--tolerance', type=float, default=0.01,
+                        help="largest half-width of the 95%% CI of Cramer's V that counts as settled (with --progressive)")
+    args = parser.parse_args()
+    main(stats_only=args.stats_only, reader=args.reader, incremental=args.incremental, sweep=args.sweep,
+         engine=args.engine, progressive=args.progressive, tolerance=args.tolerance)
+    if args.import_times:
+        print_import_times()
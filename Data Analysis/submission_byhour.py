@@ -1,29 +1,13 @@
-import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
-from scipy import stats
-import seaborn
-import os
-
-def read_data():
-    file_paths = [
-        'one/part-00000-9076dc6d-fa59-4c36-a0cf-8808e309da7b-c000.json.gz',
-        'two/part-00000-c7cf2076-eae1-4d0c-bce1-e7b0c43a3bf1-c000.json.gz',
-        'three/part-00000-662e59e6-5ee7-48da-a85f-1bcf09724f97-c000.json.gz',
-        'four/part-00000-3060ac52-6be0-4d42-a322-3e4a7954a4f4-c000.json.gz',
-        'five/part-00000-9c42996a-80d4-4a96-b59b-228f5e241a65-c000.json.gz',
-        'six/part-00000-5da94b81-55c0-42e7-b3dc-5a51a14e8589-c000.json.gz',
-        'seven/part-00000-eb573e13-d85e-400c-b3db-ffa9bd2d5543-c000.json.gz',
-        'eight/part-00000-61526e86-ba2d-4df5-a9d1-d043ca875b62-c000.json.gz',
-        'nine/part-00000-dc7c0356-fae4-47b8-a93a-f9b401cf70f0-c000.json.gz',
-        'ten/part-00000-f3ae3925-50c4-469e-8304-6007e9b4cdab-c000.json.gz',
-        'eleven/part-00000-2aa1781a-723e-49c4-a488-47ca50409657-c000.json.gz',
-        'twelve/part-00000-7ff282ff-fa5e-494c-ab5c-59f07d2a2f0d-c000.json.gz',
-    ]
-
-    data_frames = [pd.read_json(os.path.join('..', 'Cleaned Data', fp), lines=True) for fp in file_paths]
-
-    return pd.concat(data_frames, ignore_index=True)
+from Utility.lazy_utility import lazy_import, print_import_times
+from Utility.cli_utility import make_parser
+from Utility.read_utility import read_data
+from Utility.state_utility import merged_state
 
+plt = lazy_import('matplotlib.pyplot')
+stats = lazy_import('scipy.stats')
+seaborn = lazy_import('seaborn')
 
 
 def get_averages(data):
@@ -81,28 +65,49 @@ def plot_residuals(averages, fit):
     plt.savefig('../Graphs/residuals_submission_by_hour.png')
 
 
-def main():
+def hour_state(df):
+    # mergeable state of one month: score sums and post counts for each hour (PST)
+    df = fix_date(df[['datetime', 'score']].copy())
+    hours = df['datetime'].dt.hour
+    return {
+        'score_sums': np.bincount(hours, weights=df['score'], minlength=24).tolist(),
+        'counts': np.bincount(hours, minlength=24).tolist(),
+    }
+
+
+def averages_from_state(state):
+    # the average score for each hour from the merged sums and counts
+    return pd.Series(np.array(state['score_sums']) / np.array(state['counts']), name='score')
+
+
+def main(stats_only=False, reader='pandas', incremental=False):
     # set seaborn for better graphs
-    seaborn.set()
+    if not stats_only:
+        seaborn.set()
 
     print("program is loading and calculating, please wait a few moments. . .")
 
-    # read in data
-    data = read_data()
+    if incremental:
+        # merge the saved per-month hour states, only months without a saved state are read
+        averages = averages_from_state(merged_state('hour', hour_state, backend=reader))
+    else:
+        # read in data
+        data = read_data(backend=reader)
 
-    # fix date - convert the spark timestamp type into datetime
-    data = fix_date(data)
+        # fix date - convert the spark timestamp type into datetime
+        data = fix_date(data)
 
-    # get averages for each hour
-    averages = get_averages(data)
+        # get averages for each hour
+        averages = get_averages(data)
 
     # create a linear fit for the averages
     fit = create_fit(averages)
 
     # plot the results and best fit line
-    plot_results(averages, fit)
+    if not stats_only:
+        plot_results(averages, fit)
 
-    print("Plots have been saved into folder.")
+        print("Plots have been saved into folder.")
 
     # print out the useful values
     print("p-value:", fit.pvalue)
@@ -110,8 +115,15 @@ def main():
     print("r-value squared:", fit.rvalue**2)
 
     # plot the residuals
-    plot_residuals(averages, fit)
+    if not stats_only:
+        plot_residuals(averages, fit)
 
 
 if __name__ == '__main__':
-    main()
+    parser = make_parser('Test whether the hour a post is submitted affects its score')
+    parser.add_argument('--incremental', action='store_true',
+                        help='average from saved per-month states, reading only new or re-cleaned months')
+    args = parser.parse_args()
+    main(stats_only=args.stats_only, reader=args.reader, incremental=args.incremental)
+    if args.import_times:
+        print_import_times()
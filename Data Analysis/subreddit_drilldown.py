@@ -0,0 +1,131 @@
+import numpy as np
+import pandas as pd
+from Utility.lazy_utility import lazy_import, print_import_times
+from Utility.cli_utility import make_parser
+from Utility.read_utility import read_data
+from Utility.filter_utility import SELFTEXT_RULES, pandas_mask
+from Utility.grouped_utility import grouped_split_tests, grouped_hour_means, adjust_pvalues
+from Utility.shard_utility import load_manifest, subreddit_counts, read_subreddits
+from submission_byhour import fix_date
+
+plt = lazy_import('matplotlib.pyplot')
+sns = lazy_import('seaborn')
+
+FEATURES = ['num_comments', 'post_length']
+
+
+def filter_rows(df, feature):
+    # keep the rows the feature's own script tests
+    if feature == 'num_comments':
+        mask = df['num_comments'] >= 1
+    else:
+        mask = pandas_mask(df, SELFTEXT_RULES)
+    mask &= df['subreddit'].notna()
+    df.drop(df[~mask].index, inplace=True)
+
+
+def calculate_feature(df, feature):
+    if feature == 'post_length':
+        df['post_length'] = df['selftext'].str.len()
+    return df[feature].to_numpy('float64')
+
+
+def subreddit_table(df, feature, min_group_size):
+    # every subreddit's median split, hour-of-day means and post count from one grouped pass
+    codes, subreddits = pd.factorize(df['subreddit'])
+    values = calculate_feature(df, feature)
+    score = df['score'].to_numpy('float64')
+    hours = fix_date(df[['datetime']].copy())['datetime'].dt.hour.to_numpy()
+
+    table = grouped_split_tests(codes, values, score, len(subreddits), min_group_size)
+    hour_means = grouped_hour_means(codes, hours, score, len(subreddits))[table['code']]
+
+    table.insert(0, 'subreddit', np.asarray(subreddits)[table['code']])
+    table['t_pvalue_adjusted'] = adjust_pvalues(table['t_pvalue'])
+    table['u_pvalue_adjusted'] = adjust_pvalues(table['u_pvalue'])
+    # every tested subreddit has posts, so each row has at least one hour with a mean
+    table['best_hour'] = np.nanargmax(hour_means, axis=1)
+    table['hour_range'] = np.nanmax(hour_means, axis=1) - np.nanmin(hour_means, axis=1)
+
+    # rank subreddits by the size of the effect, whichever direction it goes
+    table = table.drop(columns='code')
+    return table.iloc[np.argsort(-table['cohens_d'].abs().to_numpy(), kind='stable')].reset_index(drop=True)
+
+
+def print_table(feature, table, top):
+    significant = (table['t_pvalue_adjusted'] < 0.05).sum()
+    print(f'{feature}: {len(table)} subreddits tested, {significant} significant after the false discovery '
+          f'rate adjustment (Welch t-test)')
+    columns = ['subreddit', 'posts', 'median', 'low_mean', 'high_mean', 'cohens_d', 't_pvalue_adjusted',
+               'prob_superiority', 'u_pvalue_adjusted', 'best_hour', 'hour_range']
+    with pd.option_context('display.width', 200, 'display.max_columns', None, 'display.precision', 3):
+        print(table[columns].head(top).to_string(index=False))
+
+
+def plot_effects(table, feature, top, save_path):
+
+    sns.set()
+    plt.close()
+
+    shown = table.head(top).iloc[::-1]
+    fig, ax = plt.subplots(figsize=(8, max(4, 0.3 * len(shown))))
+    colors = np.where(shown['t_pvalue_adjusted'] < 0.05, 'lightcoral', 'skyblue')
+    ax.barh(shown['subreddit'], shown['cohens_d'], color=colors)
+    ax.axvline(0, color='grey', linewidth=1)
+    ax.set_xlabel(f"Cohen's d of score, high vs low {feature} (red: significant after FDR adjustment)")
+    ax.set_title(f'Subreddits with the largest {feature} effect')
+
+    plt.savefig(save_path, bbox_inches='tight')
+
+
+def read_selected(reader, subreddits=None, top_subreddits=None):
+    # the whole year, or only the chosen or most active subreddits read from the subreddit shards
+    if not subreddits and not top_subreddits:
+        return read_data(backend=reader)
+    manifest = load_manifest()
+    if top_subreddits:
+        subreddits = list(subreddit_counts(manifest).index[:top_subreddits])
+    return read_subreddits(subreddits, manifest, backend=reader)
+
+
+def main(stats_only=False, reader='pandas', feature='num_comments', min_group_size=30, top=20, output=None,
+         subreddits=None, top_subreddits=None):
+
+    # 1. Read in the reddit submission data, or only the shards of the chosen subreddits
+    df = read_selected(reader, subreddits, top_subreddits)
+
+    # 2. Keep the rows the feature is tested on
+    filter_rows(df, feature)
+
+    # 3. Median split, Welch t-test, Mann-Whitney U and hour means of every subreddit in one pass
+    table = subreddit_table(df, feature, min_group_size)
+
+    # 4. Print the subreddits with the largest effects and save the full table
+    print_table(feature, table, top)
+    if output:
+        table.to_csv(output, index=False)
+
+    if stats_only:
+        return
+
+    # 5. Plot the largest effects
+    plot_effects(table, feature, top, f'../Graphs/subreddit_drilldown_{feature}.png')
+
+
+if __name__ == '__main__':
+    parser = make_parser('Repeat the median-split tests within every subreddit and rank them by effect size')
+    parser.add_argument('--feature', choices=FEATURES, default='num_comments', help='feature to split on')
+    parser.add_argument('--min-group-size', type=int, default=30,
+                        help='smallest high or low group a subreddit needs to be tested')
+    parser.add_argument('--top', type=int, default=20, help='subreddits to print and plot')
+    parser.add_argument('--output', metavar='PATH', help='save the full ranked table as CSV to PATH')
+    parser.add_argument('--subreddits', nargs='+', metavar='NAME',
+                        help='only these subreddits, read from the subreddit shards')
+    parser.add_argument('--top-subreddits', type=int, metavar='N',
+                        help='only the N most active subreddits, picked from the shard manifest')
+    args = parser.parse_args()
+    main(stats_only=args.stats_only, reader=args.reader, feature=args.feature,
+         min_group_size=args.min_group_size, top=args.top, output=args.output,
+         subreddits=args.subreddits, top_subreddits=args.top_subreddits)
+    if args.import_times:
+        print_import_times()
@@ -1,31 +1,15 @@
-import os
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-from scipy import stats
+from Utility.lazy_utility import lazy_import, print_import_times
+from Utility.cli_utility import make_parser, LAZY_HELP
+from Utility.read_utility import read_data
 from Utility.plot_utility import plot_mean_bar_graph
 from Utility.plot_utility_anova import plot_mean_bar_graph_3candidates
+from Utility.polars_utility import scan_data, collect_frame_and_split
 
-def read_data():
-    file_paths = [
-        'one/part-00000-9076dc6d-fa59-4c36-a0cf-8808e309da7b-c000.json.gz',
-        'two/part-00000-c7cf2076-eae1-4d0c-bce1-e7b0c43a3bf1-c000.json.gz',
-        'three/part-00000-662e59e6-5ee7-48da-a85f-1bcf09724f97-c000.json.gz',
-        'four/part-00000-3060ac52-6be0-4d42-a322-3e4a7954a4f4-c000.json.gz',
-        'five/part-00000-9c42996a-80d4-4a96-b59b-228f5e241a65-c000.json.gz',
-        'six/part-00000-5da94b81-55c0-42e7-b3dc-5a51a14e8589-c000.json.gz',
-        'seven/part-00000-eb573e13-d85e-400c-b3db-ffa9bd2d5543-c000.json.gz',
-        'eight/part-00000-61526e86-ba2d-4df5-a9d1-d043ca875b62-c000.json.gz',
-        'nine/part-00000-dc7c0356-fae4-47b8-a93a-f9b401cf70f0-c000.json.gz',
-        'ten/part-00000-f3ae3925-50c4-469e-8304-6007e9b4cdab-c000.json.gz',
-        'eleven/part-00000-2aa1781a-723e-49c4-a488-47ca50409657-c000.json.gz',
-        'twelve/part-00000-7ff282ff-fa5e-494c-ab5c-59f07d2a2f0d-c000.json.gz',
-    ]
-    
-    data_frames = [pd.read_json(os.path.join('..', 'Cleaned Data', fp), lines=True) for fp in file_paths]
-    
-    return pd.concat(data_frames, ignore_index=True)
-
+plt = lazy_import('matplotlib.pyplot')
+stats = lazy_import('scipy.stats')
+pl = lazy_import('polars')
 
 def filter_columns(df):
     # Filter out unnecessary columns
@@ -49,6 +33,14 @@ def groupby_subreddit_size(df):
     df['subreddit_popularity'] = df['subreddit'].map(subreddit_popularity)
 
 
+def subreddit_popularity_query(lf):
+    # filter_columns, filter_nan_subreddit and groupby_subreddit_size as a lazy query,
+    # the subreddit sizes are a window count instead of a groupby mapped back onto the rows
+    return (lf.select('subreddit', 'score')
+              .filter(pl.col('subreddit').is_not_null())
+              .with_columns(pl.len().over('subreddit').cast(pl.Int64).alias('subreddit_popularity')))
+
+
 def separate_scores_by_subreddit_popularity(df):
     median_subreddit_popularity = df['subreddit_popularity'].median()
 
@@ -140,37 +132,44 @@ def perform_anova(low_popularity, medium_popularity, high_popularity):
     print(interpret_anova(p_value))
     
 
-def main():
-    
-    # 1. Read in the reddit submission data
-    df = read_data()
+def main(stats_only=False, reader='pandas', lazy=False):
 
-    # 2. Filter out unncessary columns
-    filter_columns(df)
-    
-    # 3. Filter out NaN subreddits
-    filter_nan_subreddit(df)
-    
-    # 4. Group by subreddit size
-    groupby_subreddit_size(df)
-    
-    # 5. Separate scores by subreddit popularity
-    separated_scores = separate_scores_by_subreddit_popularity(df)
+    if lazy:
+        # 1-5. Read, filter, group by subreddit size and separate scores as one lazy Polars query
+        df, split = collect_frame_and_split(subreddit_popularity_query(scan_data()), 'subreddit_popularity')
+        separated_scores = {'high_subreddit_popularity_score': split['high'], 'low_subreddit_popularity_score': split['low']}
+    else:
+        # 1. Read in the reddit submission data
+        df = read_data(backend=reader)
+
+        # 2. Filter out unncessary columns
+        filter_columns(df)
+
+        # 3. Filter out NaN subreddits
+        filter_nan_subreddit(df)
+
+        # 4. Group by subreddit size
+        groupby_subreddit_size(df)
+
+        # 5. Separate scores by subreddit popularity
+        separated_scores = separate_scores_by_subreddit_popularity(df)
     high_subreddit_popularity_score, low_subreddit_popularity_score = separated_scores['high_subreddit_popularity_score'], separated_scores['low_subreddit_popularity_score']
     
     # 6. Test if the distributions of the two groups are similar
-    test_similar_distribution(high_subreddit_popularity_score, low_subreddit_popularity_score)
+    if not stats_only:
+        test_similar_distribution(high_subreddit_popularity_score, low_subreddit_popularity_score)
     
     # 6. Perform Mann-Whitney U test
     perform_mann_whitney_u(high_subreddit_popularity_score, low_subreddit_popularity_score)
     
     # 7. Plot bar graphs of mean number of comments to demonstrate signicant difference
-    plot_mean_bar_graph(high_subreddit_popularity_score,
-                        low_subreddit_popularity_score, 
-                        'Mean scores of Reddit posts of high/low subreddit_popularity groups', 
-                        ['High Subreddit_Popularity Scores', 'Low Subreddit_Popularity Scores'], 
-                        'Reddit Post Scores', 
-                        '../Graphs/subreddit_popularity.png')
+    if not stats_only:
+        plot_mean_bar_graph(high_subreddit_popularity_score,
+                            low_subreddit_popularity_score, 
+                            'Mean scores of Reddit posts of high/low subreddit_popularity groups', 
+                            ['High Subreddit_Popularity Scores', 'Low Subreddit_Popularity Scores'], 
+                            'Reddit Post Scores', 
+                            '../Graphs/subreddit_popularity.png')
 
     # 8. Perform normal test on subreddit_popularity
     perform_normal_test(df)
@@ -179,11 +178,12 @@ def main():
     transform_subreddit_popularity(df)
     
     # 10. Plot histogram of transformed subreddit_popularity
-    plt.hist(df['subreddit_popularity_log'], bins=50)
-    plt.xlabel('Post Subreddit Popularity')
-    plt.ylabel('Frequency')
-    plt.title('Histogram of log transformed subreddit_popularity')
-    plt.show()
+    if not stats_only:
+        plt.hist(df['subreddit_popularity_log'], bins=50)
+        plt.xlabel('Post Subreddit Popularity')
+        plt.ylabel('Frequency')
+        plt.title('Histogram of log transformed subreddit_popularity')
+        plt.show()
     #plt.savefig('../Graphs/subreddit_popularity_log_transformed_histogram.png')
     
     '''
@@ -197,6 +197,9 @@ def main():
     # 12. Perform ANOVA
     perform_anova(low_popularity_anova, medium_popularity_anova, medium_popularity_anova)
     
+    if stats_only:
+        return
+
     # 13. Plot bar graphs of mean number of comments to demonstrate signicant difference
     plot_mean_bar_graph_3candidates(medium_popularity_anova,
                     medium_popularity_anova, 
@@ -208,4 +211,9 @@ def main():
     
     
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    parser = make_parser('Test whether the popularity of a subreddit affects the score of a post')
+    parser.add_argument('--lazy', action='store_true', help=LAZY_HELP)
+    args = parser.parse_args()
+    main(stats_only=args.stats_only, reader=args.reader, lazy=args.lazy)
+    if args.import_times:
+        print_import_times()
\ No newline at end of file
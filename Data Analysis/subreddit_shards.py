@@ -0,0 +1,24 @@
+import argparse
+from Utility.read_utility import MONTHS
+from Utility.shard_utility import load_manifest, subreddit_counts
+
+
+def main(months=MONTHS, shards=16, top=10):
+    # bring the subreddit shards up to date and answer popularity counts from the manifest alone
+    manifest = load_manifest(months, n_shards=shards)
+    counts = subreddit_counts(manifest)
+
+    print(f"{counts.sum()} posts in {len(counts)} subreddits, {len(manifest['shards'])} shards "
+          f"of {min(manifest['shards'].values())} to {max(manifest['shards'].values())} rows")
+    print(f'Top {top} subreddits by number of posts:')
+    for subreddit, count in counts.head(top).items():
+        print(f" {subreddit}: {count} ({manifest['subreddits'][subreddit]['shard']})")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Shard the cleaned data by subreddit and list the most active subreddits')
+    parser.add_argument('--months', nargs='+', default=MONTHS, help='month folders to include')
+    parser.add_argument('--shards', type=int, default=16, help='number of shards')
+    parser.add_argument('--top', type=int, default=10, help='number of subreddits to list')
+    args = parser.parse_args()
+    main(months=args.months, shards=args.shards, top=args.top)
@@ -0,0 +1,153 @@
+import numpy as np
+import pandas as pd
+from Utility.lazy_utility import lazy_import, print_import_times
+from Utility.cli_utility import make_parser
+from Utility.state_utility import merged_state
+from submission_byhour import fix_date
+
+plt = lazy_import('matplotlib.pyplot')
+seaborn = lazy_import('seaborn')
+
+
+def daily_state(df):
+    # mergeable state of one month: post count, score sum and score counts of each day (PST),
+    # binned by integer day index so no per-day groups are built
+    df = fix_date(df[['datetime', 'score']].copy())
+    days = df['datetime'].dt.tz_localize(None).to_numpy().astype('datetime64[D]')
+    offsets = (days - days.min()).astype('int64')
+    score = df['score'].to_numpy()
+
+    counts = np.bincount(offsets)
+    sums = np.bincount(offsets, weights=score)
+    values, value_codes = np.unique(score, return_inverse=True)
+    day_value_counts = np.bincount(offsets * len(values) + value_codes, minlength=len(counts) * len(values))
+    day_value_counts = day_value_counts.reshape(len(counts), len(values))
+
+    state = {}
+    for offset in np.flatnonzero(counts):
+        present = np.flatnonzero(day_value_counts[offset])
+        state[str(days.min() + offset)] = {
+            'count': int(counts[offset]),
+            'score_sum': float(sums[offset]),
+            'score_counts': {str(value): int(count) for value, count in
+                             zip(values[present].tolist(), day_value_counts[offset, present].tolist())},
+        }
+    return state
+
+
+def daily_arrays(state):
+    # every calendar day from the first to the last post: post counts, score sums and a
+    # (days x distinct scores) histogram, days without posts left at zero
+    dates = np.array(sorted(state), dtype='datetime64[D]')
+    days = np.arange(dates[0], dates[-1] + 1)
+    positions = (dates - dates[0]).astype('int64')
+    values = np.unique([float(value) for day in state.values() for value in day['score_counts']])
+
+    counts = np.zeros(len(days))
+    sums = np.zeros(len(days))
+    histograms = np.zeros((len(days), len(values)))
+    for position, date in zip(positions, dates):
+        day = state[str(date)]
+        counts[position] = day['count']
+        sums[position] = day['score_sum']
+        histograms[position, np.searchsorted(values, [float(value) for value in day['score_counts']])] = \
+            list(day['score_counts'].values())
+    return days, counts, sums, histograms, values
+
+
+def rolling_sums(values, window):
+    # trailing sums over the last `window` days (fewer at the start) from one cumulative sum
+    cumulative = np.concatenate([np.zeros((1,) + values.shape[1:]), np.cumsum(values, axis=0)])
+    ends = np.arange(1, len(values) + 1)
+    return cumulative[ends] - cumulative[np.maximum(ends - window, 0)]
+
+
+def histogram_medians(histograms, values):
+    # median of every row's histogram, averaging the two middle values like pandas' median
+    cumulative = np.cumsum(histograms, axis=1)
+    totals = cumulative[:, -1]
+    last = len(values) - 1
+    lower = np.minimum((cumulative <= ((totals - 1) // 2)[:, None]).sum(axis=1), last)
+    upper = np.minimum((cumulative <= (totals // 2)[:, None]).sum(axis=1), last)
+    with np.errstate(invalid='ignore'):
+        return np.where(totals > 0, (values[lower] + values[upper]) / 2, np.nan)
+
+
+def trend_table(counts, sums, histograms, values, index, windows=(1,)):
+    # posts per day, mean score and median score over trailing windows of each length
+    table = pd.DataFrame(index=index)
+    for window in windows:
+        suffix = '' if window == 1 else f'_{window}d'
+        window_counts = rolling_sums(counts, window)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            table[f'posts_per_day{suffix}'] = window_counts / np.minimum(np.arange(1, len(counts) + 1), window)
+            table[f'mean_score{suffix}'] = rolling_sums(sums, window) / window_counts
+        table[f'median_score{suffix}'] = histogram_medians(rolling_sums(histograms, window), values)
+    return table
+
+
+def weekly_table(days, counts, sums, histograms, values):
+    # the same aggregates over calendar weeks starting on Monday (1970-01-01 was a Thursday)
+    weeks = (days.astype('int64') + 3) // 7
+    starts = np.flatnonzero(np.diff(weeks, prepend=weeks[0] - 1))
+    week_counts = np.add.reduceat(counts, starts)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_score = np.add.reduceat(sums, starts) / week_counts
+    return pd.DataFrame({
+        'posts': week_counts.astype('int64'),
+        'mean_score': mean_score,
+        'median_score': histogram_medians(np.add.reduceat(histograms, starts, axis=0), values),
+    }, index=pd.Index(days[starts], name='week'))
+
+
+def plot_trends(daily, windows, save_path):
+    plt.close()
+    fig, axes = plt.subplots(3, 1, sharex=True, figsize=(12, 10))
+
+    for ax, column, label in zip(axes, ['posts_per_day', 'mean_score', 'median_score'],
+                                 ['Posts per day', 'Mean score', 'Median score']):
+        ax.plot(daily.index, daily[column], '.', color='grey', alpha=0.5, label='daily')
+        for window in windows:
+            ax.plot(daily.index, daily[f'{column}_{window}d'], linewidth=2, label=f'{window}-day window')
+        ax.set_ylabel(label)
+        ax.legend(loc='upper right')
+
+    axes[0].set_title('Posts and scores over the year (PST days)')
+    plt.tight_layout()
+    plt.savefig(save_path)
+
+
+def main(stats_only=False, reader='pandas', windows=(7, 28), output=None):
+    if not stats_only:
+        seaborn.set()
+
+    # 1. Bin each month by day, only months without a saved state are read, then merge them
+    state = merged_state('daily', daily_state, backend=reader)
+    days, counts, sums, histograms, values = daily_arrays(state)
+
+    # 2. Daily values and trailing windows from cumulative sums over the days
+    daily = trend_table(counts, sums, histograms, values, pd.Index(days, name='date'), (1, *windows))
+    weekly = weekly_table(days, counts, sums, histograms, values)
+
+    # 3. Print the weekly table and save the daily one
+    print(f'{int(counts.sum())} posts over {len(days)} days ({(counts == 0).sum()} days without posts)')
+    with pd.option_context('display.max_rows', None, 'display.precision', 2):
+        print(weekly.to_string())
+    if output:
+        daily.to_csv(output)
+
+    if stats_only:
+        return
+
+    # 4. Plot the year-long trends
+    plot_trends(daily, windows, '../Graphs/daily_trends.png')
+
+
+if __name__ == '__main__':
+    parser = make_parser('Daily and weekly post volume and score over the year with rolling windows')
+    parser.add_argument('--windows', type=int, nargs='+', default=[7, 28], help='rolling window lengths in days')
+    parser.add_argument('--output', metavar='PATH', help='save the daily table as CSV to PATH')
+    args = parser.parse_args()
+    main(stats_only=args.stats_only, reader=args.reader, windows=args.windows, output=args.output)
+    if args.import_times:
+        print_import_times()
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+from Utility.lazy_utility import lazy_import, print_import_times
+from Utility.cli_utility import make_parser
+from Utility.read_utility import read_data
+from Utility.ngram_utility import hashed_matrix, ngram_table, feature_labels
+
+plt = lazy_import('matplotlib.pyplot')
+sns = lazy_import('seaborn')
+
+
+def rank_ngrams(table, top):
+    # the n-grams most over- and under-represented among high-scoring titles, by the z-score of the log-odds;
+    # with fewer than 2 * top ranked columns each list gets half, so no n-gram is in both
+    order = np.argsort(-table['z'].to_numpy(), kind='stable')
+    top = min(top, len(order) // 2)
+    return table.iloc[order[:top]], table.iloc[order[len(order) - top:][::-1]]
+
+
+def print_ngrams(name, table):
+    print(f'{name}:')
+    with pd.option_context('display.width', 200, 'display.precision', 3):
+        print(table[['ngram', 'titles', 'high_share', 'mean_score', 'log_odds', 'z']].to_string(index=False))
+
+
+def plot_ngrams(over, under, save_path):
+
+    sns.set()
+    plt.close()
+
+    shown = pd.concat([under.iloc[::-1], over.iloc[::-1]])
+    fig, ax = plt.subplots(figsize=(8, max(4, 0.3 * len(shown))))
+    colors = np.where(shown['log_odds'] > 0, 'lightcoral', 'skyblue')
+    ax.barh(range(len(shown)), shown['log_odds'], color=colors)
+    ax.set_yticks(range(len(shown)))
+    ax.set_yticklabels(shown['ngram'])
+    ax.axvline(0, color='grey', linewidth=1)
+    ax.set_xlabel('Log-odds ratio of a score above the median, titles with vs without the n-gram')
+    ax.set_title('Title n-grams that go with high and low scores')
+
+    plt.savefig(save_path, bbox_inches='tight')
+
+
+def main(stats_only=False, reader='pandas', n_features=2 ** 20, min_count=20, top=20, output=None):
+
+    # 1. Read in the reddit submission data
+    df = read_data(backend=reader)
+    df = df[df['title'].notna()]
+
+    # 2. Hash the unigrams and bigrams of every title into a sparse matrix
+    X = hashed_matrix(df['title'], n_features)
+    print(f'{X.shape[0]} titles, {X.nnz} title n-grams in {n_features} hashed columns')
+
+    # 3. Titles, mean score and log-odds of a high score for every column seen in at least min_count titles
+    table = ngram_table(X, df['score'], min_count)
+
+    # 4. Name only the columns that are reported
+    over, under = rank_ngrams(table, top)
+    labels = feature_labels(df['title'], pd.concat([over, under])['feature'], n_features)
+    over, under = [part.assign(ngram=part['feature'].map(labels)) for part in (over, under)]
+    print_ngrams('Over-performing n-grams', over)
+    print_ngrams('Under-performing n-grams', under)
+    if output:
+        table.to_csv(output, index=False)
+
+    if stats_only:
+        return
+
+    # 5. Plot the log-odds of the top and bottom n-grams
+    plot_ngrams(over, under, '../Graphs/title_ngrams.png')
+
+
+if __name__ == '__main__':
+    parser = make_parser('Find the title words and phrases that go with high and low scores')
+    parser.add_argument('--features', type=int, default=2 ** 20, help='number of hashed n-gram columns')
+    parser.add_argument('--min-count', type=int, default=20, help='fewest titles an n-gram needs to be ranked')
+    parser.add_argument('--top', type=int, default=20, help='n-grams to print and plot in each direction')
+    parser.add_argument('--output', metavar='PATH',
+                        help='save every ranked column (hashed index, without its text) as CSV to PATH')
+    args = parser.parse_args()
+    main(stats_only=args.stats_only, reader=args.reader, n_features=args.features, min_count=args.min_count,
+         top=args.top, output=args.output)
+    if args.import_times:
+        print_import_times()
@@ -0,0 +1,52 @@
+import time
+import pandas as pd
+from Utility.lazy_utility import lazy_import
+from Utility.read_utility import read_data
+from Utility.vader_utility import compile_lexicon, polarity_scores
+from sentiment import final_sentiment
+
+vader = lazy_import('vaderSentiment.vaderSentiment')
+
+
+def time_exact(texts, analyzer):
+    start = time.perf_counter()
+    scores = pd.DataFrame([analyzer.polarity_scores(text) for text in texts])
+    return time.perf_counter() - start, scores
+
+
+def time_fast(texts, lexicon):
+    start = time.perf_counter()
+    scores = polarity_scores(texts, lexicon)
+    return time.perf_counter() - start, scores
+
+
+def accuracy_report(column, exact, fast):
+    # how often the fast engine reproduces stock VADER, and whether differences change the category
+    print(f'{column}: {len(exact)} texts')
+    for score in ['compound', 'pos', 'neu', 'neg']:
+        difference = (exact[score] - fast[score]).abs()
+        print(f' {score}: identical for {(difference == 0).mean():.4%}, largest difference {difference.max():.4f}')
+
+    exact_category = exact.apply(final_sentiment, axis=1)
+    fast_category = fast.apply(final_sentiment, axis=1)
+    print(f' positive/negative/neutral category agrees for {(exact_category == fast_category).mean():.4%}')
+    if (exact_category != fast_category).any():
+        print(pd.crosstab(exact_category.rename('exact'), fast_category.rename('fast')))
+
+
+def main():
+    df = read_data()
+
+    analyzer = vader.SentimentIntensityAnalyzer()
+    lexicon = compile_lexicon(analyzer)
+
+    for column in ['title', 'selftext']:
+        texts = df[column].reset_index(drop=True)
+        exact_time, exact = time_exact(texts, analyzer)
+        fast_time, fast = time_fast(texts, lexicon)
+        print(f'{column}: exact {exact_time:.2f}s, fast {fast_time:.2f}s ({exact_time / fast_time:.1f}x faster)')
+        accuracy_report(column, exact, fast)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+import re
+import functools
+import operator
+
+# The row filters, written once as data and compiled both to one Spark column expression (gather_clean.py)
+# and to a vectorized pandas mask or Polars expression (the analysis scripts), so both sides keep exactly
+# the same rows.
+# A rule is a dict with a name, a kind, a column and, for 'equals', a value:
+#  not_null  the column has a value
+#  equals    the column equals the value (a missing value fails)
+#  has_text  the column has a value that, ignoring surrounding whitespace, is not empty or a placeholder
+
+# whitespace spelled out, so Java (Spark), Python, RE2 (Arrow-backed pandas strings) and Rust (Polars) agree on it
+WHITESPACE = r'[ \t\n\r\f\x0b]'
+PLACEHOLDERS = ['.', '[removed]', '[deleted]']
+BLANK_TEXT = f"^{WHITESPACE}*(?:{'|'.join(re.escape(text) for text in PLACEHOLDERS)})?{WHITESPACE}*$"
+BLANK_PATTERN = re.compile(BLANK_TEXT)
+
+
+def not_null(column):
+    return {'name': f'{column} not null', 'kind': 'not_null', 'column': column}
+
+
+def equals(column, value):
+    return {'name': f'{column} == {value}', 'kind': 'equals', 'column': column, 'value': value}
+
+
+def has_text(column):
+    return {'name': f'{column} has text', 'kind': 'has_text', 'column': column}
+
+
+# every rule of gather_clean.filter_unwanted_data
+CLEANING_RULES = [
+    *[not_null(column) for column in
+      ['score', 'num_comments', 'ups', 'created_utc', 'subreddit', 'author', 'subreddit_id']],
+    # Added the following to refine filter - Ryan 2023 July 26
+    equals('over_18', False),
+    equals('is_self', True),
+    # Added the following to refine the dataset - Arda Cifci - 2023 July 31
+    has_text('selftext'),
+    has_text('title'),
+]
+
+# the posts with a body that readability.py and post_length.py analyse
+SELFTEXT_RULES = [has_text('selftext')]
+
+
+def spark_condition(rule):
+    # one rule as a Spark column expression
+    from pyspark.sql import functions
+
+    column = functions.col(rule['column'])
+    if rule['kind'] == 'not_null':
+        return column.isNotNull()
+    if rule['kind'] == 'equals':
+        return column == rule['value']
+    if rule['kind'] == 'has_text':
+        return column.isNotNull() & ~column.rlike(BLANK_TEXT)
+    raise ValueError(f"unknown rule kind: {rule['kind']}")
+
+
+def spark_filter(rules):
+    # all rules as a single Spark column expression
+    return functools.reduce(operator.and_, [spark_condition(rule) for rule in rules])
+
+
+def pandas_condition(df, rule):
+    # one rule as a boolean Series over the rows of df
+    column = df[rule['column']]
+    if rule['kind'] == 'not_null':
+        return column.notna()
+    if rule['kind'] == 'equals':
+        return column.notna() & (column == rule['value'])
+    if rule['kind'] == 'has_text':
+        return column.notna() & ~column.str.contains(BLANK_TEXT, regex=True, na=True)
+    raise ValueError(f"unknown rule kind: {rule['kind']}")
+
+
+def pandas_mask(df, rules):
+    # all rules as one boolean Series, True for the rows to keep
+    return functools.reduce(operator.and_, [pandas_condition(df, rule) for rule in rules])
+
+
+def polars_condition(rule):
+    # one rule as a Polars expression, so a lazy query can push it down to the scan
+    import polars as pl
+
+    column = pl.col(rule['column'])
+    if rule['kind'] == 'not_null':
+        return column.is_not_null()
+    if rule['kind'] == 'equals':
+        return column.is_not_null() & (column == rule['value'])
+    if rule['kind'] == 'has_text':
+        return column.is_not_null() & ~column.str.contains(BLANK_TEXT)
+    raise ValueError(f"unknown rule kind: {rule['kind']}")
+
+
+def polars_filter(rules):
+    # all rules as one Polars expression, True for the rows to keep
+    return functools.reduce(operator.and_, [polars_condition(rule) for rule in rules])
+
+
+def record_condition(record, rule):
+    # one rule for one parsed JSON record, a missing or null field failing as it does in Spark
+    value = record.get(rule['column'])
+    if value is None:
+        return False
+    if rule['kind'] == 'not_null':
+        return True
+    if rule['kind'] == 'equals':
+        return value == rule['value']
+    if rule['kind'] == 'has_text':
+        return BLANK_PATTERN.search(str(value)) is None
+    raise ValueError(f"unknown rule kind: {rule['kind']}")
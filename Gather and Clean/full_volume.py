@@ -0,0 +1,163 @@
+from pyspark.sql import SparkSession, functions, types
+import sys
+import argparse
+import json
+from filter_rules import CLEANING_RULES, spark_filter
+
+assert sys.version_info >= (3, 8)  # make sure we have Python 3.8+
+
+spark = SparkSession.builder.appName('Full-volume Reddit summaries').getOrCreate()
+spark.sparkContext.setLogLevel('WARN')
+
+assert spark.version >= '3.2'  # make sure we have Spark 3.2+
+
+# created_utc is read as UTC and the hours are taken in PST, like submission_byhour.fix_date
+spark.conf.set('spark.sql.session.timeZone', 'UTC')
+ANALYSIS_TIMEZONE = 'Etc/GMT+8'
+
+# The analyses of the Data Analysis scripts as Spark aggregations over every filtered post of the year,
+# instead of the 25,000-row monthly samples: only small summary tables (moments, score histograms,
+# counts) reach the driver, and full_volume_analysis.py runs the scipy tests and plots on them.
+
+SPLIT_FEATURES = ['num_comments', 'post_length', 'subreddit_popularity']
+SENTIMENT_CLASSES = ['positive', 'negative', 'neutral']
+
+
+def prepare_posts(df):
+    # the filtered posts with the columns and features the analyses use
+    df = df.filter(spark_filter(CLEANING_RULES))
+    df = df.select(
+        df['score'],
+        df['num_comments'],
+        df['subreddit'],
+        df['title'],
+        df['selftext'],
+        functions.hour(functions.from_utc_timestamp(df['created_utc'].cast(types.TimestampType()),
+                                                    ANALYSIS_TIMEZONE)).alias('hour'),
+        functions.length(df['selftext']).alias('post_length'),
+    )
+
+    # subreddit_popularity.groupby_subreddit_size: the number of posts of the post's subreddit
+    popularity = df.groupBy('subreddit').agg(functions.count('*').alias('subreddit_popularity'))
+    return df.join(popularity, 'subreddit')
+
+
+def moment_columns(score):
+    # count, mean and M2 (sum of squared deviations) of score, the mergeable moments of
+    # state_utility.moments_state; Spark's variance aggregate is computed from merged central moments
+    score = score.cast('double')
+    return [
+        functions.count(score).alias('count'),
+        functions.avg(score).alias('mean'),
+        (functions.var_pop(score) * functions.count(score)).alias('m2'),
+    ]
+
+
+def moments(row):
+    return {'count': row['count'], 'mean': row['mean'] or 0.0, 'm2': row['m2'] or 0.0}
+
+
+def grouped_moments(df, group):
+    # score moments of every value of the group column
+    return {str(row[group]): moments(row) for row in df.groupBy(group).agg(*moment_columns(df['score'])).collect()}
+
+
+def grouped_score_counts(df, group):
+    # score -> count of every value of the group column, enough for an exact Mann-Whitney U and score quantiles
+    counts = {}
+    for row in df.groupBy(group, 'score').count().collect():
+        counts.setdefault(str(row[group]), {})[str(row['score'])] = row['count']
+    return counts
+
+
+def feature_rows(df, feature):
+    # the posts each script tests the feature on (num_comments.py drops posts without comments)
+    if feature == 'num_comments':
+        return df.filter(df['num_comments'] >= 1)
+    return df
+
+
+def split_summary(df, feature, relative_error):
+    # median split and terciles of one feature from approxQuantile, with the score moments of every
+    # group (Welch t-test, ANOVA) and the score histograms of the median groups (Mann-Whitney U)
+    df = feature_rows(df, feature)
+    lower, median, upper = df.approxQuantile(feature, [1 / 3, 0.5, 2 / 3], relative_error)
+
+    df = df.withColumn('median_group', functions.when(df[feature] > median, 'high').otherwise('low'))
+    # pd.qcut bins are closed on the right: (min, q1], (q1, q2], (q2, max]
+    df = df.withColumn('tercile', functions.when(df[feature] <= lower, 'low')
+                                           .when(df[feature] <= upper, 'medium')
+                                           .otherwise('high'))
+    return {
+        'quantiles': {'lower': lower, 'median': median, 'upper': upper},
+        'median_split': grouped_moments(df, 'median_group'),
+        'median_split_score_counts': grouped_score_counts(df, 'median_group'),
+        'terciles': grouped_moments(df, 'tercile'),
+    }
+
+
+@functions.pandas_udf('double')
+def vader_compound(texts):
+    # stock VADER compound score, run on the executors a batch of texts at a time
+    from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+    analyzer = SentimentIntensityAnalyzer()
+    return texts.map(lambda text: analyzer.polarity_scores(text)['compound'])
+
+
+def sentiment_tables(df, mean_score):
+    # the contingency table of sentiment.calculate_chi for title and selftext:
+    # rows low / high score (score >= the mean), columns positive, negative, neutral
+    high = df['score'] >= mean_score
+    tables = {}
+    for text in ['title', 'selftext']:
+        compound = vader_compound(df[text])
+        sentiment = (functions.when(compound >= 0.05, 'positive')
+                              .when(compound <= -0.05, 'negative')
+                              .otherwise('neutral'))
+        aggregates = [functions.sum(functions.when((sentiment == category) & condition, 1).otherwise(0)).alias(f'{row}_{category}')
+                      for row, condition in [('low', ~high), ('high', high)] for category in SENTIMENT_CLASSES]
+        counts = df.agg(*aggregates).first()
+        tables[text] = [[counts[f'{row}_{category}'] or 0 for category in SENTIMENT_CLASSES] for row in ['low', 'high']]
+    return tables
+
+
+def main(inputs, output, relative_error=0.001, sentiment=False, top=100):
+    # every filtered post of the year, kept cached since each summary is its own aggregation
+    posts = prepare_posts(spark.read.json(inputs)).cache()
+
+    # score moments of the whole year and of each hour (PST)
+    overall = moments(posts.agg(*moment_columns(posts['score'])).first())
+    summary = {
+        'inputs': inputs,
+        'score': overall,
+        'hour': grouped_moments(posts, 'hour'),
+    }
+
+    # posts per subreddit: the most active ones and how many there are
+    subreddits = posts.groupBy('subreddit').count()
+    summary['subreddits'] = subreddits.count()
+    summary['subreddit_counts'] = {row['subreddit']: row['count'] for row in
+                                   subreddits.orderBy(functions.desc('count')).limit(top).collect()}
+
+    # median and tercile splits of each feature
+    summary['splits'] = {feature: split_summary(posts, feature, relative_error) for feature in SPLIT_FEATURES}
+
+    if sentiment:
+        summary['sentiment'] = sentiment_tables(posts, overall['mean'])
+
+    # the summaries are small, they are written on the driver
+    with open(output, 'w') as f:
+        json.dump(summary, f, indent=2)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Summarise every filtered post of the year for the analyses')
+    parser.add_argument('inputs', help='raw submissions of the whole year (json.gz), e.g. .../year=2016/month=*/*.json.gz')
+    parser.add_argument('output', help='JSON file for the summaries, written on the driver')
+    parser.add_argument('--relative-error', type=float, default=0.001,
+                        help='relative error of approxQuantile for the medians and terciles (0 is exact but slower)')
+    parser.add_argument('--sentiment', action='store_true',
+                        help='also score title and selftext with VADER on the executors (needs vaderSentiment and pyarrow there)')
+    parser.add_argument('--top', type=int, default=100, help='number of most active subreddits to keep')
+    args = parser.parse_args()
+    main(args.inputs, args.output, relative_error=args.relative_error, sentiment=args.sentiment, top=args.top)
@@ -1,5 +1,13 @@
-from pyspark.sql import SparkSession, functions, types
+from pyspark.sql import SparkSession, functions, types, Window
+import os
 import sys
+import argparse
+import json
+import time
+from urllib.error import URLError
+from urllib.request import urlopen
+from filter_rules import CLEANING_RULES, spark_condition, spark_filter
+from minhash import NUM_HASHES, NUM_BANDS, DEDUP_SIMILARITY, minhash_signature
 
 assert sys.version_info >= (3, 8)  # make sure we have Python 3.8+
 
@@ -9,44 +17,111 @@ spark.sparkContext.setLogLevel('WARN')
 assert sys.version_info >= (3, 8)  # make sure we have Python 3.8+
 assert spark.version >= '3.2'  # make sure we have Spark 3.2+
 
+# the MinHash UDF runs on the executors, which need its module too
+spark.sparkContext.addPyFile(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'minhash.py'))
 
-def filter_unwanted_data(df):
+
+# per-post features of the author's activity over the whole filtered month, added with --author-features
+AUTHOR_FEATURES = ['author_posts', 'author_mean_score', 'author_subreddits']
+
+# posts of deleted accounts share this name, they are not one author
+DELETED_AUTHOR = '[deleted]'
+
+
+def filter_predicates():
     # if there is a null or none in an important part of the data remove the row
-    # additionally check if title or selftext is empty or has just spaces, etc and remove them
-
-    filtered_data = df.filter(
-        (df['score'].isNotNull()) &
-        (df['num_comments'].isNotNull()) &
-        (df['ups'].isNotNull()) &
-        (df['created_utc'].isNotNull()) &
-        (df['subreddit'].isNotNull()) &
-        (df['author'].isNotNull()) &
-        (df['title'].isNotNull()) &
-        (df['selftext'].isNotNull()) &
-        (df['subreddit_id'].isNotNull()) &
-        # Added the following to refine filter - Ryan 2023 July 26
-        (df['over_18'] == False) &
-        (df['is_self'] == True) &
-        # Added the following to refine the dataset - Arda Cifci - 2023 July 31
-        (df['selftext'] != '[removed]') & (df['selftext'] != '[deleted]') &
-        (df['title'] != '[removed]') & (df['title'] != '[deleted]') &
-        (df['word_count_self'] >= 1) &
-        (df['word_count_title'] >= 1) &
-        (df['selftext'] != ' ') &
-        (df['selftext'] != "  ") &
-        (df['selftext'] != "   ") &
-        (df['selftext'] != '.') &
-        (df['selftext'] != '') &
-        (df['title'] != '') &
-        (df['title'] != ' ') &
-        (df['title'] != "  ") &
-        (df['title'] != "   ") &
-        (df['title'] != '.')
-    )
+    # additionally check if title or selftext is empty, a placeholder or just whitespace and remove them
+    # every rule of filter_rules.CLEANING_RULES by name, a row is kept only if it passes all of them
+    return [(rule['name'], spark_condition(rule)) for rule in CLEANING_RULES]
+
+
+def filter_unwanted_data(df):
+    # keep the rows that pass every cleaning rule, as one column expression
+    filtered_data = df.filter(spark_filter(CLEANING_RULES))
 
     return filtered_data
 
 
+def count_filter_drops(df):
+    # in one aggregation over the rows entering filter_unwanted_data: how many rows each rule rejects
+    # (a null comparison rejects like filter does) and how many rows that rule alone rejects
+    predicates = filter_predicates()
+    failures = [functions.when(functions.coalesce(condition, functions.lit(False)), 0).otherwise(1)
+                for _, condition in predicates]
+    df = df.select(functions.array(*failures).alias('failures'))
+    df = df.withColumn('failed_rules', functions.aggregate('failures', functions.lit(0), lambda acc, x: acc + x))
+
+    aggregates = []
+    for i in range(len(predicates)):
+        failed = df['failures'][i] == 1
+        aggregates.append(functions.sum(functions.when(failed, 1).otherwise(0)).alias(f'failed_{i}'))
+        aggregates.append(functions.sum(functions.when(failed & (df['failed_rules'] == 1), 1).otherwise(0)).alias(f'only_{i}'))
+    counts = df.agg(*aggregates).first()
+
+    return [{'rule': name, 'rows_failed': counts[f'failed_{i}'] or 0, 'rows_only_this_rule': counts[f'only_{i}'] or 0}
+            for i, (name, _) in enumerate(predicates)]
+
+
+def remove_near_duplicates(df):
+    # remove reposts, cross-posts and bot spam with identical or near-identical title + selftext,
+    # keeping the post with the smallest name (id) of each group
+    minhash = functions.udf(minhash_signature, types.ArrayType(types.LongType()))
+    df = df.withColumn('minhash', minhash(df['title'], df['selftext']))
+
+    # identical signatures first, so large groups of copies do not turn into all-pairs comparisons below
+    first_copy = Window.partitionBy('minhash').orderBy('name')
+    df = df.withColumn('copy_number', functions.row_number().over(first_copy))
+    df = df.filter(df['copy_number'] == 1).drop('copy_number')
+
+    # LSH banding: posts whose signatures match on every row of some band become candidate pairs
+    rows_per_band = NUM_HASHES // NUM_BANDS
+    bands = functions.array(*[
+        functions.struct(
+            functions.lit(band).alias('band'),
+            functions.hash(functions.slice(df['minhash'], band * rows_per_band + 1, rows_per_band)).alias('bucket'))
+        for band in range(NUM_BANDS)
+    ])
+    buckets = df.select(df['name'], df['minhash'], functions.explode(bands).alias('band'))
+    buckets = buckets.select('name', 'minhash', 'band.band', 'band.bucket')
+
+    left = buckets.alias('left')
+    right = buckets.alias('right')
+    candidates = left.join(
+        right,
+        (functions.col('left.band') == functions.col('right.band')) &
+        (functions.col('left.bucket') == functions.col('right.bucket')) &
+        (functions.col('left.name') < functions.col('right.name'))
+    )
+
+    # check each candidate pair on the whole signature, then drop the larger name of each similar pair
+    agreement = functions.expr(
+        'aggregate(zip_with(left.minhash, right.minhash, (x, y) -> IF(x = y, 1, 0)), 0, (acc, v) -> acc + v)'
+    ) / NUM_HASHES
+    duplicates = candidates.filter(agreement >= DEDUP_SIMILARITY)
+    duplicates = duplicates.select(functions.col('right.name').alias('duplicate_name')).distinct()
+
+    df = df.join(duplicates, df['name'] == duplicates['duplicate_name'], 'left_anti')
+    return df.drop('minhash')
+
+
+def author_features(df):
+    # posts, mean score and distinct subreddits of every author, aggregated by hash on the author
+    # name over all rows passed in (before sampling, so the counts are the author's real activity)
+    df = df.filter(df['author'] != DELETED_AUTHOR)
+    return df.groupBy('author').agg(
+        functions.count('*').alias('author_posts'),
+        functions.avg('score').alias('author_mean_score'),
+        functions.countDistinct('subreddit').alias('author_subreddits'),
+    )
+
+
+def add_author_features(df, authors):
+    # attach the author features to each post, keeping the selected columns in their order
+    columns = df.columns
+    df = df.join(authors, on='author', how='left')
+    return df.select(*columns, *AUTHOR_FEATURES)
+
+
 def select_columns(df):
     # select the final columns we want
     df = df.select(
@@ -132,9 +207,78 @@ def one_word(df):
     return df
 
 
-def main(in_directory, out_directory):
+def spark_stage_metrics(job_group):
+    # executor time, input/output bytes and shuffle bytes of the Spark jobs in one job group, from the
+    # status REST API that the UI's listener keeps up to date (empty when the UI is disabled)
+    sc = spark.sparkContext
+    if not sc.uiWebUrl:
+        return {}
+    api = f'{sc.uiWebUrl}/api/v1/applications/{sc.applicationId}'
+    try:
+        with urlopen(f'{api}/jobs') as response:
+            jobs = json.load(response)
+        with urlopen(f'{api}/stages') as response:
+            stages = json.load(response)
+    except (URLError, OSError, ValueError):
+        return {}
+
+    stage_ids = {stage_id for job in jobs if job.get('jobGroup') == job_group for stage_id in job['stageIds']}
+    totals = {'executor_run_time_ms': 0, 'input_bytes': 0, 'output_bytes': 0,
+              'shuffle_read_bytes': 0, 'shuffle_write_bytes': 0}
+    for stage in stages:
+        if stage['stageId'] in stage_ids:
+            totals['executor_run_time_ms'] += stage.get('executorRunTime', 0)
+            totals['input_bytes'] += stage.get('inputBytes', 0)
+            totals['output_bytes'] += stage.get('outputBytes', 0)
+            totals['shuffle_read_bytes'] += stage.get('shuffleReadBytes', 0)
+            totals['shuffle_write_bytes'] += stage.get('shuffleWriteBytes', 0)
+    return totals
+
+
+def run_stage(metrics, stage, action):
+    # run one Spark action under its own job group and record its wall time and Spark stage metrics
+    spark.sparkContext.setJobGroup(stage, f'gather_clean {stage}')
+    start = time.perf_counter()
+    result = action()
+    metrics['stages'].append({'stage': stage, 'seconds': time.perf_counter() - start, **spark_stage_metrics(stage)})
+    spark.sparkContext.setLocalProperty('spark.jobGroup.id', None)
+    return result
+
+
+def record_rows(metrics, stage, df, cache=True):
+    # count the rows left after a stage, keeping them cached so the next stage starts from here
+    if cache:
+        df = df.cache()
+    rows = run_stage(metrics, stage, df.count)
+    metrics['stages'][-1]['rows'] = rows
+    return df
+
+
+def print_metrics(metrics):
+    print(f"Metrics for {metrics['input']}:")
+    for stage in metrics['stages']:
+        details = ', '.join(f'{key} = {value}' for key, value in stage.items() if key not in ['stage', 'seconds'])
+        print(f" {stage['stage']}: {stage['seconds']:.1f}s" + (f', {details}' if details else ''))
+    print(' rows rejected by each filter rule (alone = rejected by no other rule):')
+    for rule in sorted(metrics['filter_rules'], key=lambda rule: rule['rows_failed'], reverse=True):
+        print(f" {rule['rule']}: {rule['rows_failed']} (alone: {rule['rows_only_this_rule']})")
+
+
+def main(in_directory, out_directory, dedup=True, metrics_path=None, with_author_features=False):
+    # stage row counts, timings and filter accounting are only collected when asked for,
+    # since every count is an extra Spark job
+    metrics = {'input': in_directory, 'stages': [], 'filter_rules': []} if metrics_path else None
+
     # put input file into dataframe
     reddit_data = spark.read.json(in_directory)
+    if metrics is not None:
+        record_rows(metrics, 'read', reddit_data, cache=False)
+
+    # activity of every author over the whole month, every row that passes the filter counts
+    if with_author_features:
+        authors = author_features(filter_unwanted_data(reddit_data))
+        if metrics is not None:
+            authors = record_rows(metrics, 'author features', authors)
 
     # randomize the rows
     reddit_data = reddit_data.orderBy(functions.rand())
@@ -144,9 +288,27 @@ def main(in_directory, out_directory):
 
     # get the number of words in body text and title
     reddit_data = one_word(reddit_data)
+    if metrics is not None:
+        reddit_data = record_rows(metrics, 'sample', reddit_data)
+        metrics['filter_rules'] = run_stage(metrics, 'filter accounting', lambda: count_filter_drops(reddit_data))
 
     # remove rows with missing important data
     reddit_data = filter_unwanted_data(reddit_data)
+    if metrics is not None:
+        reddit_data = record_rows(metrics, 'filter', reddit_data)
+
+    # remove near-duplicate posts and report how many rows this month lost
+    if dedup:
+        reddit_data = reddit_data.cache()
+        rows_before = reddit_data.count()
+        if metrics is None:
+            reddit_data = remove_near_duplicates(reddit_data).cache()
+            rows_after = reddit_data.count()
+        else:
+            reddit_data = record_rows(metrics, 'dedup', remove_near_duplicates(reddit_data))
+            rows_after = metrics['stages'][-1]['rows']
+        print(f'Near-duplicate removal: {rows_before - rows_after} of {rows_before} rows removed '
+              f'({rows_after} left) for {in_directory}')
 
     # change date from epoch utc into spark Timestamp Type
     reddit_data = fix_date(reddit_data)
@@ -156,16 +318,36 @@ def main(in_directory, out_directory):
 
     # select columns we want to keep / remove columns we have no use for
     cleaned_data = select_columns(reddit_data)
+    if with_author_features:
+        cleaned_data = add_author_features(cleaned_data, authors)
 
     # limit the sample to 25,000 rows (25,000 rows for each month)
     cleaned_data = cleaned_data.limit(25000)
 
-    # output as json gz
-    cleaned_data.write.json(
-        out_directory, compression='gzip', mode='overwrite')
+    if metrics is None:
+        # output as json gz
+        cleaned_data.write.json(
+            out_directory, compression='gzip', mode='overwrite')
+        return
+
+    cleaned_data = record_rows(metrics, 'limit', cleaned_data)
+    run_stage(metrics, 'write', lambda: cleaned_data.write.json(out_directory, compression='gzip', mode='overwrite'))
+    print_metrics(metrics)
+    with open(metrics_path, 'w') as f:
+        json.dump(metrics, f, indent=2)
 
 
 if __name__ == '__main__':
-    inputs = sys.argv[1]
-    output = sys.argv[2]
-    main(inputs, output)
+    parser = argparse.ArgumentParser(description='Gather and clean one month of Reddit submissions')
+    parser.add_argument('inputs', help='raw submissions of one month (json.gz)')
+    parser.add_argument('output', help='output directory for the cleaned json.gz files')
+    parser.add_argument('--no-dedup', action='store_true', help='keep near-duplicate posts')
+    parser.add_argument('--metrics', metavar='PATH',
+                        help='print rows per stage, rows rejected per filter rule, stage times and bytes, '
+                             'and save them as JSON to PATH on the driver')
+    parser.add_argument('--author-features', action='store_true',
+                        help="add each author's post count, mean score and number of subreddits over the "
+                             'whole filtered month to every post')
+    args = parser.parse_args()
+    main(args.inputs, args.output, dedup=not args.no_dedup, metrics_path=args.metrics,
+         with_author_features=args.author_features)
@@ -0,0 +1,287 @@
+import os
+import sys
+import argparse
+import bz2
+import glob
+import gzip
+import json
+import lzma
+import random
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from filter_rules import CLEANING_RULES, record_condition
+from minhash import minhash_signature, near_duplicate_names
+from zone_maps import ZONE_MAP_FILE_NAME, write_row_groups, write_zone_map_file
+
+assert sys.version_info >= (3, 9)  # make sure we have Python 3.9+ (zoneinfo)
+
+# gather_clean.py without Spark: one month of raw submissions is streamed through a process pool on a
+# single machine, with the same rules, output columns and json.gz layout as the Spark job, so cleaned
+# data can be regenerated (and the cleaning logic tested) without a cluster. The 25,000 rows are a
+# uniform reservoir sample of every row that passes the filter.
+
+SAMPLE_SIZE = 25000
+LINES_PER_BATCH = 5000
+
+# the columns of gather_clean.select_columns, in the same order
+OUTPUT_COLUMNS = [
+    'name', 'downs', 'ups', 'hide_score', 'subreddit', 'link_flair_css_class', 'locked', 'num_comments',
+    'id', 'preview', 'link_flair_text', 'score', 'author', 'author_flair_css_class', 'stickied', 'title',
+    'selftext', 'over_18', 'author_flair_text', 'thumbnail', 'gilded', 'subreddit_id', 'is_self', 'date',
+    'datetime', 'word_count_self', 'word_count_title',
+]
+
+# the per-post author features of gather_clean.py --author-features, after the other columns
+AUTHOR_FEATURES = ['author_posts', 'author_mean_score', 'author_subreddits']
+
+# posts of deleted accounts share this name, they are not one author
+DELETED_AUTHOR = '[deleted]'
+
+OPENERS = {'.gz': gzip.open, '.bz2': bz2.open, '.xz': lzma.open}
+
+
+def input_paths(inputs):
+    # the files Spark would read for the input argument: a glob, a file or a directory of files
+    if os.path.isdir(inputs):
+        inputs = os.path.join(inputs, '*')
+    paths = sorted(path for path in glob.glob(inputs) if os.path.isfile(path))
+    if not paths:
+        raise FileNotFoundError(f'no input files match {inputs}')
+    return paths
+
+
+def read_lines(paths):
+    # stream-decompress the raw dump line by line
+    for path in paths:
+        opener = OPENERS.get(os.path.splitext(path)[1], open)
+        with opener(path, 'rt', encoding='utf-8') as f:
+            yield from f
+
+
+def line_batches(lines):
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) == LINES_PER_BATCH:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def one_word(record):
+    # Spark's size(split(trim(text), ' ')): trim only removes spaces, empty pieces are counted, null is -1
+    for column, count_column in [('selftext', 'word_count_self'), ('title', 'word_count_title')]:
+        text = record.get(column)
+        record[count_column] = -1 if text is None else len(str(text).strip(' ').split(' '))
+    return record
+
+
+def spark_timestamp(seconds, timezone):
+    # how Spark writes a timestamp to JSON: yyyy-MM-dd'T'HH:mm:ss.SSSXXX in the session time zone
+    moment = datetime.fromtimestamp(seconds, timezone).astimezone(timezone)
+    offset = moment.strftime('%z')
+    offset = 'Z' if offset == '+0000' else f'{offset[:3]}:{offset[3:]}'
+    return f"{moment.strftime('%Y-%m-%dT%H:%M:%S')}.{moment.microsecond // 1000:03d}{offset}", moment.strftime('%Y-%m-%d')
+
+
+def fix_date(record, timezone):
+    # created_utc (epoch seconds) becomes the datetime timestamp and its date, then is dropped
+    created_utc = record.pop('created_utc', None)
+    try:
+        seconds = int(created_utc)
+    except (TypeError, ValueError):
+        seconds = None
+    if seconds is None:
+        record['datetime'] = record['date'] = None
+    else:
+        record['datetime'], record['date'] = spark_timestamp(seconds, timezone)
+    return record
+
+
+def count_author(authors, record):
+    # add one passing post to its author's [posts, score sum, subreddits] (deleted accounts are skipped)
+    author = record.get('author')
+    if author is None or author == DELETED_AUTHOR:
+        return
+    activity = authors.setdefault(author, [0, 0, set()])
+    activity[0] += 1
+    activity[1] += record['score']
+    if record.get('subreddit') is not None:
+        activity[2].add(record['subreddit'])
+
+
+def merge_authors(authors, batch_authors):
+    for author, (posts, score_sum, subreddits) in batch_authors.items():
+        activity = authors.setdefault(author, [0, 0, set()])
+        activity[0] += posts
+        activity[1] += score_sum
+        activity[2] |= subreddits
+
+
+def add_author_features(record, authors):
+    # gather_clean.add_author_features: the author's activity over every passing post of the month,
+    # left out like Spark's nulls for deleted accounts
+    activity = authors.get(record.get('author'))
+    if activity is not None:
+        posts, score_sum, subreddits = activity
+        record.update({'author_posts': posts, 'author_mean_score': score_sum / posts,
+                       'author_subreddits': len(subreddits)})
+    return record
+
+
+def clean_batch(lines, timezone_name, with_author_features=False):
+    # parse, count words, filter and fix the dates of one batch of raw lines; returns the cleaned
+    # records, how many records each rule rejected and how many each rule alone rejected, and
+    # (with author features) the activity of every author in the batch
+    timezone = ZoneInfo(timezone_name) if timezone_name else None
+    records = []
+    authors = {}
+    rows_failed = [0] * len(CLEANING_RULES)
+    rows_only_this_rule = [0] * len(CLEANING_RULES)
+
+    for line in lines:
+        if not line.strip():
+            continue
+        record = one_word(json.loads(line))
+        failed = [i for i, rule in enumerate(CLEANING_RULES) if not record_condition(record, rule)]
+        for i in failed:
+            rows_failed[i] += 1
+        if len(failed) == 1:
+            rows_only_this_rule[failed[0]] += 1
+        if not failed:
+            if with_author_features:
+                count_author(authors, record)
+            record = fix_date(record, timezone)
+            records.append({column: record[column] for column in OUTPUT_COLUMNS if record.get(column) is not None})
+
+    return len(lines), records, rows_failed, rows_only_this_rule, authors
+
+
+def imap_bounded(executor, in_flight, function, batches, *args):
+    # executor.map submits everything at once; keep only a few batches in flight so memory stays flat
+    pending = []
+    for batch in batches:
+        pending.append(executor.submit(function, batch, *args))
+        if len(pending) >= in_flight:
+            yield pending.pop(0).result()
+    for future in pending:
+        yield future.result()
+
+
+def write_output(records, out_directory):
+    # one gzipped JSON-lines part file plus _SUCCESS, replacing an earlier run's output like mode='overwrite';
+    # the file is written in row groups and their zone maps go to _zone_maps.json
+    os.makedirs(out_directory, exist_ok=True)
+    for name in os.listdir(out_directory):
+        if name.startswith('part-') or name in ['_SUCCESS', ZONE_MAP_FILE_NAME]:
+            os.remove(os.path.join(out_directory, name))
+
+    name = f'part-00000-{uuid.uuid4()}-c000.json.gz'
+    path = os.path.join(out_directory, name)
+    lines = [json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n' for record in records]
+    write_zone_map_file(out_directory, {name: write_row_groups(lines, path)})
+    open(os.path.join(out_directory, '_SUCCESS'), 'w').close()
+    return os.path.getsize(path)
+
+
+def main(in_directory, out_directory, dedup=True, metrics_path=None, workers=None, seed=None, timezone=None,
+         with_author_features=False):
+    paths = input_paths(in_directory)
+    workers = workers or os.cpu_count()
+    rng = random.Random(seed)
+    metrics = {'input': in_directory, 'input_bytes': sum(os.path.getsize(path) for path in paths),
+               'stages': [], 'filter_rules': []}
+
+    # stream, clean and filter in the process pool, keeping a uniform reservoir sample of the passing rows
+    start = time.perf_counter()
+    rows_read = rows_passed = 0
+    rows_failed = [0] * len(CLEANING_RULES)
+    rows_only_this_rule = [0] * len(CLEANING_RULES)
+    sample = []
+    authors = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for lines, records, failed, only, batch_authors in imap_bounded(executor, 2 * workers, clean_batch,
+                                                                       line_batches(read_lines(paths)), timezone,
+                                                                       with_author_features):
+            rows_read += lines
+            # activity of every author over the whole month, every row that passes the filter counts
+            merge_authors(authors, batch_authors)
+            rows_failed = [a + b for a, b in zip(rows_failed, failed)]
+            rows_only_this_rule = [a + b for a, b in zip(rows_only_this_rule, only)]
+            for record in records:
+                rows_passed += 1
+                if len(sample) < SAMPLE_SIZE:
+                    sample.append(record)
+                else:
+                    position = rng.randrange(rows_passed)
+                    if position < SAMPLE_SIZE:
+                        sample[position] = record
+    metrics['stages'].append({'stage': 'read', 'rows': rows_read})
+    metrics['stages'].append({'stage': 'filter', 'rows': rows_passed, 'seconds': time.perf_counter() - start})
+    if with_author_features:
+        metrics['stages'].append({'stage': 'author features', 'rows': len(authors)})
+    metrics['stages'].append({'stage': 'sample', 'rows': len(sample)})
+    metrics['filter_rules'] = [{'rule': rule['name'], 'rows_failed': failed, 'rows_only_this_rule': only}
+                               for rule, failed, only in zip(CLEANING_RULES, rows_failed, rows_only_this_rule)]
+
+    # remove near-duplicate posts within the sample and report how many rows this month lost
+    if dedup:
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            signatures = list(executor.map(minhash_signature, [record['title'] for record in sample],
+                                           [record['selftext'] for record in sample], chunksize=500))
+        duplicates = near_duplicate_names([record['name'] for record in sample], signatures)
+        rows_before = len(sample)
+        sample = [record for record in sample if record['name'] not in duplicates]
+        print(f'Near-duplicate removal: {rows_before - len(sample)} of {rows_before} rows removed '
+              f'({len(sample)} left) for {in_directory}')
+        metrics['stages'].append({'stage': 'dedup', 'rows': len(sample), 'seconds': time.perf_counter() - start})
+
+    if with_author_features:
+        sample = [add_author_features(record, authors) for record in sample]
+
+    # output as json gz
+    start = time.perf_counter()
+    output_bytes = write_output(sample, out_directory)
+    metrics['stages'].append({'stage': 'write', 'rows': len(sample), 'output_bytes': output_bytes,
+                              'seconds': time.perf_counter() - start})
+
+    if metrics_path:
+        print_metrics(metrics)
+        with open(metrics_path, 'w') as f:
+            json.dump(metrics, f, indent=2)
+
+
+def print_metrics(metrics):
+    print(f"Metrics for {metrics['input']} ({metrics['input_bytes']} input bytes):")
+    for stage in metrics['stages']:
+        details = ', '.join(f'{key} = {value}' for key, value in stage.items() if key not in ['stage', 'seconds'])
+        seconds = f", {stage['seconds']:.1f}s" if 'seconds' in stage else ''
+        print(f" {stage['stage']}: {details}{seconds}")
+    print(' rows rejected by each filter rule (alone = rejected by no other rule):')
+    for rule in sorted(metrics['filter_rules'], key=lambda rule: rule['rows_failed'], reverse=True):
+        print(f" {rule['rule']}: {rule['rows_failed']} (alone: {rule['rows_only_this_rule']})")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Gather and clean one month of Reddit submissions without Spark')
+    parser.add_argument('inputs', help='raw submissions of one month (json.gz): a file, a glob or a directory')
+    parser.add_argument('output', help='output directory for the cleaned json.gz file')
+    parser.add_argument('--no-dedup', action='store_true', help='keep near-duplicate posts')
+    parser.add_argument('--metrics', metavar='PATH',
+                        help='print rows per stage, rows rejected per filter rule, stage times and bytes, '
+                             'and save them as JSON to PATH')
+    parser.add_argument('--workers', type=int, help='worker processes (default: one per CPU)')
+    parser.add_argument('--seed', type=int, help='seed of the reservoir sample')
+    parser.add_argument('--timezone', help="time zone of the datetime and date columns, like Spark's session "
+                                           'time zone (default: this machine\'s)')
+    parser.add_argument('--author-features', action='store_true',
+                        help="add each author's post count, mean score and number of subreddits over the "
+                             'whole filtered month to every post')
+    args = parser.parse_args()
+    main(args.inputs, args.output, dedup=not args.no_dedup, metrics_path=args.metrics,
+         workers=args.workers, seed=args.seed, timezone=args.timezone, with_author_features=args.author_features)
@@ -0,0 +1,53 @@
+import random
+import zlib
+import numpy as np
+
+# MinHash / LSH settings for near-duplicate removal: 64 hashes in 8 bands of 8 rows make posts with
+# a shingle Jaccard similarity around 0.77 or more likely to share a band, candidates are then kept
+# only if their signatures agree on at least DEDUP_SIMILARITY of the hashes
+NUM_HASHES = 64
+NUM_BANDS = 8
+DEDUP_SIMILARITY = 0.8
+SHINGLE_SIZE = 5
+MERSENNE_PRIME = (1 << 31) - 1
+
+# fixed coefficients of the universal hash functions (a * x + b) mod p, so every run and executor agree
+_hash_random = random.Random(2016)
+HASH_A = [_hash_random.randrange(1, MERSENNE_PRIME) for _ in range(NUM_HASHES)]
+HASH_B = [_hash_random.randrange(0, MERSENNE_PRIME) for _ in range(NUM_HASHES)]
+
+
+def minhash_signature(title, selftext):
+    # MinHash signature of the character shingles of the lower-cased, whitespace-collapsed post text
+    text = ' '.join(f'{title} {selftext}'.lower().split())
+    shingles = {text[i:i + SHINGLE_SIZE] for i in range(max(len(text) - SHINGLE_SIZE + 1, 1))}
+
+    hashes = np.array([zlib.crc32(shingle.encode('utf-8')) for shingle in shingles], dtype=np.int64) % MERSENNE_PRIME
+    signatures = (np.outer(hashes, np.array(HASH_A, dtype=np.int64)) + np.array(HASH_B, dtype=np.int64)) % MERSENNE_PRIME
+    return signatures.min(axis=0).tolist()
+
+
+def near_duplicate_names(names, signatures):
+    # the same removal as gather_clean.remove_near_duplicates, for rows held in memory: identical
+    # signatures keep their smallest name, then LSH band buckets give candidate pairs and the larger
+    # name of every pair agreeing on at least DEDUP_SIMILARITY of the hashes is removed
+    first_copy = {}
+    for name, signature in sorted(zip(names, signatures)):
+        first_copy.setdefault(tuple(signature), name)
+    survivors = {name: signature for signature, name in first_copy.items()}
+    removed = set(names) - set(survivors)
+
+    rows_per_band = NUM_HASHES // NUM_BANDS
+    buckets = {}
+    for name, signature in survivors.items():
+        for band in range(NUM_BANDS):
+            buckets.setdefault((band, signature[band * rows_per_band:(band + 1) * rows_per_band]), []).append(name)
+
+    for bucket in buckets.values():
+        bucket.sort()
+        for i, left in enumerate(bucket):
+            for right in bucket[i + 1:]:
+                agreement = sum(a == b for a, b in zip(survivors[left], survivors[right])) / NUM_HASHES
+                if agreement >= DEDUP_SIMILARITY:
+                    removed.add(right)
+    return removed
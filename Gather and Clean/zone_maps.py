@@ -0,0 +1,119 @@
+import os
+import sys
+import argparse
+import glob
+import gzip
+import json
+from datetime import datetime
+
+# Zone maps of the cleaned json.gz files: each file is written as a series of gzip members ("row
+# groups") of ROW_GROUP_ROWS lines, which any gzip reader still reads as one file, and
+# _zone_maps.json records the byte range of every row group with the min, max and null count of a
+# few columns, per row group and per file. A loader can then decompress only the row groups whose
+# ranges can hold the rows it wants. The order of the lines in a file means nothing to the analyses,
+# so they are sorted by score, which keeps score ranges to a few row groups.
+
+ZONE_MAP_FILE_NAME = '_zone_maps.json'
+ROW_GROUP_ROWS = 2000
+
+# datetime is kept as epoch seconds, the text lengths are counted in characters like pandas' str.len
+ZONE_MAP_COLUMNS = ['datetime', 'score', 'num_comments', 'word_count_self', 'word_count_title',
+                    'selftext_length', 'title_length']
+
+
+def column_value(record, column):
+    # the value a zone map tracks for one parsed line, None when it is null
+    if column.endswith('_length'):
+        text = record.get(column[:-len('_length')])
+        return None if text is None else len(text)
+    value = record.get(column)
+    if column == 'datetime' and value is not None:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    return value
+
+
+def column_stats(records):
+    # min, max and null count of every zone map column over some parsed lines
+    stats = {}
+    for column in ZONE_MAP_COLUMNS:
+        values = [column_value(record, column) for record in records]
+        present = [value for value in values if value is not None]
+        stats[column] = {
+            'min': min(present) if present else None,
+            'max': max(present) if present else None,
+            'nulls': len(values) - len(present),
+        }
+    return stats
+
+
+def merge_stats(stats):
+    # the stats of a whole file from those of its row groups
+    merged = {}
+    for column in ZONE_MAP_COLUMNS:
+        mins = [group[column]['min'] for group in stats if group[column]['min'] is not None]
+        maxes = [group[column]['max'] for group in stats if group[column]['max'] is not None]
+        merged[column] = {
+            'min': min(mins) if mins else None,
+            'max': max(maxes) if maxes else None,
+            'nulls': sum(group[column]['nulls'] for group in stats),
+        }
+    return merged
+
+
+def write_row_groups(lines, path, row_group_rows=ROW_GROUP_ROWS, sort_by='score'):
+    # write JSON lines as one gzip member per row group and return the file's zone map; the lines are
+    # sorted by one column first (nulls first) so its row groups cover narrow, non-overlapping ranges
+    records = [json.loads(line) for line in lines]
+    if sort_by:
+        order = sorted(range(len(lines)), key=lambda row: (records[row].get(sort_by) is not None,
+                                                           records[row].get(sort_by) or 0))
+        lines = [lines[row] for row in order]
+        records = [records[row] for row in order]
+
+    row_groups = []
+    with open(path, 'wb') as f:
+        for start in range(0, len(lines), row_group_rows):
+            group = lines[start:start + row_group_rows]
+            offset = f.tell()
+            f.write(gzip.compress(''.join(group).encode('utf-8')))
+            row_groups.append({'offset': offset, 'length': f.tell() - offset, 'rows': len(group),
+                               'columns': column_stats(records[start:start + row_group_rows])})
+
+    file_stat = os.stat(path)
+    return {
+        'size': file_stat.st_size,
+        'mtime_ns': file_stat.st_mtime_ns,
+        'rows': len(lines),
+        'columns': merge_stats([group['columns'] for group in row_groups]),
+        'row_groups': row_groups,
+    }
+
+
+def write_zone_map_file(directory, zone_maps):
+    with open(os.path.join(directory, ZONE_MAP_FILE_NAME), 'w') as f:
+        json.dump(zone_maps, f)
+
+
+def index_directory(directory, row_group_rows=ROW_GROUP_ROWS, sort_by='score'):
+    # rewrite every part file of one cleaned month (e.g. Spark's output) into row groups, with the
+    # same lines, and record their zone maps
+    zone_maps = {}
+    for path in sorted(glob.glob(os.path.join(directory, 'part-*.json.gz'))):
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            lines = [line if line.endswith('\n') else line + '\n' for line in f]
+        zone_map = zone_maps[os.path.basename(path)] = write_row_groups(lines, path, row_group_rows, sort_by)
+        print(f'{path}: {len(lines)} rows in {len(zone_map["row_groups"])} row groups')
+    write_zone_map_file(directory, zone_maps)
+
+
+if __name__ == '__main__':
+    assert sys.version_info >= (3, 8)  # make sure we have Python 3.8+
+
+    parser = argparse.ArgumentParser(description='Split cleaned json.gz files into row groups and record their zone maps')
+    parser.add_argument('directories', nargs='+', help='cleaned month directories, e.g. "../Cleaned Data/one"')
+    parser.add_argument('--row-group-rows', type=int, default=ROW_GROUP_ROWS, help='lines per row group')
+    parser.add_argument('--sort-by', default='score',
+                        help='column to order the lines by before splitting them (empty keeps their order)')
+    args = parser.parse_args()
+    for directory in args.directories:
+        index_directory(directory, args.row_group_rows, args.sort_by)